@@ -13,10 +13,20 @@ def create_app():
     app = Flask(__name__)
     app.config.from_object("app.config.Config")
 
+    from app.json_provider import provider_class
+    app.json = provider_class(app.config["JSON_PROVIDER"])(app)
+
     db.init_app(app)
     migrate.init_app(app, db)
     jwt.init_app(app)
     CORS(app)
+    
+    from app.cache import dashboard_cache
+    dashboard_cache.init_app(app)
+    from app.http_client import webhook_client
+    webhook_client.init_app(app)
+    from app.compression import compressor
+    compressor.init_app(app)
 
     # IMPORTANT: Cette partie doit être APRÈS init_app
     with app.app_context():
@@ -36,10 +46,42 @@ def create_app():
         app.register_blueprint(ai_planner_bp)
         from app.routes.calendar import calendar_bp
         app.register_blueprint(calendar_bp)
+        from app.routes.meals import meals_bp
+        app.register_blueprint(meals_bp)
+    
+    # Warm the reference catalog (foods, exercises, templates) for this worker
+    from app.catalog import catalog
+    catalog.init_app(app)
+
+    # Recompute cached meal / daily plan totals when foods or meals change
+    from app import meal_totals
+
     @app.route("/health")
     def health():
         return {"status": "ok"}
 
+    # Diagnostics (cache keys are user ids, webhook URLs, breaker state): only when enabled and behind a token
+    if app.config["STATS_ENDPOINTS_ENABLED"]:
+        from flask_jwt_extended import jwt_required
+
+        @app.route("/cache-stats")
+        @jwt_required()
+        def cache_stats():
+            from app.cache import dashboard_cache
+            return {"dashboard": dashboard_cache.stats()}
+
+        @app.route("/http-stats")
+        @jwt_required()
+        def http_stats():
+            from app.http_client import webhook_client
+            return {"webhooks": webhook_client.stats()}
+
+        @app.route("/compression-stats")
+        @jwt_required()
+        def compression_stats():
+            from app.compression import compressor
+            return {"endpoints": compressor.stats()}
+
     @app.route("/test-routes")
     def test_routes():
         import urllib
@@ -0,0 +1,123 @@
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+from app import db
+from app.models import User
+
+
+class LRUCache:
+    """
+    Thread-safe in-process cache with a max entry count (least recently used
+    entries are evicted first), an optional TTL and hit/miss counters.
+    Sizes are read from the app config as <PREFIX>_SIZE and <PREFIX>_TTL.
+    Invalidations only reach this process: values other workers may change
+    must be checked against a shared version (see dashboard_version).
+    """
+
+    def __init__(self, config_prefix, max_entries=1024, ttl=None):
+        self.config_prefix = config_prefix
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._invalidations = {}  # key -> invalidation count
+        self._clears = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def init_app(self, app):
+        self.max_entries = app.config.get(f'{self.config_prefix}_SIZE', self.max_entries)
+        self.ttl = app.config.get(f'{self.config_prefix}_TTL', self.ttl)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def generation(self, key):
+        """Token to pass to set() so a value computed before an invalidation of `key` is not stored"""
+        with self._lock:
+            return self._clears, self._invalidations.get(key, 0)
+
+    def set(self, key, value, generation=None):
+        with self._lock:
+            if generation is not None and generation != (self._clears, self._invalidations.get(key, 0)):
+                return
+            expires_at = time.monotonic() + self.ttl if self.ttl else None
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._invalidations[key] = self._invalidations.get(key, 0) + 1
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._clears += 1
+            self._invalidations.clear()
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0
+            }
+
+
+def invalidate_on_commit(session, cache, key):
+    """Drop `key` from `cache` once the session's current transaction commits"""
+    session.info.setdefault('cache_invalidations', set()).add((cache, key))
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_invalidations(session):
+    for cache, key in session.info.pop('cache_invalidations', ()):
+        cache.invalidate(key)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_invalidations(session):
+    session.info.pop('cache_invalidations', None)
+
+
+# Per-user (dashboard_version, payload) of GET /api/progress/dashboard
+dashboard_cache = LRUCache('DASHBOARD_CACHE', max_entries=1024, ttl=300)
+
+
+def dashboard_version(user_id):
+    """The user's dashboard version, bumped by every worker's writes (None for an unknown user)"""
+    return db.session.execute(select(User.dashboard_version).where(User.id == user_id)).scalar()
+
+
+def invalidate_dashboard(session, user_id):
+    """
+    Bump the user's dashboard version in the current transaction, so every
+    worker's cached dashboard goes stale when it commits, and drop this
+    worker's entry right away
+    """
+    session.execute(
+        update(User).where(User.id == user_id).values(dashboard_version=User.dashboard_version + 1),
+        execution_options={'synchronize_session': False}
+    )
+    invalidate_on_commit(session, dashboard_cache, str(user_id))
@@ -0,0 +1,260 @@
+from datetime import datetime, time, timedelta
+from sqlalchemy import and_, case, func, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import load_only
+from app import db
+from app.models import CalendarEvent, RecurringEvent
+
+DAY_INDEX = {
+    'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3,
+    'friday': 4, 'saturday': 5, 'sunday': 6
+}
+
+# Time slot -> (start, end)
+TIME_SLOTS = {
+    'morning': (time(8, 0), time(9, 0)),
+    'afternoon': (time(14, 0), time(15, 0)),
+    'evening': (time(18, 0), time(19, 0))
+}
+DEFAULT_TIME_SLOT = 'morning'
+
+# Dialects with INSERT ... ON CONFLICT DO NOTHING
+UPSERT_INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert
+}
+
+
+def insert_missing(model, rows, key):
+    """
+    Insert `rows` in a single statement, skipping rows whose `key` columns
+    (backed by a unique index) already exist. Returns the number inserted.
+    """
+    if not rows:
+        return 0
+
+    table = model.__table__
+    insert = UPSERT_INSERTS.get(db.session.get_bind().dialect.name)
+    if insert is not None:
+        statement = insert(table).values(rows).on_conflict_do_nothing(index_elements=list(key))
+    else:
+        columns = [table.c[column] for column in key]
+        existing = set(db.session.execute(select(*columns).where(
+            or_(*(
+                and_(*(column == row[column.key] for column in columns))
+                for row in rows
+            ))
+        )).tuples())
+        rows = [row for row in rows if tuple(row[column] for column in key) not in existing]
+        if not rows:
+            return 0
+        statement = table.insert().values(rows)
+
+    return db.session.execute(statement).rowcount
+
+
+def plan_rule_rows(schedule, weekly_plan, weeks=None, today=None):
+    """
+    One RecurringEvent row per day of `weekly_plan`, starting with the next
+    occurrence of that day after `today` and repeating for `weeks` weeks
+    (indefinitely if None)
+    """
+    today = today or datetime.utcnow().date()
+    rows = []
+    for day_name, workout_info in weekly_plan.items():
+        weekday = DAY_INDEX.get(day_name.lower())
+        if weekday is None:
+            continue
+
+        # Next occurrence of this day, never today
+        starts_on = today + timedelta(days=(weekday - today.weekday()) % 7 or 7)
+        start_time, end_time = TIME_SLOTS.get(workout_info.get('time', DEFAULT_TIME_SLOT), TIME_SLOTS[DEFAULT_TIME_SLOT])
+        rows.append({
+            'user_id': schedule.user_id,
+            'schedule_id': schedule.id,
+            'title': workout_info.get('workout', 'Workout Session'),
+            'description': workout_info.get('description', ''),
+            'weekday': weekday,
+            'starts_on': starts_on,
+            'ends_on': starts_on + timedelta(weeks=weeks - 1) if weeks else None,
+            'excluded_dates': [],
+            'start_time': start_time,
+            'end_time': end_time,
+            'duration_minutes': workout_info.get('duration', 60),
+            'exercises': workout_info.get('exercises', []),
+            'created_at': datetime.utcnow()
+        })
+    return rows
+
+
+def materialize_plan(schedule, weekly_plan, weeks=None, today=None):
+    """
+    Store the plan's workouts as weekly recurrence rules in a single INSERT.
+    Days that already have a rule for this schedule are skipped, so repeated
+    calls (e.g. retried plan callbacks) are no-ops. The user's rules from
+    other plans stop the day before this one starts. Returns the number of
+    rules created; the caller commits.
+    """
+    rows = plan_rule_rows(schedule, weekly_plan, weeks, today)
+    if not rows:
+        return 0
+
+    created = insert_missing(RecurringEvent, rows, ('schedule_id', 'weekday'))
+    if created:
+        last_day = min(row['starts_on'] for row in rows) - timedelta(days=1)
+        RecurringEvent.query.filter(
+            RecurringEvent.user_id == schedule.user_id,
+            RecurringEvent.schedule_id != schedule.id,
+            or_(RecurringEvent.ends_on.is_(None), RecurringEvent.ends_on > last_day)
+        ).update({'ends_on': last_day}, synchronize_session=False)
+    return created
+
+
+def rules_in_range(user_id, start, end, *options):
+    return RecurringEvent.query.options(*options).filter(
+        RecurringEvent.user_id == user_id,
+        RecurringEvent.starts_on <= end,
+        or_(RecurringEvent.ends_on.is_(None), RecurringEvent.ends_on >= start)
+    ).order_by(RecurringEvent.id).all()
+
+
+def rule_occurrences(user_id, start, end, *options):
+    """
+    (rule, date) of the occurrences of the user's recurring events between
+    start and end (inclusive) that have no exception row. `options` are
+    loader options for the rules query.
+    """
+    rules = rules_in_range(user_id, start, end, *options)
+    if not rules:
+        return []
+
+    # Exception rows are returned with the user's stored events
+    overridden = set(db.session.execute(
+        select(CalendarEvent.recurring_event_id, CalendarEvent.date).where(
+            CalendarEvent.recurring_event_id.in_([rule.id for rule in rules]),
+            CalendarEvent.date >= start,
+            CalendarEvent.date <= end
+        )
+    ).tuples())
+
+    return [
+        (rule, day)
+        for rule in rules
+        for day in rule.occurrence_dates(start, end)
+        if (rule.id, day) not in overridden
+    ]
+
+
+def event_sort_key(event):
+    """
+    Position of a serialized event or occurrence in calendar order: date,
+    start time, stored events before occurrences, then event / rule id
+    """
+    if event['id'] is not None:
+        return (event['date'], event['start_time'] or time.min, 0, event['id'])
+    return (event['date'], event['start_time'] or time.min, 1, event['recurring_event_id'])
+
+
+def expand_occurrences(user_id, start, end):
+    """Occurrences (see rule_occurrences) as dicts in calendar order"""
+    occurrences = [rule.occurrence_dict(day) for rule, day in rule_occurrences(user_id, start, end)]
+    occurrences.sort(key=event_sort_key)
+    return occurrences
+
+
+def calendar_summary(user_id, start, end):
+    """
+    Per-day event count, completed count and titles between start and end.
+    Stored events come from one query grouped by (date, title) on the
+    (user_id, date) index; recurring rules are loaded without their
+    exercises. No JSON column is read.
+    """
+    days = {}
+
+    def add(day, title, start_time, events, completed):
+        entry = days.setdefault(day, {'events': 0, 'completed': 0, 'titles': {}})
+        entry['events'] += events
+        entry['completed'] += completed
+        # Title -> earliest start time, to list titles in the order of the day
+        entry['titles'][title] = min(entry['titles'].get(title, time.max), start_time or time.max)
+
+    rows = db.session.execute(
+        select(
+            CalendarEvent.date,
+            CalendarEvent.title,
+            func.min(CalendarEvent.start_time),
+            func.count(CalendarEvent.id),
+            func.sum(case((CalendarEvent.completed.is_(True), 1), else_=0))
+        ).where(
+            CalendarEvent.user_id == user_id,
+            CalendarEvent.date >= start,
+            CalendarEvent.date <= end
+        ).group_by(CalendarEvent.date, CalendarEvent.title)
+    )
+    for day, title, start_time, events, completed in rows:
+        add(day, title, start_time, events, int(completed or 0))
+
+    rule_columns = load_only(
+        RecurringEvent.title, RecurringEvent.weekday, RecurringEvent.starts_on,
+        RecurringEvent.ends_on, RecurringEvent.excluded_dates, RecurringEvent.start_time
+    )
+    for rule, day in rule_occurrences(user_id, start, end, rule_columns):
+        add(day, rule.title, rule.start_time, 1, 0)
+
+    return [
+        {
+            'date': day.isoformat(),
+            'events': entry['events'],
+            'completed': entry['completed'],
+            'all_completed': entry['completed'] == entry['events'],
+            'titles': sorted(entry['titles'], key=lambda title: (entry['titles'][title], title))
+        }
+        for day, entry in sorted(days.items())
+    ]
+
+
+def merge_events(events, occurrences):
+    """Stored events and expanded occurrences as one list in calendar order"""
+    merged = [event.to_dict() for event in events] + occurrences
+    merged.sort(key=event_sort_key)
+    return merged
+
+
+def materialize_occurrence(rule, day):
+    """
+    The exception row for the occurrence of `rule` on `day`, created from the
+    rule if needed. Raises ValueError if the rule doesn't occur that day.
+    """
+    event = CalendarEvent.query.filter_by(recurring_event_id=rule.id, date=day).first()
+    if event:
+        return event
+    if next(rule.occurrence_dates(day, day), None) is None:
+        raise ValueError('No occurrence on that date')
+
+    event = CalendarEvent(
+        user_id=rule.user_id,
+        schedule_id=rule.schedule_id,
+        recurring_event_id=rule.id,
+        title=rule.title,
+        description=rule.description,
+        date=day,
+        start_time=rule.start_time,
+        end_time=rule.end_time,
+        duration_minutes=rule.duration_minutes,
+        workout_template_id=rule.workout_template_id,
+        exercises=rule.exercises
+    )
+    db.session.add(event)
+    return event
+
+
+def cancel_occurrence(rule, day):
+    """
+    Exclude `day` from the rule and drop its exception row, if any. Raises
+    ValueError if the rule doesn't occur that day.
+    """
+    if next(rule.occurrence_dates(day, day), None) is None:
+        raise ValueError('No occurrence on that date')
+    CalendarEvent.query.filter_by(recurring_event_id=rule.id, date=day).delete(synchronize_session=False)
+    if day.isoformat() not in (rule.excluded_dates or []):
+        rule.excluded_dates = sorted((rule.excluded_dates or []) + [day.isoformat()])
@@ -0,0 +1,237 @@
+import hashlib
+import logging
+import threading
+import time
+from functools import wraps
+from flask import current_app, make_response, request
+from sqlalchemy import event, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from app import db
+from app.json_provider import encode_fragment
+from app.models import CatalogVersion, Exercise, Food, Meal, MealItem, WorkoutExercise, WorkoutTemplate
+from app.nutrition import NutritionMatrix
+from app.read_models import EXERCISE, FOOD, WORKOUT_EXERCISE, WORKOUT_TEMPLATE
+
+logger = logging.getLogger(__name__)
+
+# Writes to any of these bump the catalog version
+CATALOG_MODELS = (Food, Exercise, WorkoutTemplate, WorkoutExercise, Meal, MealItem)
+
+
+class CatalogSnapshot:
+    """Immutable, pre-serialized copy of the reference catalog at one version"""
+
+    def __init__(self, version, foods, exercises, templates, template_exercises):
+        self.version = version
+        self.foods = foods                            # id -> Food.to_dict()
+        self.exercises = exercises                    # [Exercise.to_dict()]
+        self.templates = templates                    # id -> WorkoutTemplate.to_dict()
+        self.template_exercises = template_exercises  # template id -> [WorkoutExercise.to_dict()]
+        self.foods_by_name = sorted(foods.values(), key=lambda f: f['name'])
+        self.nutrition = NutritionMatrix(foods.values())
+        self.exercises_by_id = {e['id']: e for e in exercises}
+        self.exercise_pools = {}                      # muscle group -> equipment -> [Exercise.to_dict()]
+        for e in exercises:
+            self.exercise_pools.setdefault(e['muscle_group'], {}).setdefault(e['equipment'], []).append(e)
+        self._fragments = {}                          # (kind, id) -> Fragment, filled on first use
+
+    def _fragment_value(self, kind, key):
+        if kind == 'food':
+            return self.foods.get(key)
+        if kind == 'exercise':
+            return self.exercises_by_id.get(key)
+        template = self.templates.get(key)
+        if kind == 'template_with_exercises' and template is not None:
+            return {**template, 'exercises': self.template_exercises[key]}
+        return template
+
+    def fragment(self, kind, key):
+        """
+        Encoded JSON of the catalog object `key` ('food', 'exercise', 'template'
+        or 'template_with_exercises' id) at this version, or None if it is
+        not in the catalog. Each object is encoded once per version.
+        """
+        fragment = self._fragments.get((kind, key))
+        if fragment is None:
+            value = self._fragment_value(kind, key)
+            if value is None:
+                return None
+            fragment = self._fragments.setdefault((kind, key), encode_fragment(value))
+        return fragment
+
+    def food_list(self, category=None, common_only=False):
+        return [
+            f for f in self.foods_by_name
+            if (not category or f['category'] == category) and (not common_only or f['is_common'])
+        ]
+
+    def template_list(self, goal=None, level=None):
+        return [
+            t for t in self.templates.values()
+            if (not goal or t['goal'] == goal) and (not level or t['level'] == level)
+        ]
+
+
+class Catalog:
+    """
+    Read-through cache of foods, exercises and workout templates.
+
+    Every worker keeps its own snapshot. Writes bump the shared version row in
+    the same transaction; a worker notices its own commits immediately and
+    other workers' within CATALOG_VERSION_CHECK_INTERVAL seconds.
+    """
+
+    def __init__(self):
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._stale = True
+        self.check_interval = 5
+
+    def init_app(self, app):
+        self.check_interval = app.config.get('CATALOG_VERSION_CHECK_INTERVAL', self.check_interval)
+        with app.app_context():
+            try:
+                self.get()
+            except SQLAlchemyError as e:
+                # Tables may not exist yet (e.g. while running migrations)
+                logger.warning("Catalog warmup skipped, will load on first use: %s", e.__class__.__name__)
+
+    def get(self):
+        """
+        Current snapshot, reloaded if the catalog version moved. While the
+        transaction has uncommitted catalog writes this is the last committed
+        snapshot: don't compute values to persist from it then (check
+        has_uncommitted_writes() and read the session's rows instead).
+        """
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if snapshot is not None and not self._stale and now - self._checked_at < self.check_interval:
+            return snapshot
+
+        if snapshot is not None and db.session.info.get('catalog_written'):
+            # This transaction has uncommitted catalog writes: keep serving the
+            # last committed snapshot rather than caching data that may roll back
+            return snapshot
+
+        with self._lock:
+            version = current_version(db.session)
+            if self._snapshot is None or self._snapshot.version != version:
+                self._snapshot = load_snapshot(db.session, version)
+            self._checked_at = now
+            self._stale = False
+            return self._snapshot
+
+    @property
+    def version(self):
+        return self.get().version
+
+    @staticmethod
+    def has_uncommitted_writes(session=None):
+        """Whether the session has catalog changes, flushed or not, that the snapshot doesn't reflect"""
+        session = session or db.session
+        if session.info.get('catalog_written'):
+            return True
+        return any(isinstance(obj, CATALOG_MODELS) for obj in (*session.new, *session.dirty, *session.deleted))
+
+    def mark_stale(self):
+        self._stale = True
+
+
+catalog = Catalog()
+
+
+def catalog_fragment(kind, key, fieldset):
+    """
+    The pre-encoded catalog object for a serializer embedding it whole under
+    a `fragments` fieldset (see CatalogSnapshot.fragment), otherwise None
+    """
+    if not (fieldset.fragments and fieldset.complete):
+        return None
+    return catalog.get().fragment(kind, key)
+
+
+def catalog_etag():
+    """Strong ETag for the current request: catalog version + endpoint + query string"""
+    args = '&'.join(f'{k}={v}' for k, v in sorted(request.args.items(multi=True)))
+    digest = hashlib.sha1(f'{request.path}?{args}'.encode()).hexdigest()[:16]
+    return f'catalog-{catalog.version}-{digest}'
+
+
+def conditional_catalog_get(view):
+    """
+    ETag / If-None-Match handling for views that only read the catalog.
+    A matching request gets a 304 straight from the in-memory catalog version.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        etag = catalog_etag()
+        cache_control = f"public, max-age={current_app.config.get('CATALOG_CACHE_MAX_AGE', 60)}"
+
+        if request.if_none_match.contains_weak(etag) or request.if_none_match.star_tag:
+            response = make_response('', 304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+        # Weak: the body may be sent gzip/brotli-encoded, with or without a 304
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = cache_control
+        return response
+
+    return wrapper
+
+
+def current_version(session):
+    return session.execute(select(CatalogVersion.version).where(CatalogVersion.id == 1)).scalar() or 0
+
+
+def load_snapshot(session, version):
+    """Load and serialize the whole catalog, from column projections rather than ORM instances"""
+    foods = {row.id: row.to_dict() for row in FOOD.rows(FOOD.select(), session)}
+    exercises = [row.to_dict() for row in EXERCISE.rows(EXERCISE.select().order_by(Exercise.id), session)]
+    templates = {}
+    template_exercises = {}
+    for row in WORKOUT_TEMPLATE.rows(WORKOUT_TEMPLATE.select().order_by(WorkoutTemplate.id), session):
+        templates[row.id] = row.to_dict()
+        template_exercises[row.id] = []
+    statement = WORKOUT_EXERCISE.select(WorkoutExercise.workout_id)\
+        .join(Exercise, WorkoutExercise.exercise_id == Exercise.id)\
+        .order_by(WorkoutExercise.workout_id, WorkoutExercise.id)
+    for workout_id, row in WORKOUT_EXERCISE.keyed_rows(statement, session):
+        template_exercises[workout_id].append(row.to_dict())
+
+    return CatalogSnapshot(version, foods, exercises, templates, template_exercises)
+
+
+@event.listens_for(Session, 'after_flush')
+def _bump_version_on_catalog_write(session, flush_context):
+    if session.info.get('catalog_written'):
+        return
+
+    changed = session.new | session.dirty | session.deleted
+    if not any(isinstance(obj, CATALOG_MODELS) for obj in changed):
+        return
+
+    connection = session.connection()
+    result = connection.execute(
+        update(CatalogVersion.__table__)
+        .where(CatalogVersion.id == 1)
+        .values(version=CatalogVersion.version + 1)
+    )
+    if result.rowcount == 0:
+        connection.execute(CatalogVersion.__table__.insert().values(id=1, version=1))
+    session.info['catalog_written'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _refresh_after_catalog_commit(session):
+    if session.info.pop('catalog_written', False):
+        catalog.mark_stale()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_catalog_write(session):
+    session.info.pop('catalog_written', None)
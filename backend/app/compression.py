@@ -0,0 +1,202 @@
+import threading
+import zlib
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - Brotli is in requirements.txt
+    brotli = None
+
+
+class GzipEncoder:
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, chunk):
+        return self._compressor.compress(chunk)
+
+    def flush(self):
+        """What was compressed so far, so the client can start decoding it"""
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class BrotliEncoder:
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, chunk):
+        return self._compressor.process(chunk)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class EndpointStats:
+    """Compression counters for one endpoint"""
+
+    def __init__(self):
+        self.responses = 0
+        self.compressed = 0
+        self.streamed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.encodings = {}
+
+    def to_dict(self):
+        return {
+            'responses': self.responses,
+            'compressed': self.compressed,
+            'streamed': self.streamed,
+            'encodings': dict(self.encodings),
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'bytes_saved': self.bytes_in - self.bytes_out,
+            'ratio': round(self.bytes_out / self.bytes_in, 3) if self.bytes_in else None
+        }
+
+
+class Compressor:
+    """
+    Negotiated gzip / brotli compression of responses (brotli when the
+    Brotli package is installed and preferred by the client).
+
+    Bodies under COMPRESSION_MIN_SIZE bytes and non-text mimetypes are sent
+    as-is. Buffered bodies are compressed in one go at COMPRESSION_LEVEL
+    (gzip) / COMPRESSION_BROTLI_LEVEL. With COMPRESSION_STREAMING, streamed
+    responses are compressed chunk by chunk while the server writes them.
+    304s get the same Vary and weak ETag as the 200 they stand for. Keeps
+    per-endpoint byte counts.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.min_size = 1024
+        self.level = 6
+        self.brotli_level = 5
+        self.mimetypes = {'application/json'}
+        self.streaming = True
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.enabled = app.config.get('COMPRESSION_ENABLED', self.enabled)
+        self.min_size = app.config.get('COMPRESSION_MIN_SIZE', self.min_size)
+        self.level = app.config.get('COMPRESSION_LEVEL', self.level)
+        self.brotli_level = app.config.get('COMPRESSION_BROTLI_LEVEL', self.brotli_level)
+        self.mimetypes = set(app.config.get('COMPRESSION_MIMETYPES', self.mimetypes))
+        self.streaming = app.config.get('COMPRESSION_STREAMING', self.streaming)
+        with self._lock:
+            self._stats = {}
+        app.after_request(self.compress_response)
+
+    def encodings(self):
+        """Supported encodings, in order of preference"""
+        return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+    def negotiate(self):
+        """The encoding to use for the current request, or None"""
+        accepted = request.accept_encodings
+        quality, _, encoding = max(
+            (accepted.quality(encoding), -i, encoding) for i, encoding in enumerate(self.encodings())
+        )
+        return encoding if quality > 0 else None
+
+    def encoder(self, encoding):
+        if encoding == 'br':
+            return BrotliEncoder(self.brotli_level)
+        return GzipEncoder(self.level)
+
+    def _record(self, endpoint, bytes_in, bytes_out, encoding=None, streamed=False):
+        with self._lock:
+            stats = self._stats.setdefault(endpoint, EndpointStats())
+            stats.responses += 1
+            stats.bytes_in += bytes_in
+            stats.bytes_out += bytes_out
+            if encoding:
+                stats.compressed += 1
+                stats.encodings[encoding] = stats.encodings.get(encoding, 0) + 1
+            if streamed:
+                stats.streamed += 1
+
+    def compress_response(self, response):
+        if self.enabled and response.status_code == 304:
+            # The cached 200 may be compressed: validate against the same variant and ETag
+            response.vary.add('Accept-Encoding')
+            self._weaken_etag(response)
+            return response
+
+        if (
+            not self.enabled
+            or request.method == 'HEAD'
+            or response.status_code < 200
+            or response.status_code in (204, 206)
+            or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in self.mimetypes
+        ):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        endpoint = request.endpoint or 'other'
+        encoding = self.negotiate()
+
+        if response.is_streamed:
+            if encoding is None or not self.streaming:
+                return response
+            response.response = self._stream(response.response, encoding, endpoint)
+            response.headers.pop('Content-Length', None)
+        else:
+            body = response.get_data()
+            if encoding is None or len(body) < self.min_size:
+                self._record(endpoint, len(body), len(body))
+                return response
+            encoder = self.encoder(encoding)
+            compressed = encoder.compress(body) + encoder.finish()
+            self._record(endpoint, len(body), len(compressed), encoding)
+            response.set_data(compressed)
+
+        response.headers['Content-Encoding'] = encoding
+        self._weaken_etag(response)
+        return response
+
+    def _weaken_etag(self, response):
+        """The compressed body is not byte-identical to the one the ETag was computed for"""
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+
+    def _stream(self, chunks, encoding, endpoint):
+        """Compress `chunks` as they are consumed, flushing after each one"""
+        encoder = self.encoder(encoding)
+        bytes_in = bytes_out = 0
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode()
+                bytes_in += len(chunk)
+                data = encoder.compress(chunk) + encoder.flush()
+                bytes_out += len(data)
+                if data:
+                    yield data
+            data = encoder.finish()
+            bytes_out += len(data)
+            yield data
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+            self._record(endpoint, bytes_in, bytes_out, encoding, streamed=True)
+
+    def stats(self):
+        with self._lock:
+            return {endpoint: stats.to_dict() for endpoint, stats in sorted(self._stats.items())}
+
+
+# Response compression for the JSON API
+compressor = Compressor()
@@ -5,6 +5,57 @@ class Config:
 
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "570b8907ff16cac33923d93078914e0188ac3038871a78b95a78a3b4ca653ecf")
+    # Per-user dashboard cache (entries, seconds)
+    DASHBOARD_CACHE_SIZE = int(os.getenv("DASHBOARD_CACHE_SIZE", 1024))
+    DASHBOARD_CACHE_TTL = int(os.getenv("DASHBOARD_CACHE_TTL", 300))
+    # Serve the /*-stats diagnostics endpoints (to authenticated users); off in production
+    STATS_ENDPOINTS_ENABLED = os.getenv("STATS_ENDPOINTS_ENABLED", "false").lower() == "true"
+    # Seconds between checks for catalog writes made by other workers
+    CATALOG_VERSION_CHECK_INTERVAL = float(os.getenv("CATALOG_VERSION_CHECK_INTERVAL", 5))
+    # Cache-Control max-age (seconds) for catalog endpoints served with ETags
+    CATALOG_CACHE_MAX_AGE = int(os.getenv("CATALOG_CACHE_MAX_AGE", 60))
+    # AI plan generation: n8n webhooks called by the background job workers
+    N8N_MEAL_WEBHOOK_URL = os.getenv("N8N_MEAL_WEBHOOK_URL", "http://localhost:5678/webhook/generate-meal-plan")
+    N8N_WORKOUT_WEBHOOK_URL = os.getenv("N8N_WORKOUT_WEBHOOK_URL", "http://localhost:5678/webhook/generate-workout-plan")
+    GENERATION_WORKERS = int(os.getenv("GENERATION_WORKERS", 2))
+    GENERATION_REQUEST_TIMEOUT = float(os.getenv("GENERATION_REQUEST_TIMEOUT", 300))
+    # Seconds a claimed job stays invisible to other workers; must exceed the request timeout
+    GENERATION_VISIBILITY_TIMEOUT = int(os.getenv("GENERATION_VISIBILITY_TIMEOUT", 330))
+    GENERATION_MAX_ATTEMPTS = int(os.getenv("GENERATION_MAX_ATTEMPTS", 3))
+    # Retry delay in seconds, doubled after every failed attempt
+    GENERATION_RETRY_BACKOFF = float(os.getenv("GENERATION_RETRY_BACKOFF", 10))
+    GENERATION_POLL_INTERVAL = float(os.getenv("GENERATION_POLL_INTERVAL", 1))
+    GENERATION_SWEEP_INTERVAL = float(os.getenv("GENERATION_SWEEP_INTERVAL", 60))
+    # Schedules still 'processing' this many seconds after dispatch are marked failed
+    GENERATION_STUCK_AFTER = int(os.getenv("GENERATION_STUCK_AFTER", 900))
+    # Identical generation requests within this many seconds reuse the first one's schedule
+    GENERATION_COALESCE_WINDOW = int(os.getenv("GENERATION_COALESCE_WINDOW", 600))
+    # Weeks a generated workout plan repeats in the calendar (0 = until a newer plan replaces it)
+    CALENDAR_PLAN_WEEKS = int(os.getenv("CALENDAR_PLAN_WEEKS", 0))
+    # How far ahead recurring events are expanded when a calendar query has no end date
+    CALENDAR_EXPANSION_DAYS = int(os.getenv("CALENDAR_EXPANSION_DAYS", 90))
+    # Build meal plans with the local solver when the n8n call gives up
+    MEAL_PLAN_LOCAL_FALLBACK = os.getenv("MEAL_PLAN_LOCAL_FALLBACK", "true").lower() == "true"
+    # JSON encoder for responses: "orjson" (falls back to "stdlib" when not installed)
+    JSON_PROVIDER = os.getenv("JSON_PROVIDER", "orjson")
+    # Response compression (gzip, or brotli when the Brotli package is installed)
+    COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+    COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+    COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", 6))
+    COMPRESSION_BROTLI_LEVEL = int(os.getenv("COMPRESSION_BROTLI_LEVEL", 5))
+    COMPRESSION_MIMETYPES = ["application/json"]
+    # Compress streamed responses chunk by chunk as they are sent
+    COMPRESSION_STREAMING = os.getenv("COMPRESSION_STREAMING", "true").lower() == "true"
+    # Outbound webhook client: pooled keep-alive connections, limits per target URL
+    HTTP_CLIENT_POOL_SIZE = int(os.getenv("HTTP_CLIENT_POOL_SIZE", 10))
+    HTTP_CLIENT_MAX_CONCURRENCY = int(os.getenv("HTTP_CLIENT_MAX_CONCURRENCY", 4))
+    # Seconds to wait for a free slot before giving up
+    HTTP_CLIENT_ACQUIRE_TIMEOUT = float(os.getenv("HTTP_CLIENT_ACQUIRE_TIMEOUT", 5))
+    HTTP_CLIENT_RETRIES = int(os.getenv("HTTP_CLIENT_RETRIES", 2))
+    HTTP_CLIENT_RETRY_BACKOFF = float(os.getenv("HTTP_CLIENT_RETRY_BACKOFF", 0.5))
+    # Consecutive failures that open a target's circuit, and seconds before a trial call
+    CIRCUIT_BREAKER_THRESHOLD = int(os.getenv("CIRCUIT_BREAKER_THRESHOLD", 5))
+    CIRCUIT_BREAKER_RESET = float(os.getenv("CIRCUIT_BREAKER_RESET", 30))
     N8N_WEBHOOK_URL = os.getenv(
         'N8N_WEBHOOK_URL',
         'http://localhost:5678/webhook-test/generate-workout-plan'
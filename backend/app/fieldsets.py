@@ -0,0 +1,90 @@
+from flask import request
+
+
+def _parse_paths(value):
+    """'a,b.c' -> {('a',), ('b', 'c')}"""
+    return {tuple(part for part in path.strip().split('.') if part) for path in value.split(',') if path.strip()}
+
+
+def _children(paths, name):
+    return {path[1:] for path in paths if len(path) > 1 and path[0] == name}
+
+
+class Fieldset:
+    """
+    What a serializer should emit, from the request's query args:
+
+        fields=id,date,breakfast.name   keep only these fields (dotted paths reach into relationships)
+        include=breakfast.items         embed only these relationships, instead of the serializer's defaults
+        exclude=exercises.exercise.instructions   drop these fields
+
+    Without any of them serializers return their usual payload. A relationship
+    that is not embedded is replaced by its id where the model has one.
+
+    With `fragments`, catalog objects embedded whole may be returned as
+    pre-encoded JSON (app.json_provider.Fragment): only for payloads that
+    go straight to jsonify.
+    """
+
+    def __init__(self, fields=None, include=None, exclude=None, fragments=False):
+        self.fields = fields        # set of paths, or None for all fields
+        self.include = include      # set of paths, or None for the serializer defaults
+        self.exclude = exclude or set()
+        self.fragments = fragments
+
+    @classmethod
+    def from_request(cls):
+        """The current request's fieldset, for building its response payload"""
+        args = request.args
+        return cls(
+            fields=_parse_paths(args['fields']) if 'fields' in args else None,
+            include=_parse_paths(args['include']) if 'include' in args else None,
+            exclude=_parse_paths(args.get('exclude', '')),
+            fragments=True
+        )
+
+    @property
+    def complete(self):
+        """Whether serializers return their usual payload at this level and below"""
+        return self.fields is None and self.include is None and not self.exclude
+
+    def wants(self, name):
+        """Whether the field `name` is emitted at this level"""
+        if (name,) in self.exclude:
+            return False
+        return self.fields is None or any(path[0] == name for path in self.fields)
+
+    def embeds(self, name, default=True):
+        """Whether the relationship `name` is serialized (and so should be loaded) at this level"""
+        if not self.wants(name):
+            return False
+        if self.include is None:
+            return default
+        return any(path[0] == name for path in self.include)
+
+    def encodes(self, name, default=True):
+        """Whether the catalog object embedded under `name` is whole, so can be spliced in pre-encoded"""
+        return self.fragments and self.embeds(name, default) and self.child(name).complete
+
+    def child(self, name):
+        """Fieldset for the object embedded under `name`"""
+        fields = _children(self.fields, name) if self.fields is not None else None
+        include = _children(self.include, name) if self.include is not None else None
+        return Fieldset(
+            # `fields=breakfast` alone keeps the whole meal
+            fields=fields or None,
+            # `include=breakfast` alone embeds the meal with its own defaults
+            include=include or None,
+            exclude=_children(self.exclude, name),
+            fragments=self.fragments
+        )
+
+    def select(self, data):
+        """Drop the fields of `data` (a serialized dict) that were not asked for"""
+        if self.fields is None and not self.exclude:
+            return data
+        return {key: value for key, value in data.items() if self.wants(key) or (key.endswith('_id') and self.wants(key[:-3]))}
+
+
+# Serializer defaults: everything, as before
+ALL = Fieldset()
@@ -0,0 +1,268 @@
+import threading
+import time
+from collections import deque
+import requests
+from requests.adapters import HTTPAdapter
+
+# Responses worth another try: the request was not processed
+RETRY_STATUSES = {429, 502, 503, 504}
+
+
+class OutboundCallRejected(requests.RequestException):
+    """The call was not attempted"""
+
+
+class CircuitOpenError(OutboundCallRejected):
+    pass
+
+
+class TargetBusyError(OutboundCallRejected):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures and rejects calls for
+    `reset_timeout` seconds; then lets a single trial call through, closing
+    again if it succeeds and re-opening if it fails.
+    """
+
+    def __init__(self, threshold, reset_timeout):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        return 'half_open' if time.monotonic() - self.opened_at >= self.reset_timeout else 'open'
+
+    def retry_after(self):
+        """Seconds until the next trial call is let through (0 unless open)"""
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+class TargetStats:
+    """Counters and recent latencies for one target URL"""
+
+    def __init__(self, window=256):
+        self.requests = 0
+        self.responses = {}
+        self.errors = 0
+        self.retries = 0
+        self.rejected_open = 0
+        self.rejected_busy = 0
+        self.in_flight = 0
+        self.latencies = deque(maxlen=window)
+        self.max_latency = 0.0
+        self._lock = threading.Lock()
+
+    def incr(self, counter, amount=1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def record_call(self, seconds, status_code=None):
+        """One HTTP attempt: its latency and response status (None for an exception)"""
+        with self._lock:
+            self.requests += 1
+            self.latencies.append(seconds)
+            self.max_latency = max(self.max_latency, seconds)
+            if status_code is None:
+                self.errors += 1
+            else:
+                status_class = f'{status_code // 100}xx'
+                self.responses[status_class] = self.responses.get(status_class, 0) + 1
+
+    def to_dict(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+
+        def percentile(p):
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1) if latencies else None
+
+        return {
+            'requests': self.requests,
+            'responses': dict(self.responses),
+            'errors': self.errors,
+            'retries': self.retries,
+            'rejected_circuit_open': self.rejected_open,
+            'rejected_busy': self.rejected_busy,
+            'in_flight': self.in_flight,
+            'latency_ms': {
+                'avg': round(sum(latencies) / len(latencies) * 1000, 1) if latencies else None,
+                'p50': percentile(0.5),
+                'p95': percentile(0.95),
+                'max': round(self.max_latency * 1000, 1)
+            }
+        }
+
+
+class Target:
+    def __init__(self, max_concurrency, breaker_threshold, breaker_reset):
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_reset)
+        self.stats = TargetStats()
+
+
+class HttpClient:
+    """
+    Shared client for outbound webhook calls: keep-alive connection pooling,
+    at most HTTP_CLIENT_MAX_CONCURRENCY in-flight calls per URL, retries with
+    exponential backoff for connection failures and retryable statuses, a
+    circuit breaker per URL and per-URL latency / error counters.
+    Settings are read from the app config as HTTP_CLIENT_* and CIRCUIT_BREAKER_*.
+    """
+
+    def __init__(self):
+        self.pool_size = 10
+        self.max_concurrency = 4
+        self.acquire_timeout = 5
+        self.retries = 2
+        self.retry_backoff = 0.5
+        self.breaker_threshold = 5
+        self.breaker_reset = 30
+        self._targets = {}
+        self._lock = threading.Lock()
+        self._session = None
+
+    def init_app(self, app):
+        self.pool_size = app.config.get('HTTP_CLIENT_POOL_SIZE', self.pool_size)
+        self.max_concurrency = app.config.get('HTTP_CLIENT_MAX_CONCURRENCY', self.max_concurrency)
+        self.acquire_timeout = app.config.get('HTTP_CLIENT_ACQUIRE_TIMEOUT', self.acquire_timeout)
+        self.retries = app.config.get('HTTP_CLIENT_RETRIES', self.retries)
+        self.retry_backoff = app.config.get('HTTP_CLIENT_RETRY_BACKOFF', self.retry_backoff)
+        self.breaker_threshold = app.config.get('CIRCUIT_BREAKER_THRESHOLD', self.breaker_threshold)
+        self.breaker_reset = app.config.get('CIRCUIT_BREAKER_RESET', self.breaker_reset)
+        with self._lock:
+            self._targets = {}
+            self._session = None
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    self._session = session
+        return self._session
+
+    def _target(self, url):
+        target = self._targets.get(url)
+        if target is None:
+            with self._lock:
+                target = self._targets.setdefault(
+                    url, Target(self.max_concurrency, self.breaker_threshold, self.breaker_reset)
+                )
+        return target
+
+    def post(self, url, json=None, timeout=None):
+        """
+        POST to `url`. Raises CircuitOpenError / TargetBusyError without calling
+        it, or the requests exception of the last attempt. Read timeouts are not
+        retried: the webhook may already be running.
+        """
+        target = self._target(url)
+        stats = target.stats
+
+        # Fail fast without queueing for a slot while the circuit is open
+        if target.breaker.state == 'open':
+            stats.incr('rejected_open')
+            raise CircuitOpenError(f'Circuit open for {url}')
+        if not target.slots.acquire(timeout=self.acquire_timeout):
+            stats.incr('rejected_busy')
+            raise TargetBusyError(f'Too many concurrent calls to {url}')
+        if not target.breaker.allow():
+            target.slots.release()
+            stats.incr('rejected_open')
+            raise CircuitOpenError(f'Circuit open for {url}')
+
+        stats.incr('in_flight')
+        try:
+            for attempt in range(self.retries + 1):
+                start = time.perf_counter()
+                try:
+                    response = self.session.post(url, json=json, timeout=timeout)
+                except requests.RequestException as e:
+                    stats.record_call(time.perf_counter() - start)
+                    if isinstance(e, requests.ConnectionError) and attempt < self.retries:
+                        self._backoff(stats, attempt)
+                        continue
+                    target.breaker.record_failure()
+                    raise
+
+                stats.record_call(time.perf_counter() - start, response.status_code)
+                if response.status_code in RETRY_STATUSES and attempt < self.retries:
+                    self._backoff(stats, attempt)
+                    continue
+
+                if response.status_code >= 500:
+                    target.breaker.record_failure()
+                else:
+                    target.breaker.record_success()
+                return response
+        except requests.RequestException:
+            raise
+        except BaseException:
+            # Anything else still ends the call, so a half-open trial doesn't stay in flight forever
+            target.breaker.record_failure()
+            raise
+        finally:
+            stats.incr('in_flight', -1)
+            target.slots.release()
+
+    def retry_after(self, url):
+        """Seconds until calls to `url` may get past its circuit breaker again"""
+        target = self._targets.get(url)
+        return target.breaker.retry_after() if target is not None else 0.0
+
+    def is_open(self, url):
+        """Whether calls to `url` are currently rejected by its circuit breaker"""
+        target = self._targets.get(url)
+        return target is not None and target.breaker.state == 'open'
+
+    def _backoff(self, stats, attempt):
+        stats.incr('retries')
+        time.sleep(self.retry_backoff * 2 ** attempt)
+
+    def stats(self):
+        with self._lock:
+            targets = dict(self._targets)
+        return {
+            url: {**target.stats.to_dict(), 'circuit': target.breaker.state}
+            for url, target in targets.items()
+        }
+
+
+# Outbound calls to the n8n webhooks (N8N_MEAL_WEBHOOK_URL, N8N_WORKOUT_WEBHOOK_URL)
+webhook_client = HttpClient()
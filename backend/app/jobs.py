@@ -0,0 +1,326 @@
+import hashlib
+import json
+import logging
+import os
+import socket
+import threading
+from datetime import datetime, timedelta
+import requests
+from flask import current_app
+from sqlalchemy import and_, or_
+from app import db
+from app.http_client import OutboundCallRejected, webhook_client
+from app.meal_planner import apply_generated_plan, generate_weekly_meal_plan
+from app.models import GenerationJob, MealSchedule, UserSchedule
+
+logger = logging.getLogger(__name__)
+
+# Job kind -> (schedule model, config key of the webhook it calls)
+JOB_KINDS = {
+    'meal_plan': (MealSchedule, 'N8N_MEAL_WEBHOOK_URL'),
+    'workout_plan': (UserSchedule, 'N8N_WORKOUT_WEBHOOK_URL'),
+}
+
+# Candidates fetched per claim attempt
+CLAIM_BATCH = 10
+
+# Payload fields that differ between otherwise identical requests
+UNKEYED_FIELDS = ('schedule_id', 'callback_url')
+
+
+def _normalize(value):
+    """Canonical form of a payload value: sorted scalar lists, floats for numbers"""
+    if isinstance(value, dict):
+        return {str(key): _normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        items = [_normalize(item) for item in value]
+        if all(isinstance(item, (str, int, float)) for item in items):
+            items.sort(key=lambda item: (str(type(item)), item))
+        return items
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+
+def request_key(kind, user_id, payload):
+    """Hash of the normalized request: user, kind, preferences and profile snapshot"""
+    normalized = _normalize({key: value for key, value in payload.items() if key not in UNKEYED_FIELDS})
+    canonical = json.dumps([kind, str(user_id), normalized], sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def find_duplicate_generation(kind, user_id, payload):
+    """
+    Schedule of an identical request made within GENERATION_COALESCE_WINDOW
+    that is still in flight or completed, or None.
+    """
+    model, _ = JOB_KINDS[kind]
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config['GENERATION_COALESCE_WINDOW'])
+    return model.query.join(
+        GenerationJob, and_(GenerationJob.kind == kind, GenerationJob.schedule_id == model.id)
+    ).filter(
+        GenerationJob.user_id == user_id,
+        GenerationJob.kind == kind,
+        GenerationJob.request_key == request_key(kind, user_id, payload),
+        GenerationJob.created_at >= cutoff,
+        model.generation_status.in_(['pending', 'processing', 'completed'])
+    ).order_by(GenerationJob.created_at.desc()).first()
+
+
+def enqueue_generation(kind, schedule, payload):
+    """Queue the webhook call for `schedule`; committed together with the caller's transaction"""
+    job = GenerationJob(
+        kind=kind,
+        user_id=schedule.user_id,
+        schedule_id=schedule.id,
+        payload=payload,
+        request_key=request_key(kind, schedule.user_id, payload),
+        max_attempts=current_app.config['GENERATION_MAX_ATTEMPTS']
+    )
+    db.session.add(job)
+    return job
+
+
+def coalesced_response(schedule, label):
+    """Response for a request answered by an identical earlier one"""
+    completed = schedule.generation_status == 'completed'
+    return {
+        'message': f"Identical {label} request already {'completed' if completed else 'in progress'}",
+        'schedule_id': schedule.id,
+        'status': schedule.generation_status,
+        'coalesced': True
+    }, 200 if completed else 202
+
+
+def _claimable(now):
+    """Queued jobs that are due, or running jobs whose worker lease expired with attempts left"""
+    return or_(
+        and_(GenerationJob.status == 'queued', GenerationJob.available_at <= now),
+        and_(
+            GenerationJob.status == 'running',
+            GenerationJob.locked_until < now,
+            GenerationJob.attempts < GenerationJob.max_attempts
+        )
+    )
+
+
+def claim_job(worker_id):
+    """
+    Lease the next due job to `worker_id` and return it, or None.
+    The lease is taken with a conditional UPDATE so concurrent workers never
+    run the same attempt, on any database.
+    """
+    now = datetime.utcnow()
+    candidates = [row.id for row in db.session.query(GenerationJob.id).filter(_claimable(now))
+                  .order_by(GenerationJob.available_at, GenerationJob.id).limit(CLAIM_BATCH)]
+
+    for job_id in candidates:
+        claimed = GenerationJob.query.filter(GenerationJob.id == job_id, _claimable(now)).update({
+            'status': 'running',
+            'attempts': GenerationJob.attempts + 1,
+            'locked_by': worker_id,
+            'locked_until': now + timedelta(seconds=current_app.config['GENERATION_VISIBILITY_TIMEOUT']),
+            'updated_at': now
+        }, synchronize_session=False)
+        db.session.commit()
+        if claimed:
+            return GenerationJob.query.get(job_id)
+
+    db.session.rollback()
+    return None
+
+
+def _finish(job, worker_id, values):
+    """Apply `values` to the job if `worker_id` still holds the lease for this attempt"""
+    values['updated_at'] = datetime.utcnow()
+    return GenerationJob.query.filter_by(
+        id=job.id, status='running', locked_by=worker_id, attempts=job.attempts
+    ).update(values, synchronize_session=False) == 1
+
+
+def _set_schedule_status(job, status, from_statuses, **extra):
+    model, _ = JOB_KINDS[job.kind]
+    model.query.filter(
+        model.id == job.schedule_id,
+        model.generation_status.in_(from_statuses)
+    ).update({'generation_status': status, **extra}, synchronize_session=False)
+
+
+def _local_meal_plan(job):
+    """Complete a meal plan job n8n gave up on with the local solver; False if that failed too"""
+    schedule = MealSchedule.query.filter(
+        MealSchedule.id == job.schedule_id,
+        MealSchedule.generation_status.in_(['pending', 'processing'])
+    ).first()
+    if schedule is None:
+        return True
+    try:
+        apply_generated_plan(schedule, generate_weekly_meal_plan(job.payload))
+    except Exception:
+        logger.exception("Local meal plan fallback failed for job %s", job.id)
+        return False
+    logger.info("Generation job %s completed with the local meal planner", job.id)
+    return True
+
+
+def run_job(job, worker_id):
+    """Call the job's webhook and record the outcome (success, retry or failure)"""
+    _, url_key = JOB_KINDS[job.kind]
+    url = current_app.config[url_key]
+    payload = job.payload
+    # Keep this attempt's values and don't hold a transaction open during the HTTP call
+    db.session.expunge(job)
+    db.session.commit()
+
+    try:
+        response = webhook_client.post(url, json=payload, timeout=current_app.config['GENERATION_REQUEST_TIMEOUT'])
+        error = None if response.status_code == 200 else f'n8n responded with HTTP {response.status_code}'
+    except OutboundCallRejected as e:
+        # n8n was never called (circuit open or target busy): give the attempt
+        # back and wait until the breaker lets a trial call through
+        delay = max(webhook_client.retry_after(url), current_app.config['GENERATION_POLL_INTERVAL'])
+        logger.info("Generation job %s deferred %.1fs: %s", job.id, delay, e)
+        _finish(job, worker_id, {
+            'status': 'queued',
+            'attempts': GenerationJob.attempts - 1,
+            'available_at': datetime.utcnow() + timedelta(seconds=delay),
+            'locked_by': None,
+            'locked_until': None,
+            'last_error': str(e)
+        })
+        db.session.commit()
+        return
+    except requests.RequestException as e:
+        response = None
+        error = str(e)
+
+    if error is None:
+        if _finish(job, worker_id, {'status': 'succeeded', 'locked_by': None, 'locked_until': None, 'last_error': None}):
+            extra = {}
+            if job.kind == 'workout_plan':
+                try:
+                    extra['n8n_workflow_id'] = (response.json() or {}).get('workflow_id')
+                except ValueError:
+                    pass
+            # The plan-ready webhook may already have completed the schedule
+            _set_schedule_status(job, 'processing', ['pending'], **extra)
+    elif job.attempts < job.max_attempts:
+        delay = current_app.config['GENERATION_RETRY_BACKOFF'] * 2 ** (job.attempts - 1)
+        logger.warning("Generation job %s attempt %s failed, retrying in %ss: %s", job.id, job.attempts, delay, error)
+        _finish(job, worker_id, {
+            'status': 'queued',
+            'available_at': datetime.utcnow() + timedelta(seconds=delay),
+            'locked_by': None,
+            'locked_until': None,
+            'last_error': error
+        })
+    else:
+        logger.error("Generation job %s failed after %s attempts: %s", job.id, job.attempts, error)
+        if _finish(job, worker_id, {'status': 'failed', 'locked_by': None, 'locked_until': None, 'last_error': error}):
+            fallback = job.kind == 'meal_plan' and current_app.config['MEAL_PLAN_LOCAL_FALLBACK']
+            if not (fallback and _local_meal_plan(job)):
+                _set_schedule_status(job, 'failed', ['pending', 'processing'])
+
+    db.session.commit()
+
+
+def sweep(now=None):
+    """
+    Fail jobs whose worker died during their final attempt, and schedules still
+    'processing' GENERATION_STUCK_AFTER seconds after n8n accepted the job
+    (the plan-ready callback never arrived). Returns (jobs, schedules) failed.
+    """
+    now = now or datetime.utcnow()
+
+    abandoned = GenerationJob.query.filter(
+        GenerationJob.status == 'running',
+        GenerationJob.locked_until < now,
+        GenerationJob.attempts >= GenerationJob.max_attempts
+    ).all()
+    for job in abandoned:
+        job.status = 'failed'
+        job.locked_by = None
+        job.locked_until = None
+        job.last_error = 'Worker lease expired during the final attempt'
+        _set_schedule_status(job, 'failed', ['pending', 'processing'])
+
+    cutoff = now - timedelta(seconds=current_app.config['GENERATION_STUCK_AFTER'])
+    stuck = 0
+    for kind, (model, _) in JOB_KINDS.items():
+        schedule_ids = [row.id for row in db.session.query(model.id).join(
+            GenerationJob, and_(GenerationJob.kind == kind, GenerationJob.schedule_id == model.id)
+        ).filter(
+            model.generation_status == 'processing',
+            GenerationJob.status == 'succeeded',
+            GenerationJob.updated_at < cutoff
+        )]
+        if schedule_ids:
+            stuck += model.query.filter(
+                model.id.in_(schedule_ids),
+                model.generation_status == 'processing'
+            ).update({'generation_status': 'failed'}, synchronize_session=False)
+
+    db.session.commit()
+    return len(abandoned), stuck
+
+
+class JobWorkerPool:
+    """
+    Threads that claim and run generation jobs, plus one sweeper thread.
+    Any number of pools (in any number of processes) can share the queue.
+    """
+
+    def __init__(self, app, num_workers=None):
+        self.app = app
+        self.num_workers = app.config['GENERATION_WORKERS'] if num_workers is None else num_workers
+        self.poll_interval = app.config['GENERATION_POLL_INTERVAL']
+        self.sweep_interval = app.config['GENERATION_SWEEP_INTERVAL']
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for index in range(self.num_workers):
+            self._spawn(self._work, f'{self.name}:{index}')
+        self._spawn(self._sweep, f'{self.name}:sweeper')
+        logger.info("Started %s generation workers", self.num_workers)
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _spawn(self, target, name):
+        thread = threading.Thread(target=target, args=(name,), name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def run_once(self, worker_id=None):
+        """Claim and run one job; False if none was due"""
+        worker_id = worker_id or f'{self.name}:inline'
+        with self.app.app_context():
+            job = claim_job(worker_id)
+            if job is None:
+                return False
+            run_job(job, worker_id)
+            return True
+
+    def _work(self, worker_id):
+        while not self._stop.is_set():
+            try:
+                ran = self.run_once(worker_id)
+            except Exception:
+                logger.exception("Generation worker %s crashed on a job", worker_id)
+                ran = False
+            if not ran:
+                self._stop.wait(self.poll_interval)
+
+    def _sweep(self, name):
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                with self.app.app_context():
+                    sweep()
+            except Exception:
+                logger.exception("Generation sweeper failed")
@@ -0,0 +1,131 @@
+import dataclasses
+import decimal
+import re
+import uuid
+from datetime import date, time
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+
+def _default(o):
+    """Types neither encoder handles natively; dates and times as ISO 8601, like .isoformat()"""
+    if isinstance(o, (date, time)):
+        return o.isoformat()
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if dataclasses.is_dataclass(o):
+        return dataclasses.asdict(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+class Fragment:
+    """Already encoded JSON (bytes), written verbatim where it appears in a payload"""
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+
+def encode_fragment(value):
+    """`value` encoded once by the app's provider, to be embedded in later payloads as-is"""
+    return current_app.json.fragment(value)
+
+
+# Fragments are encoded as this placeholder string, then replaced by their bytes
+_FRAGMENT_TOKEN = uuid.uuid4().hex
+_FRAGMENT_PATTERN = re.compile(f'"@fragment:{_FRAGMENT_TOKEN}:([0-9]+)"')
+_FRAGMENT_PATTERN_BYTES = re.compile(_FRAGMENT_PATTERN.pattern.encode())
+
+
+class _Splicer:
+    """`default` hook for one encode call that collects the Fragments, and `splice` to put them back"""
+
+    def __init__(self):
+        self.fragments = []
+
+    def default(self, o):
+        if isinstance(o, Fragment):
+            self.fragments.append(o.data)
+            return f'@fragment:{_FRAGMENT_TOKEN}:{len(self.fragments) - 1}'
+        return _default(o)
+
+    def splice(self, encoded):
+        if not self.fragments:
+            return encoded
+        if isinstance(encoded, bytes):
+            return _FRAGMENT_PATTERN_BYTES.sub(lambda m: self.fragments[int(m.group(1))], encoded)
+        return _FRAGMENT_PATTERN.sub(lambda m: self.fragments[int(m.group(1))].decode(), encoded)
+
+
+class ISOJSONProvider(DefaultJSONProvider):
+    """
+    Flask's stdlib provider, with dates, datetimes and times as ISO 8601
+    instead of HTTP dates, so models can return them as-is, and Fragments
+    written verbatim.
+    """
+    default = staticmethod(_default)
+
+    def dumps(self, obj, **kwargs):
+        splicer = _Splicer()
+        kwargs.setdefault('default', splicer.default)
+        return splicer.splice(super().dumps(obj, **kwargs))
+
+    def fragment(self, value):
+        """`value` as a Fragment, formatted like response bodies"""
+        if self.compact is False or (self.compact is None and self._app.debug):
+            return Fragment(self.dumps(value, indent=2).encode())
+        return Fragment(self.dumps(value, separators=(',', ':')).encode())
+
+
+class OrjsonProvider(ISOJSONProvider):
+    """
+    The same output as ISOJSONProvider (sorted keys, ISO dates, non-string
+    keys as strings, compact unless in debug, Fragments as-is), encoded with
+    orjson. Responses are built from the encoded bytes, without an
+    intermediate str.
+    """
+
+    def _options(self):
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if self.compact is False or (self.compact is None and self._app.debug):
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            # Explicit json.dumps options (indent, separators, ...): stdlib
+            return super().dumps(obj, **kwargs)
+        splicer = _Splicer()
+        return splicer.splice(orjson.dumps(obj, default=splicer.default, option=self._options())).decode()
+
+    def fragment(self, value):
+        splicer = _Splicer()
+        return Fragment(splicer.splice(orjson.dumps(value, default=splicer.default, option=self._options())))
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        splicer = _Splicer()
+        body = orjson.dumps(obj, default=splicer.default, option=self._options() | orjson.OPT_APPEND_NEWLINE)
+        body = splicer.splice(body)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def provider_class(name):
+    """JSON_PROVIDER config value ('orjson' or 'stdlib') -> provider class"""
+    if name == 'orjson' and orjson is not None:
+        return OrjsonProvider
+    return ISOJSONProvider
@@ -0,0 +1,307 @@
+from datetime import datetime
+import numpy as np
+from sqlalchemy.orm import selectinload
+from app import db
+from app.catalog import catalog
+from app.models import Meal
+from app.nutrition import MACROS
+
+DAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+ACTIVITY_MULTIPLIERS = {
+    'sedentary': 1.2,
+    'light': 1.375,
+    'moderate': 1.55,
+    'active': 1.725,
+    'very_active': 1.9
+}
+
+# Share of the daily targets per meal
+MEAL_SPLITS = {
+    3: {'breakfast': 0.3, 'lunch': 0.4, 'dinner': 0.3},
+    4: {'breakfast': 0.25, 'lunch': 0.35, 'dinner': 0.3, 'snack': 0.1}
+}
+
+# Food categories combined into a meal, in display order
+MEAL_CATEGORIES = {
+    'breakfast': ('carb', 'protein', 'fruit'),
+    'lunch': ('protein', 'carb', 'vegetable', 'fat'),
+    'dinner': ('protein', 'carb', 'vegetable', 'fat'),
+    'snack': ('snack', 'fruit')
+}
+
+# Realistic portion range in grams per food category
+PORTION_BOUNDS = {
+    'protein': (50, 300),
+    'carb': (30, 400),
+    'vegetable': (50, 300),
+    'fruit': (50, 250),
+    'fat': (5, 40),
+    'snack': (20, 100)
+}
+DEFAULT_PORTION_BOUNDS = (10, 400)
+PORTION_STEP = 5
+
+# Relative importance of hitting [kcal, protein, carbs, fat]
+MACRO_WEIGHTS = np.array([3.0, 2.0, 1.0, 1.0])
+SOLVER_ITERATIONS = 300
+
+# Food name keywords excluded by a dietary restriction; other restrictions match names directly
+RESTRICTION_KEYWORDS = {
+    'vegetarian': ['chicken', 'turkey', 'tuna', 'salmon', 'beef', 'pork', 'fish'],
+    'vegan': ['chicken', 'turkey', 'tuna', 'salmon', 'beef', 'pork', 'fish',
+              'egg', 'yogurt', 'cheese', 'milk', 'whey', 'protein bar'],
+    'dairy_free': ['yogurt', 'cheese', 'milk'],
+    'lactose_free': ['yogurt', 'cheese', 'milk'],
+    'nut_free': ['almond', 'walnut', 'peanut', 'cashew'],
+    'gluten_free': ['bread', 'pasta', 'wheat']
+}
+
+# Meal.goal values used for each generation goal
+MEAL_GOALS = {
+    'lose_fat': 'weight_loss',
+    'weight_loss': 'weight_loss',
+    'muscle_gain': 'muscle_gain'
+}
+
+
+def nutrition_targets(current_weight, goal_weight, days_to_goal, goal, age=None, gender=None,
+                      height=None, activity_level=None):
+    """Daily targets from Mifflin-St Jeor BMR and TDEE (same rules as the n8n workflow)"""
+    age = age or 30
+    gender = gender or 'male'
+    height = height or 170
+    activity_level = activity_level or 'moderate'
+
+    bmr = 10 * current_weight + 6.25 * height - 5 * age + (5 if gender == 'male' else -161)
+    tdee = bmr * ACTIVITY_MULTIPLIERS.get(activity_level, 1.55)
+    weight_change_per_week = (goal_weight - current_weight) / (days_to_goal / 7)
+    calorie_change = abs(weight_change_per_week) * 7700 / 7  # 7700 kcal per kg
+
+    if goal in ('lose_fat', 'weight_loss'):
+        target_calories = round(tdee - min(calorie_change, 750))
+        protein_per_kg, carb_percentage, fat_percentage = 2.2, 30, 30
+    elif goal == 'muscle_gain':
+        target_calories = round(tdee + min(calorie_change, 500))
+        protein_per_kg, carb_percentage, fat_percentage = 2.0, 45, 25
+    else:
+        target_calories = round(tdee)
+        protein_per_kg, carb_percentage, fat_percentage = 1.8, 40, 30
+    target_calories = min(max(target_calories, 1200), 4000)
+
+    target_protein = round(current_weight * protein_per_kg)
+    protein_calories = target_protein * 4
+    carb_calories = round(target_calories * carb_percentage / 100)
+    fat_calories = round(target_calories * fat_percentage / 100)
+    target_carbs = round(carb_calories / 4)
+    target_fat = round(fat_calories / 9)
+    # Adjust carbs so the macros add up to the calorie target
+    target_carbs += round((target_calories - protein_calories - carb_calories - fat_calories) / 4)
+
+    return {
+        'daily_calories': target_calories,
+        'daily_protein': target_protein,
+        'daily_carbs': target_carbs,
+        'daily_fat': target_fat,
+        'tdee': round(tdee),
+        'bmr': round(bmr),
+        'weight_change_per_week': round(weight_change_per_week, 2),
+        'protein_percentage': round(protein_calories / target_calories * 100),
+        'carb_percentage': carb_percentage,
+        'fat_percentage': fat_percentage
+    }
+
+
+def solve_portions(per_gram, targets, lower, upper, iterations=SOLVER_ITERATIONS):
+    """
+    Portion sizes for a batch of meals: minimizes the weighted relative error
+    of each meal's [kcal, protein, carbs, fat] against its targets subject to
+    per-food gram bounds (box-constrained least squares, accelerated projected
+    gradient, all meals at once).
+
+    per_gram: (meals, foods, 4) macros per gram, zero rows for padding
+    targets: (meals, 4); lower / upper: (meals, foods) gram bounds
+    """
+    weights = MACRO_WEIGHTS / np.maximum(targets, 1)
+    B = per_gram * weights[:, None, :]
+    b = targets * weights
+
+    # Step size from the largest eigenvalue of each meal's Gram matrix
+    gram = np.einsum('mkj,mlj->mkl', B, B)
+    lipschitz = 2 * np.linalg.eigvalsh(gram)[:, -1]
+    step = (1 / np.maximum(lipschitz, 1e-12))[:, None]
+
+    def gradient(q):
+        residual = np.einsum('mk,mkj->mj', q, B) - b
+        return 2 * np.einsum('mkj,mj->mk', B, residual)
+
+    q = lower + (upper - lower) * 0.3
+    y = q
+    t = 1.0
+    for _ in range(iterations):
+        q_next = np.clip(y - step * gradient(y), lower, upper)
+        t_next = (1 + np.sqrt(1 + 4 * t * t)) / 2
+        y = q_next + (t - 1) / t_next * (q_next - q)
+        q, t = q_next, t_next
+
+    return np.clip(np.round(q / PORTION_STEP) * PORTION_STEP, lower, upper)
+
+
+def _excluded(food, restrictions):
+    name = food['name'].lower()
+    for restriction in restrictions:
+        key = str(restriction).lower().strip().replace(' ', '_').replace('-', '_')
+        keywords = RESTRICTION_KEYWORDS.get(key, [key.replace('_', ' ')])
+        if any(keyword and keyword in name for keyword in keywords):
+            return True
+    return False
+
+
+def _meal_combinations(snapshot, meal_type, goal, allowed):
+    """
+    Food id tuples to build `meal_type` from: the foods of stored Meals for
+    this goal first, then one category combination per day rotating through
+    each category's foods.
+    """
+    stored = Meal.query.options(selectinload(Meal.items)).filter_by(meal_type=meal_type)
+    if goal in MEAL_GOALS:
+        stored = stored.filter_by(goal=MEAL_GOALS[goal])
+    combinations = [
+        tuple(item.food_id for item in meal.items)
+        for meal in stored.order_by(Meal.id)
+        if meal.items and all(item.food_id in allowed for item in meal.items)
+    ]
+
+    pools = {
+        category: sorted(food_id for food_id in allowed if snapshot.foods[food_id]['category'] == category)
+        for category in MEAL_CATEGORIES[meal_type]
+    }
+    # Shifted per meal type so lunch and dinner differ on the same day
+    shift = 3 * list(MEAL_CATEGORIES).index(meal_type)
+    for day_index in range(len(DAYS)):
+        combination = tuple(
+            pool[(day_index + offset + shift) % len(pool)]
+            for offset, pool in enumerate(pools.values()) if pool
+        )
+        if combination:
+            combinations.append(combination)
+    return combinations
+
+
+def _meal_name(foods):
+    names = [food['name'] for food in foods]
+    return names[0] if len(names) == 1 else f"{names[0]} with {' & '.join(names[1:])}"
+
+
+def generate_weekly_meal_plan(profile):
+    """
+    Build a 7-day plan in milliseconds, without the LLM. `profile` holds the
+    same fields as the n8n generation payload; the result has the same shape
+    as the n8n plan-ready callback (user_data, nutrition_targets, weekly_meal_plan).
+    """
+    current_weight = float(profile['current_weight'])
+    targets = nutrition_targets(
+        current_weight,
+        float(profile['goal_weight']),
+        float(profile['days_to_goal']),
+        profile.get('goal'),
+        profile.get('age'),
+        profile.get('gender'),
+        profile.get('height'),
+        profile.get('activity_level')
+    )
+    daily = np.array([
+        targets['daily_calories'], targets['daily_protein'], targets['daily_carbs'], targets['daily_fat']
+    ], dtype=np.float64)
+
+    meals_per_day = 3 if int(profile.get('meals_per_day') or 4) <= 3 else 4
+    splits = MEAL_SPLITS[meals_per_day]
+    restrictions = profile.get('dietary_restrictions') or []
+
+    snapshot = catalog.get()
+    allowed = {
+        food_id for food_id, food in snapshot.foods.items()
+        if food['is_common'] and not _excluded(food, restrictions)
+    } or {food_id for food_id, food in snapshot.foods.items() if not _excluded(food, restrictions)}
+    combinations = {
+        meal_type: _meal_combinations(snapshot, meal_type, profile.get('goal'), allowed)
+        for meal_type in splits
+    }
+
+    # One row per (day, meal) to solve them all in one batch
+    slots = [
+        (day, meal_type, combinations[meal_type][day_index % len(combinations[meal_type])])
+        for day_index, day in enumerate(DAYS)
+        for meal_type in splits
+        if combinations[meal_type]
+    ]
+    if not slots:
+        raise ValueError('No foods available for a meal plan')
+
+    width = max(len(food_ids) for _, _, food_ids in slots)
+    matrix = snapshot.nutrition
+    per_gram = np.zeros((len(slots), width, len(MACROS)))
+    lower = np.zeros((len(slots), width))
+    upper = np.zeros((len(slots), width))
+    meal_targets = np.zeros((len(slots), len(MACROS)))
+    for row, (_, meal_type, food_ids) in enumerate(slots):
+        per_gram[row, :len(food_ids)] = matrix.matrix[matrix.rows_for(food_ids)] / 100
+        for column, food_id in enumerate(food_ids):
+            category = snapshot.foods[food_id]['category']
+            lower[row, column], upper[row, column] = PORTION_BOUNDS.get(category, DEFAULT_PORTION_BOUNDS)
+        meal_targets[row] = daily * splits[meal_type]
+
+    portions = solve_portions(per_gram, meal_targets, lower, upper)
+    meal_totals = np.round(np.einsum('mk,mkj->mj', portions, per_gram), 1)
+
+    weekly_meal_plan = {day: {} for day in DAYS}
+    for row, (day, meal_type, food_ids) in enumerate(slots):
+        foods = [snapshot.foods[food_id] for food_id in food_ids]
+        weekly_meal_plan[day][meal_type] = {
+            'name': _meal_name(foods),
+            'items': [
+                {'food_id': food['id'], 'food_name': food['name'], 'quantity': float(quantity)}
+                for food, quantity in zip(foods, portions[row, :len(food_ids)])
+            ],
+            'totals': dict(zip(MACROS, meal_totals[row].tolist()))
+        }
+    days_per_row = np.array([DAYS.index(day) for day, _, _ in slots], dtype=np.intp)
+    day_totals = np.zeros((len(DAYS), len(MACROS)))
+    np.add.at(day_totals, days_per_row, meal_totals)
+    for day, totals in zip(DAYS, np.round(day_totals, 1).tolist()):
+        weekly_meal_plan[day]['daily_totals'] = dict(zip(MACROS, totals))
+
+    return {
+        'user_data': {
+            'current_weight': current_weight,
+            'goal_weight': profile['goal_weight'],
+            'days_to_goal': profile['days_to_goal'],
+            'goal': profile.get('goal')
+        },
+        'nutrition_targets': targets,
+        'weekly_meal_plan': weekly_meal_plan
+    }
+
+
+def apply_generated_plan(schedule, data):
+    """Store a generated plan (n8n callback or local solver output) on a MealSchedule"""
+    schedule.weekly_plan = data['weekly_meal_plan']
+    schedule.generation_status = 'completed'
+    schedule.generated_at = datetime.utcnow()
+    schedule.is_active = True  # Optional: auto-activate
+
+    # Store nutrition targets
+    nutrition_targets = data.get('nutrition_targets', {})
+    schedule.daily_calories = nutrition_targets.get('daily_calories')
+    schedule.daily_protein = nutrition_targets.get('daily_protein')
+    schedule.daily_carbs = nutrition_targets.get('daily_carbs')
+    schedule.daily_fat = nutrition_targets.get('daily_fat')
+
+    # Store user data snapshot
+    user_data = data.get('user_data', {})
+    schedule.current_weight = user_data.get('current_weight')
+    schedule.goal_weight = user_data.get('goal_weight')
+    schedule.days_to_goal = user_data.get('days_to_goal')
+    schedule.goal = user_data.get('goal')
+    db.session.add(schedule)
+    return schedule
@@ -0,0 +1,182 @@
+import numpy as np
+from sqlalchemy import bindparam, event, inspect, or_, select, update
+from sqlalchemy.orm import Session
+from app.models import DailyMealPlan, Food, Meal, MealItem
+from app.nutrition import MACROS, PER_100G_FIELDS, NutritionMatrix
+
+# Max ids per IN list / rows per UPDATE batch
+CHUNK_SIZE = 500
+
+MEAL_SLOTS = ('breakfast_id', 'lunch_id', 'dinner_id', 'snack_id')
+TOTAL_COLUMNS = ('total_calories', 'total_protein', 'total_carbs', 'total_fat')
+
+
+def chunks(ids, size=CHUNK_SIZE):
+    ids = sorted(set(ids))
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+# Dependency index: food -> meals (meal_items.food_id) -> daily plans (meal slot columns)
+
+def meals_using_foods(connection, food_ids):
+    """Ids of meals with at least one item made of any of `food_ids`"""
+    meal_ids = set()
+    for chunk in chunks(food_ids):
+        meal_ids.update(connection.execute(
+            select(MealItem.meal_id).where(MealItem.food_id.in_(chunk)).distinct()
+        ).scalars())
+    return meal_ids
+
+
+def plans_using_meals(connection, meal_ids):
+    """Ids of daily plans that have any of `meal_ids` in one of their slots"""
+    plan_ids = set()
+    for chunk in chunks(meal_ids):
+        plan_ids.update(connection.execute(
+            select(DailyMealPlan.id).where(or_(*(getattr(DailyMealPlan, slot).in_(chunk) for slot in MEAL_SLOTS)))
+        ).scalars())
+    return plan_ids
+
+
+# Set-based recomputation
+
+def compute_meal_totals(connection, meal_ids):
+    """meal id -> [kcal, protein, carbs, fat] recomputed from the meal's items"""
+    meal_ids = list(meal_ids)
+    items = connection.execute(
+        select(MealItem.meal_id, MealItem.food_id, MealItem.quantity).where(MealItem.meal_id.in_(meal_ids))
+    ).all()
+    matrix = NutritionMatrix(connection.execute(
+        select(Food.id, *(getattr(Food, field) for field in PER_100G_FIELDS))
+        .where(Food.id.in_({item.food_id for item in items}))
+    ).all())
+
+    position = {meal_id: i for i, meal_id in enumerate(meal_ids)}
+    totals = matrix.batch_totals_arrays(
+        np.array([position[item.meal_id] for item in items], dtype=np.intp),
+        matrix.rows_for([item.food_id for item in items]),
+        np.array([item.quantity for item in items], dtype=np.float64),
+        len(meal_ids)
+    )
+    return dict(zip(meal_ids, np.round(totals, 1).tolist()))
+
+
+def compute_plan_totals(connection, plan_ids):
+    """plan id -> [kcal, protein, carbs, fat] summed from the cached totals of its meals"""
+    plans = connection.execute(
+        select(DailyMealPlan.id, *(getattr(DailyMealPlan, slot) for slot in MEAL_SLOTS))
+        .where(DailyMealPlan.id.in_(list(plan_ids)))
+    ).all()
+    meal_ids = sorted({meal_id for plan in plans for meal_id in plan[1:] if meal_id})
+
+    # Row 0 stands for an empty slot
+    position = {meal_id: i for i, meal_id in enumerate(meal_ids, start=1)}
+    meal_totals = np.zeros((len(meal_ids) + 1, len(MACROS)))
+    for row in connection.execute(
+        select(Meal.id, *(getattr(Meal, column) for column in TOTAL_COLUMNS)).where(Meal.id.in_(meal_ids))
+    ):
+        meal_totals[position[row.id]] = [value or 0 for value in row[1:]]
+
+    slots = np.array(
+        [[position.get(meal_id, 0) for meal_id in plan[1:]] for plan in plans], dtype=np.intp
+    ).reshape(-1, len(MEAL_SLOTS))
+    totals = np.round(meal_totals[slots].sum(axis=1), 1)
+    return dict(zip((plan.id for plan in plans), totals.tolist()))
+
+
+def write_totals(connection, model, totals):
+    """Bulk UPDATE of the cached total columns from {id: [kcal, protein, carbs, fat]}"""
+    table = model.__table__
+    statement = (
+        update(table)
+        .where(table.c.id == bindparam('row_id'))
+        .values({column: bindparam(f'new_{column}') for column in TOTAL_COLUMNS})
+    )
+    params = [
+        {'row_id': row_id, **{f'new_{column}': value for column, value in zip(TOTAL_COLUMNS, values)}}
+        for row_id, values in totals.items()
+    ]
+    for start in range(0, len(params), CHUNK_SIZE):
+        connection.execute(statement, params[start:start + CHUNK_SIZE])
+
+
+def recompute_meals(connection, meal_ids):
+    for chunk in chunks(meal_ids):
+        write_totals(connection, Meal, compute_meal_totals(connection, chunk))
+
+
+def recompute_plans(connection, plan_ids):
+    for chunk in chunks(plan_ids):
+        write_totals(connection, DailyMealPlan, compute_plan_totals(connection, chunk))
+
+
+def propagate(connection, food_ids=(), meal_ids=()):
+    """
+    Recompute the cached totals of every meal using `food_ids`, then of every
+    daily plan using one of those meals or `meal_ids`. Returns the (meal ids,
+    plan ids) that were rewritten.
+    """
+    stale_meals = meals_using_foods(connection, food_ids)
+    recompute_meals(connection, stale_meals)
+    stale_plans = plans_using_meals(connection, stale_meals | set(meal_ids))
+    recompute_plans(connection, stale_plans)
+    return stale_meals, stale_plans
+
+
+def audit_totals(connection, model, compute, chunk_size=CHUNK_SIZE, tolerance=0.1):
+    """
+    Stream every row of `model` in id order, `chunk_size` rows at a time, and
+    yield (id, cached, recomputed) for rows whose cached totals drifted by more
+    than `tolerance`.
+    """
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            select(model.id, *(getattr(model, column) for column in TOTAL_COLUMNS))
+            .where(model.id > last_id)
+            .order_by(model.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            return
+
+        recomputed = compute(connection, [row.id for row in rows])
+        for row in rows:
+            cached = [value or 0 for value in row[1:]]
+            if np.abs(np.subtract(cached, recomputed[row.id])).max() > tolerance:
+                yield row.id, cached, recomputed[row.id]
+        last_id = rows[-1].id
+
+
+# Keep cached totals in step with ORM writes to foods and meals
+
+def _changed(obj, fields):
+    attrs = inspect(obj).attrs
+    return any(attrs[field].history.has_changes() for field in fields)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_nutrition_changes(session, flush_context):
+    for obj in session.dirty:
+        if isinstance(obj, Food) and _changed(obj, PER_100G_FIELDS):
+            session.info.setdefault('nutrition_changed_foods', set()).add(obj.id)
+        elif isinstance(obj, Meal) and _changed(obj, TOTAL_COLUMNS):
+            session.info.setdefault('nutrition_changed_meals', set()).add(obj.id)
+
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _propagate_nutrition_changes(session, flush_context):
+    food_ids = session.info.pop('nutrition_changed_foods', set())
+    meal_ids = session.info.pop('nutrition_changed_meals', set())
+    if not food_ids and not meal_ids:
+        return
+
+    stale_meals, stale_plans = propagate(session.connection(), food_ids, meal_ids)
+
+    # Loaded copies of the rewritten rows reload their totals on next access
+    for model, ids in ((Meal, stale_meals), (DailyMealPlan, stale_plans)):
+        for row_id in ids:
+            obj = session.identity_map.get(session.identity_key(model, row_id))
+            if obj is not None:
+                session.expire(obj, list(TOTAL_COLUMNS))
@@ -1,6 +1,13 @@
 from app import db
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime
+from sqlalchemy import and_, case, func, inspect, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+from datetime import datetime, timedelta
+from app.nutrition import NutritionMatrix, nutrition_for, sum_totals
+from app.fieldsets import ALL
+
+
 class User(db.Model):
     __tablename__ = 'users'
     
@@ -23,6 +30,9 @@ class User(db.Model):
     workout_difficulty = db.Column(db.String(20), nullable=False, default='Beginner')  # ⬅️ NEW
     location = db.Column(db.String(50), nullable=False)  # ⬅️ NEW
     
+    # Bumped with every write that changes the dashboard (see app.cache.invalidate_dashboard)
+    dashboard_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
     # Relationships
     workouts = db.relationship('UserWorkout', backref='user', lazy=True, cascade='all, delete-orphan')
     
@@ -47,27 +57,37 @@ class User(db.Model):
             'estimated_daily_steps': self.estimated_daily_steps,
             'workout_difficulty': self.workout_difficulty,
             'location': self.location,
-            'created_at': self.created_at.isoformat()
+            'created_at': self.created_at
         }
     def get_workout_stats(self):
-        """Get user's workout statistics"""
-        total_sessions = WorkoutSession.query.filter_by(user_id=self.id).count()
-        completed_sessions = WorkoutSession.query.filter_by(
-            user_id=self.id, 
-            completed=True
-        ).count()
+        """
+        Get user's workout statistics. Totals and last workout come from the
+        stats row when present, else from one aggregate query. this_week_workouts
+        is a rolling 7-day window, so it is always counted (an index range scan
+        on ix_workout_sessions_user_created).
+        """
+        week_start = datetime.utcnow() - timedelta(days=7)
+        stats = UserWorkoutStats.query.get(self.id)
         
-        # Last workout date
-        last_workout = WorkoutSession.query.filter_by(
-            user_id=self.id,
-            completed=True
-        ).order_by(WorkoutSession.completed_at.desc()).first()
+        if stats:
+            total_sessions = stats.total_sessions
+            completed_sessions = stats.completed_sessions
+            last_workout = stats.last_workout_at
+            this_week_workouts = WorkoutSession.query.filter(
+                WorkoutSession.user_id == self.id,
+                WorkoutSession.created_at >= week_start,
+                WorkoutSession.completed == True
+            ).count()
+        else:
+            total_sessions, completed_sessions, last_workout, this_week_workouts = \
+                WorkoutSession.aggregate_for_user(self.id, week_start)
         
         return {
             'total_sessions': total_sessions,
             'completed_sessions': completed_sessions,
             'completion_rate': round((completed_sessions / total_sessions * 100), 1) if total_sessions > 0 else 0,
-            'last_workout': last_workout.completed_at.isoformat() if last_workout else None
+            'last_workout': last_workout,
+            'this_week_workouts': this_week_workouts
         }
 
 
@@ -83,15 +103,15 @@ class Exercise(db.Model):
     instructions = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    def to_dict(self):
-        return {
+    def to_dict(self, fieldset=ALL):
+        return fieldset.select({
             'id': self.id,
             'name': self.name,
             'muscle_group': self.muscle_group,
             'equipment': self.equipment,
             'difficulty': self.difficulty,
             'instructions': self.instructions
-        }
+        })
 
 
 class WorkoutTemplate(db.Model):
@@ -109,7 +129,7 @@ class WorkoutTemplate(db.Model):
     # Relationship with exercises
     exercises = db.relationship('WorkoutExercise', backref='workout_template', lazy=True, cascade='all, delete-orphan')
 
-    def to_dict(self, include_exercises=False):
+    def to_dict(self, include_exercises=False, fieldset=ALL):
         result = {
             'id': self.id,
             'name': self.name,
@@ -119,15 +139,19 @@ class WorkoutTemplate(db.Model):
             'duration_minutes': self.duration_minutes
         }
         
-        if include_exercises:
-            result['exercises'] = [we.to_dict() for we in self.exercises]
+        if fieldset.embeds('exercises', include_exercises):
+            exercises_fieldset = fieldset.child('exercises')
+            result['exercises'] = [we.to_dict(exercises_fieldset) for we in self.exercises]
         
-        return result
+        return fieldset.select(result)
 
 
 class WorkoutExercise(db.Model):
     """Join table between WorkoutTemplate and Exercise with workout-specific details"""
     __tablename__ = "workout_exercises"
+    __table_args__ = (
+        db.Index('ix_workout_exercises_workout_id', 'workout_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     workout_id = db.Column(db.Integer, db.ForeignKey('workout_templates.id'), nullable=False)
@@ -141,15 +165,22 @@ class WorkoutExercise(db.Model):
     # Relationship to Exercise
     exercise = db.relationship('Exercise', backref='workout_exercises')
 
-    def to_dict(self):
-        return {
+    def to_dict(self, fieldset=ALL):
+        result = {
             'id': self.id,
-            'exercise': self.exercise.to_dict(),
             'sets': self.sets,
             'reps': self.reps,
             'rest_seconds': self.rest_seconds,
             'order': self.order
         }
+        if fieldset.embeds('exercise'):
+            from app.catalog import catalog_fragment
+            exercise_fieldset = fieldset.child('exercise')
+            result['exercise'] = catalog_fragment('exercise', self.exercise_id, exercise_fieldset) \
+                or self.exercise.to_dict(exercise_fieldset)
+        else:
+            result['exercise_id'] = self.exercise_id
+        return fieldset.select(result)
 
 
 class UserWorkout(db.Model):
@@ -165,17 +196,41 @@ class UserWorkout(db.Model):
     # Relationship
     template = db.relationship('WorkoutTemplate')
 
-    def to_dict(self):
-        return {
+    @staticmethod
+    def eager_options(fieldset=ALL):
+        """Loader options for the relationships to_dict(fieldset) serializes (and does not splice in pre-encoded)"""
+        if not fieldset.embeds('template') or fieldset.encodes('template'):
+            return ()
+        template = fieldset.child('template')
+        if not template.embeds('exercises'):
+            return (selectinload(UserWorkout.template),)
+        load = selectinload(UserWorkout.template).selectinload(WorkoutTemplate.exercises)
+        if template.child('exercises').embeds('exercise'):
+            load = load.joinedload(WorkoutExercise.exercise)
+        return (load,)
+
+    def to_dict(self, fieldset=ALL):
+        result = {
             'id': self.id,
             'user_id': self.user_id,
-            'template': self.template.to_dict(include_exercises=True),
-            'assigned_at': self.assigned_at.isoformat(),
+            'assigned_at': self.assigned_at,
             'is_active': self.is_active
         }
+        if fieldset.embeds('template'):
+            from app.catalog import catalog_fragment
+            template_fieldset = fieldset.child('template')
+            result['template'] = catalog_fragment('template_with_exercises', self.template_id, template_fieldset) \
+                or self.template.to_dict(include_exercises=True, fieldset=template_fieldset)
+        else:
+            result['template_id'] = self.template_id
+        return fieldset.select(result)
 class WorkoutSession(db.Model):
     """A specific workout session for a user"""
     __tablename__ = "workout_sessions"
+    __table_args__ = (
+        db.Index('ix_workout_sessions_user_completed', 'user_id', 'completed', 'completed_at'),
+        db.Index('ix_workout_sessions_user_created', 'user_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -189,21 +244,164 @@ class WorkoutSession(db.Model):
     template = db.relationship('WorkoutTemplate')
     exercises = db.relationship('SessionExercise', backref='session', lazy=True, cascade='all, delete-orphan')
     
-    def to_dict(self):
-        return {
+    @staticmethod
+    def aggregate_for_user(user_id, week_start):
+        """(total, completed, last completed_at, completed since week_start) in a single statement"""
+        is_completed = WorkoutSession.completed == True
+        return db.session.query(
+            func.count(WorkoutSession.id),
+            func.count(case((is_completed, 1))),
+            func.max(case((is_completed, WorkoutSession.completed_at))),
+            func.count(case((and_(is_completed, WorkoutSession.created_at >= week_start), 1)))
+        ).filter(WorkoutSession.user_id == user_id).one()
+    
+    @staticmethod
+    def eager_options(fieldset=ALL):
+        """
+        Loader options so to_dict(fieldset) runs without lazy loads (one query
+        per relationship level), for the relationships it serializes only.
+        Catalog objects spliced in pre-encoded are not loaded.
+        """
+        options = []
+        if fieldset.embeds('template') and not fieldset.encodes('template'):
+            options.append(selectinload(WorkoutSession.template))
+        if fieldset.embeds('exercises'):
+            load = selectinload(WorkoutSession.exercises)
+            exercises = fieldset.child('exercises')
+            if exercises.embeds('exercise') and not exercises.encodes('exercise'):
+                load = load.joinedload(SessionExercise.exercise)
+            options.append(load)
+        return tuple(options)
+    
+    def to_dict(self, fieldset=ALL):
+        result = {
             'id': self.id,
             'user_id': self.user_id,
-            'template': self.template.to_dict(),
-            'created_at': self.created_at.isoformat(),
+            'created_at': self.created_at,
             'completed': self.completed,
-            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
-            'exercises': [e.to_dict() for e in self.exercises]
+            'completed_at': self.completed_at
         }
+        if fieldset.embeds('template'):
+            from app.catalog import catalog_fragment
+            template_fieldset = fieldset.child('template')
+            result['template'] = catalog_fragment('template', self.template_id, template_fieldset) \
+                or self.template.to_dict(fieldset=template_fieldset)
+        else:
+            result['template_id'] = self.template_id
+        if fieldset.embeds('exercises'):
+            exercises_fieldset = fieldset.child('exercises')
+            result['exercises'] = [e.to_dict(exercises_fieldset) for e in self.exercises]
+        return fieldset.select(result)
+
+
+class UserWorkoutStats(db.Model):
+    """Per-user workout counters and streaks, kept current by the session routes"""
+    __tablename__ = "user_workout_stats"
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    total_sessions = db.Column(db.Integer, nullable=False, default=0)
+    completed_sessions = db.Column(db.Integer, nullable=False, default=0)
+    last_workout_at = db.Column(db.DateTime)
+    
+    # Streaks count consecutive days with at least one completed session
+    current_streak = db.Column(db.Integer, nullable=False, default=0)
+    longest_streak = db.Column(db.Integer, nullable=False, default=0)
+    last_active_day = db.Column(db.Date)
+    
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    @classmethod
+    def get_or_create(cls, user_id):
+        """
+        Load and lock (SELECT ... FOR UPDATE) the user's stats row for the rest
+        of the transaction, so concurrent session writes update the counters
+        and streak one after the other. The row is built from their sessions
+        the first time, in a savepoint: if a concurrent request created it
+        first, theirs is loaded instead.
+        """
+        stats = cls._locked(user_id)
+        if stats is not None:
+            return stats
+        
+        stats = cls.from_history(user_id)
+        try:
+            with db.session.begin_nested():
+                db.session.add(stats)
+        except IntegrityError:
+            stats = cls._locked(user_id)
+        return stats
+    
+    @classmethod
+    def _locked(cls, user_id):
+        statement = select(cls).where(cls.user_id == user_id).with_for_update()
+        return db.session.execute(statement.execution_options(populate_existing=True)).scalar_one_or_none()
+    
+    @classmethod
+    def rebuild(cls, user_id):
+        """Recompute counters and streaks from the user's full session history"""
+        stats = cls.from_history(user_id, cls.query.get(user_id))
+        db.session.add(stats)
+        return stats
+    
+    @classmethod
+    def from_history(cls, user_id, stats=None):
+        """`stats` (or a new, unsaved row) with counters and streaks computed from the user's sessions"""
+        stats = stats or cls(user_id=user_id)
+        total, completed, last_workout, _ = WorkoutSession.aggregate_for_user(user_id, datetime.utcnow())
+        
+        stats.total_sessions = total
+        stats.completed_sessions = completed
+        stats.last_workout_at = last_workout
+        stats.current_streak = 0
+        stats.longest_streak = 0
+        stats.last_active_day = None
+        
+        completion_times = db.session.query(WorkoutSession.completed_at).filter(
+            WorkoutSession.user_id == user_id,
+            WorkoutSession.completed == True,
+            WorkoutSession.completed_at.isnot(None)
+        ).order_by(WorkoutSession.completed_at)
+        
+        for (completed_at,) in completion_times:
+            stats._advance_streak(completed_at.date())
+        
+        return stats
+    
+    def record_session_created(self):
+        self.total_sessions += 1
+    
+    def record_session_completed(self, completed_at):
+        self.completed_sessions += 1
+        if not self.last_workout_at or completed_at > self.last_workout_at:
+            self.last_workout_at = completed_at
+        self._advance_streak(completed_at.date())
+    
+    def _advance_streak(self, day):
+        """Extend or restart the streak for a completion on `day` (days arrive in order)"""
+        if self.last_active_day and day <= self.last_active_day:
+            return
+        
+        if self.last_active_day and day == self.last_active_day + timedelta(days=1):
+            self.current_streak += 1
+        else:
+            self.current_streak = 1
+        
+        self.longest_streak = max(self.longest_streak, self.current_streak)
+        self.last_active_day = day
+    
+    def streak_as_of(self, today):
+        """Current streak, or 0 if the user missed yesterday and hasn't trained today"""
+        if self.last_active_day and self.last_active_day >= today - timedelta(days=1):
+            return self.current_streak
+        return 0
 
 
 class SessionExercise(db.Model):
     """Exercise within a specific workout session"""
     __tablename__ = "session_exercises"
+    __table_args__ = (
+        db.Index('ix_session_exercises_session_id', 'session_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     session_id = db.Column(db.Integer, db.ForeignKey('workout_sessions.id'), nullable=False)
@@ -220,10 +418,9 @@ class SessionExercise(db.Model):
     
     exercise = db.relationship('Exercise')
     
-    def to_dict(self):
-        return {
+    def to_dict(self, fieldset=ALL):
+        result = {
             'id': self.id,
-            'exercise': self.exercise.to_dict(),
             'sets': self.sets,
             'reps': self.reps,
             'rest_seconds': self.rest_seconds,
@@ -232,9 +429,20 @@ class SessionExercise(db.Model):
             'weight_used': self.weight_used,
             'actual_reps': self.actual_reps
         }
+        if fieldset.embeds('exercise'):
+            from app.catalog import catalog_fragment
+            exercise_fieldset = fieldset.child('exercise')
+            result['exercise'] = catalog_fragment('exercise', self.exercise_id, exercise_fieldset) \
+                or self.exercise.to_dict(exercise_fieldset)
+        else:
+            result['exercise_id'] = self.exercise_id
+        return fieldset.select(result)
 class WeightHistory(db.Model):
     """Track user's weight over time"""
     __tablename__ = "weight_history"
+    __table_args__ = (
+        db.Index('ix_weight_history_user_recorded', 'user_id', 'recorded_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -248,7 +456,7 @@ class WeightHistory(db.Model):
         return {
             'id': self.id,
             'weight': self.weight,
-            'recorded_at': self.recorded_at.isoformat(),
+            'recorded_at': self.recorded_at,
             'notes': self.notes
         }
 
@@ -256,6 +464,10 @@ class WeightHistory(db.Model):
 class ExercisePersonalRecord(db.Model):
     """Track user's personal records (PRs) for exercises"""
     __tablename__ = "exercise_personal_records"
+    __table_args__ = (
+        db.Index('ix_personal_records_user_exercise_weight', 'user_id', 'exercise_id', 'weight'),
+        db.Index('ix_personal_records_user_achieved', 'user_id', 'achieved_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -273,11 +485,14 @@ class ExercisePersonalRecord(db.Model):
             'exercise': self.exercise.to_dict(),
             'weight': self.weight,
             'reps': self.reps,
-            'achieved_at': self.achieved_at.isoformat()
+            'achieved_at': self.achieved_at
         }
 class UserSchedule(db.Model):
     """User's weekly workout schedule generated by AI"""
     __tablename__ = "user_schedules"
+    __table_args__ = (
+        db.Index('ix_user_schedules_user_generated', 'user_id', 'generated_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -308,7 +523,7 @@ class UserSchedule(db.Model):
             'sessions_per_week': self.sessions_per_week,
             'session_duration': self.session_duration,
             'weekly_plan': self.weekly_plan,
-            'generated_at': self.generated_at.isoformat(),
+            'generated_at': self.generated_at,
             'is_active': self.is_active,
             'generation_status': self.generation_status
         }
@@ -317,10 +532,19 @@ class UserSchedule(db.Model):
 class CalendarEvent(db.Model):
     """Workout events in user's calendar"""
     __tablename__ = "calendar_events"
+    __table_args__ = (
+        db.Index('ix_calendar_events_user_date', 'user_id', 'date', 'start_time'),
+        # One event per plan day: repeated materialization of a plan is a no-op
+        db.Index('uq_calendar_events_schedule_date', 'schedule_id', 'date', unique=True),
+        # At most one exception row per occurrence of a recurring event
+        db.Index('uq_calendar_events_recurring_date', 'recurring_event_id', 'date', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     schedule_id = db.Column(db.Integer, db.ForeignKey('user_schedules.id'))
+    # Set when this row completes or overrides one occurrence of a recurring event
+    recurring_event_id = db.Column(db.Integer, db.ForeignKey('recurring_events.id'))
     
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text)
@@ -343,20 +567,103 @@ class CalendarEvent(db.Model):
     user = db.relationship('User', backref='calendar_events')
     schedule = db.relationship('UserSchedule')
     template = db.relationship('WorkoutTemplate')
+    recurring_event = db.relationship('RecurringEvent')
     
     def to_dict(self):
         return {
             'id': self.id,
             'title': self.title,
             'description': self.description,
-            'date': self.date.isoformat(),
-            'start_time': self.start_time.isoformat() if self.start_time else None,
-            'end_time': self.end_time.isoformat() if self.end_time else None,
+            'date': self.date,
+            'start_time': self.start_time,
+            'end_time': self.end_time,
             'duration_minutes': self.duration_minutes,
             'workout_template': self.template.to_dict() if self.template else None,
             'exercises': self.exercises,
             'completed': self.completed,
-            'completed_at': self.completed_at.isoformat() if self.completed_at else None
+            'completed_at': self.completed_at,
+            'recurring_event_id': self.recurring_event_id
+        }
+
+
+class RecurringEvent(db.Model):
+    """
+    Workout repeating every week on one weekday, stored once and expanded into
+    occurrences at read time. Completed or edited occurrences are stored as
+    CalendarEvent exception rows; cancelled ones in excluded_dates.
+    """
+    __tablename__ = "recurring_events"
+    __table_args__ = (
+        db.Index('ix_recurring_events_user_dates', 'user_id', 'starts_on', 'ends_on'),
+        db.Index('uq_recurring_events_schedule_weekday', 'schedule_id', 'weekday', unique=True),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    schedule_id = db.Column(db.Integer, db.ForeignKey('user_schedules.id'))
+    
+    title = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text)
+    
+    # Recurrence: every week on `weekday` (0=Monday) from starts_on through ends_on (open-ended if null)
+    weekday = db.Column(db.Integer, nullable=False)
+    starts_on = db.Column(db.Date, nullable=False)
+    ends_on = db.Column(db.Date)
+    excluded_dates = db.Column(db.JSON, default=list)  # ["2026-11-02", ...]
+    
+    start_time = db.Column(db.Time)
+    end_time = db.Column(db.Time)
+    duration_minutes = db.Column(db.Integer)
+    
+    workout_template_id = db.Column(db.Integer, db.ForeignKey('workout_templates.id'))
+    exercises = db.Column(db.JSON)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    schedule = db.relationship('UserSchedule')
+    template = db.relationship('WorkoutTemplate')
+    
+    def occurrence_dates(self, start, end):
+        """Dates of the occurrences between start and end (inclusive), exclusions removed"""
+        first = max(start, self.starts_on)
+        last = min(end, self.ends_on) if self.ends_on else end
+        day = first + timedelta(days=(self.weekday - first.weekday()) % 7)
+        excluded = set(self.excluded_dates or [])
+        while day <= last:
+            if day.isoformat() not in excluded:
+                yield day
+            day += timedelta(days=7)
+    
+    def occurrence_dict(self, day):
+        """One occurrence, shaped like CalendarEvent.to_dict()"""
+        return {
+            'id': None,
+            'title': self.title,
+            'description': self.description,
+            'date': day,
+            'start_time': self.start_time,
+            'end_time': self.end_time,
+            'duration_minutes': self.duration_minutes,
+            'workout_template': self.template.to_dict() if self.template else None,
+            'exercises': self.exercises,
+            'completed': False,
+            'completed_at': None,
+            'recurring_event_id': self.id
+        }
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'schedule_id': self.schedule_id,
+            'title': self.title,
+            'description': self.description,
+            'weekday': self.weekday,
+            'starts_on': self.starts_on,
+            'ends_on': self.ends_on,
+            'excluded_dates': self.excluded_dates or [],
+            'start_time': self.start_time,
+            'end_time': self.end_time,
+            'duration_minutes': self.duration_minutes,
+            'exercises': self.exercises
         }
 class Food(db.Model):
     """Atomic unit - source of truth for nutrition"""
@@ -379,13 +686,7 @@ class Food(db.Model):
     
     def calculate_nutrition(self, quantity_grams):
         """Calculate nutrition for a given quantity"""
-        multiplier = quantity_grams / 100
-        return {
-            'calories': round(self.calories_per_100g * multiplier, 1),
-            'protein': round(self.protein_per_100g * multiplier, 1),
-            'carbs': round(self.carbs_per_100g * multiplier, 1),
-            'fat': round(self.fat_per_100g * multiplier, 1)
-        }
+        return nutrition_for(self, quantity_grams)
     
     def to_dict(self):
         return {
@@ -422,27 +723,36 @@ class Meal(db.Model):
     # Relationships
     items = db.relationship('MealItem', backref='meal', lazy=True, cascade='all, delete-orphan')
     
-    def calculate_totals(self):
-        """Calculate and cache nutrition totals from all items"""
-        self.total_calories = 0
-        self.total_protein = 0
-        self.total_carbs = 0
-        self.total_fat = 0
+    def calculate_totals(self, foods=None):
+        """
+        Calculate and cache nutrition totals from all items.
+        `foods` maps food_id -> Food rows the caller already loaded; without it
+        food values come from the catalog's nutrition matrix, or from the items'
+        Food rows if this transaction changed the catalog.
+        """
+        matrix = self.nutrition_matrix(self.items, foods)
+        totals = matrix.totals((item.food_id, item.quantity) for item in self.items)
         
-        for item in self.items:
-            nutrition = item.food.calculate_nutrition(item.quantity)
-            self.total_calories += nutrition['calories']
-            self.total_protein += nutrition['protein']
-            self.total_carbs += nutrition['carbs']
-            self.total_fat += nutrition['fat']
+        self.total_calories = totals['calories']
+        self.total_protein = totals['protein']
+        self.total_carbs = totals['carbs']
+        self.total_fat = totals['fat']
+    
+    @staticmethod
+    def nutrition_matrix(items, foods=None):
+        """Nutrition matrix covering every food in `items`"""
+        if foods is not None:
+            return NutritionMatrix(foods.values())
         
-        # Round totals
-        self.total_calories = round(self.total_calories, 1)
-        self.total_protein = round(self.total_protein, 1)
-        self.total_carbs = round(self.total_carbs, 1)
-        self.total_fat = round(self.total_fat, 1)
-    
-    def to_dict(self, include_items=False):
+        from app.catalog import catalog
+        if not catalog.has_uncommitted_writes():
+            matrix = catalog.get().nutrition
+            if all(item.food_id in matrix for item in items):
+                return matrix
+        # Foods changed in this transaction (the snapshot still has the old values) or not cached yet
+        return NutritionMatrix({item.food_id: item.food for item in items}.values())
+    
+    def to_dict(self, include_items=False, fieldset=ALL):
         result = {
             'id': self.id,
             'name': self.name,
@@ -453,18 +763,27 @@ class Meal(db.Model):
             'total_protein': self.total_protein,
             'total_carbs': self.total_carbs,
             'total_fat': self.total_fat,
-            'created_at': self.created_at.isoformat()
+            'created_at': self.created_at
         }
         
-        if include_items:
-            result['items'] = [item.to_dict() for item in self.items]
+        if fieldset.embeds('items', include_items):
+            items = self.items
+            items_fieldset = fieldset.child('items')
+            nutrition = self.nutrition_matrix(items).item_nutrition(
+                (item.food_id, item.quantity) for item in items
+            ) if items and items_fieldset.wants('nutrition') else [None] * len(items)
+            result['items'] = [item.to_dict(values, items_fieldset) for item, values in zip(items, nutrition)]
         
-        return result
+        return fieldset.select(result)
 
 
 class MealItem(db.Model):
     """The glue - prevents chaos"""
     __tablename__ = "meal_items"
+    __table_args__ = (
+        db.Index('ix_meal_items_meal_id', 'meal_id'),
+        db.Index('ix_meal_items_food_id', 'food_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     meal_id = db.Column(db.Integer, db.ForeignKey('meals.id'), nullable=False)
@@ -474,19 +793,46 @@ class MealItem(db.Model):
     # Relationships
     food = db.relationship('Food', backref='meal_items')
     
-    def to_dict(self):
-        nutrition = self.food.calculate_nutrition(self.quantity)
-        return {
+    def to_dict(self, nutrition=None, fieldset=ALL):
+        from app.catalog import catalog, catalog_fragment
+        result = {
             'id': self.id,
-            'food': self.food.to_dict(),
-            'quantity': self.quantity,
-            'nutrition': nutrition
+            'quantity': self.quantity
         }
+        food_fieldset = fieldset.child('food')
+        fragment = catalog_fragment('food', self.food_id, food_fieldset) if fieldset.embeds('food') else None
+        if fragment is not None:
+            result['food'] = fragment
+        if (fieldset.embeds('food') and fragment is None) or (fieldset.wants('nutrition') and not nutrition):
+            # Prefer the already loaded Food row, otherwise the cached catalog entry
+            # (unless this transaction changed the catalog after the snapshot was taken)
+            food = self.food if 'food' in inspect(self).dict else None
+            if food is None and not catalog.has_uncommitted_writes():
+                food = catalog.get().foods.get(self.food_id)
+            if food is None:
+                food = self.food
+            food = food if isinstance(food, dict) else food.to_dict()
+            if fieldset.embeds('food') and fragment is None:
+                result['food'] = food_fieldset.select(food)
+            if fieldset.wants('nutrition'):
+                nutrition = nutrition or nutrition_for(food, self.quantity)
+        if fieldset.wants('nutrition'):
+            result['nutrition'] = nutrition
+        if not fieldset.embeds('food'):
+            result['food_id'] = self.food_id
+        return fieldset.select(result)
 
 
 class DailyMealPlan(db.Model):
     """User's daily meal plan (for n8n integration later)"""
     __tablename__ = "daily_meal_plans"
+    __table_args__ = (
+        db.Index('ix_daily_meal_plans_user_date', 'user_id', 'date'),
+        db.Index('ix_daily_meal_plans_breakfast_id', 'breakfast_id'),
+        db.Index('ix_daily_meal_plans_lunch_id', 'lunch_id'),
+        db.Index('ix_daily_meal_plans_dinner_id', 'dinner_id'),
+        db.Index('ix_daily_meal_plans_snack_id', 'snack_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -512,37 +858,66 @@ class DailyMealPlan(db.Model):
     dinner = db.relationship('Meal', foreign_keys=[dinner_id])
     snack = db.relationship('Meal', foreign_keys=[snack_id])
     
+    MEAL_SLOTS = ('breakfast', 'lunch', 'dinner', 'snack')
+    
     def calculate_totals(self):
         """Calculate daily totals"""
-        self.total_calories = 0
-        self.total_protein = 0
-        self.total_carbs = 0
-        self.total_fat = 0
+        totals = sum_totals(
+            [meal.total_calories, meal.total_protein, meal.total_carbs, meal.total_fat]
+            for meal in [self.breakfast, self.lunch, self.dinner, self.snack]
+            if meal
+        )
         
-        for meal in [self.breakfast, self.lunch, self.dinner, self.snack]:
-            if meal:
-                self.total_calories += meal.total_calories
-                self.total_protein += meal.total_protein
-                self.total_carbs += meal.total_carbs
-                self.total_fat += meal.total_fat
-    
-    def to_dict(self):
-        return {
+        self.total_calories = totals['calories']
+        self.total_protein = totals['protein']
+        self.total_carbs = totals['carbs']
+        self.total_fat = totals['fat']
+    
+    @staticmethod
+    def eager_options(fieldset=ALL):
+        """Loader options for the meals (and their items) to_dict(fieldset) serializes"""
+        options = []
+        for slot in DailyMealPlan.MEAL_SLOTS:
+            if fieldset.embeds(slot):
+                load = selectinload(getattr(DailyMealPlan, slot))
+                if fieldset.child(slot).embeds('items'):
+                    load = load.selectinload(Meal.items)
+                options.append(load)
+        return tuple(options)
+    
+    def to_dict(self, fieldset=ALL):
+        result = {
             'id': self.id,
             'user_id': self.user_id,
-            'date': self.date.isoformat(),
-            'breakfast': self.breakfast.to_dict(include_items=True) if self.breakfast else None,
-            'lunch': self.lunch.to_dict(include_items=True) if self.lunch else None,
-            'dinner': self.dinner.to_dict(include_items=True) if self.dinner else None,
-            'snack': self.snack.to_dict(include_items=True) if self.snack else None,
+            'date': self.date
+        }
+        for slot in self.MEAL_SLOTS:
+            if fieldset.embeds(slot):
+                meal = getattr(self, slot)
+                result[slot] = meal.to_dict(include_items=True, fieldset=fieldset.child(slot)) if meal else None
+            else:
+                result[f'{slot}_id'] = getattr(self, f'{slot}_id')
+        result.update({
             'total_calories': self.total_calories,
             'total_protein': self.total_protein,
             'total_carbs': self.total_carbs,
             'total_fat': self.total_fat
-        }
+        })
+        return fieldset.select(result)
+class CatalogVersion(db.Model):
+    """Single-row counter bumped whenever foods, exercises, meals or templates are written"""
+    __tablename__ = "catalog_version"
+    
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
 class MealSchedule(db.Model):
     """User's weekly meal schedule (similar to UserSchedule for workouts)"""
     __tablename__ = "meal_schedules"
+    __table_args__ = (
+        db.Index('ix_meal_schedules_user_generated', 'user_id', 'generated_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -582,7 +957,48 @@ class MealSchedule(db.Model):
             'days_to_goal': self.days_to_goal,
             'goal': self.goal,
             'weekly_plan': self.weekly_plan,
-            'generated_at': self.generated_at.isoformat(),
+            'generated_at': self.generated_at,
             'is_active': self.is_active,
             'generation_status': self.generation_status
         }
+
+
+class GenerationJob(db.Model):
+    """Queued call to an n8n plan generation webhook, run by the job workers"""
+    __tablename__ = "generation_jobs"
+    __table_args__ = (
+        db.Index('ix_generation_jobs_status_available', 'status', 'available_at'),
+        db.Index('ix_generation_jobs_request_key', 'user_id', 'kind', 'request_key', 'created_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # meal_plan, workout_plan
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    schedule_id = db.Column(db.Integer, nullable=False)  # meal_schedules.id or user_schedules.id
+    payload = db.Column(db.JSON, nullable=False)
+    request_key = db.Column(db.String(64))  # hash of the normalized request, see app.jobs.request_key
+    
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, succeeded, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    available_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # not claimable before
+    
+    # Lease held by the worker running the job; expires after the visibility timeout
+    locked_by = db.Column(db.String(100))
+    locked_until = db.Column(db.DateTime)
+    
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'schedule_id': self.schedule_id,
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'last_error': self.last_error,
+            'created_at': self.created_at
+        }
@@ -0,0 +1,94 @@
+from itertools import chain
+import numpy as np
+
+MACROS = ('calories', 'protein', 'carbs', 'fat')
+PER_100G_FIELDS = ('calories_per_100g', 'protein_per_100g', 'carbs_per_100g', 'fat_per_100g')
+
+
+def per_100g(food):
+    """[kcal, protein, carbs, fat] per 100g of a Food row or Food.to_dict()"""
+    if isinstance(food, dict):
+        return [food[field] for field in PER_100G_FIELDS]
+    return [getattr(food, field) for field in PER_100G_FIELDS]
+
+
+def macros_dict(values):
+    """{'calories', 'protein', 'carbs', 'fat'} rounded to 0.1 from a length-4 vector"""
+    return dict(zip(MACROS, np.round(values, 1).tolist()))
+
+
+def nutrition_for(food, quantity_grams):
+    """Nutrition for a quantity of a single food (plain floats: too small for NumPy to pay off)"""
+    multiplier = quantity_grams / 100
+    return {macro: round(value * multiplier, 1) for macro, value in zip(MACROS, per_100g(food))}
+
+
+class NutritionMatrix:
+    """
+    Per-100g macros of a set of foods as a (foods x 4) matrix plus an index
+    from food id to row, so a meal is one quantity-vector x matrix product
+    and a batch of meals is one sparse (meals x foods) x matrix product.
+    """
+
+    def __init__(self, foods):
+        foods = list(foods)
+        ids = [food['id'] if isinstance(food, dict) else food.id for food in foods]
+        self.index = {food_id: row for row, food_id in enumerate(ids)}
+        self.matrix = np.array([per_100g(food) for food in foods], dtype=np.float64).reshape(-1, len(MACROS))
+        # Dense food id -> row lookup (-1 for unknown ids) for vectorized indexing
+        self._rows = np.full(max(ids, default=0) + 1, -1, dtype=np.intp)
+        self._rows[ids] = np.arange(len(ids))
+
+    def __contains__(self, food_id):
+        return food_id in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def rows_for(self, food_ids):
+        """Matrix rows for an array of food ids; KeyError on unknown foods"""
+        food_ids = np.asarray(food_ids, dtype=np.intp)
+        known = (food_ids >= 0) & (food_ids < len(self._rows))
+        rows = np.where(known, self._rows[np.where(known, food_ids, 0)], -1)
+        if (rows < 0).any():
+            raise KeyError(int(food_ids[rows < 0][0]))
+        return rows
+
+    def _rows_and_quantities(self, items):
+        """Row indices and gram vectors for (food_id, quantity) pairs"""
+        pairs = np.fromiter(chain.from_iterable(items), dtype=np.float64).reshape(-1, 2)
+        return self.rows_for(pairs[:, 0]), pairs[:, 1]
+
+    def item_values(self, items):
+        """(items x 4) array of per-item macros for (food_id, quantity) pairs"""
+        rows, quantities = self._rows_and_quantities(items)
+        return self.matrix[rows] * (quantities[:, None] / 100)
+
+    def item_nutrition(self, items):
+        """Per-item nutrition dicts for (food_id, quantity) pairs"""
+        return [dict(zip(MACROS, row)) for row in np.round(self.item_values(items), 1).tolist()]
+
+    def totals(self, items):
+        """Total nutrition dict of one meal given as (food_id, quantity) pairs"""
+        rows, quantities = self._rows_and_quantities(items)
+        return macros_dict(quantities @ self.matrix[rows] / 100)
+
+    def batch_totals_arrays(self, meal_index, rows, quantities, num_meals):
+        """
+        (meals x 4) array of unrounded totals from flattened item arrays: meal
+        position, matrix row (see rows_for) and grams per item, e.g. straight
+        from a meal_items query.
+        """
+        weights = self.matrix[rows] * (quantities[:, None] / 100)
+        return np.column_stack([
+            np.bincount(meal_index, weights=weights[:, column], minlength=num_meals)
+            for column in range(len(MACROS))
+        ])
+
+
+def sum_totals(vectors):
+    """Rounded nutrition dict for the sum of several length-4 total vectors"""
+    vectors = list(vectors)
+    if not vectors:
+        return macros_dict(np.zeros(len(MACROS)))
+    return macros_dict(np.sum(vectors, axis=0))
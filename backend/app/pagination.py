@@ -0,0 +1,82 @@
+import base64
+import json
+from datetime import date, datetime, time
+from flask import request
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(values):
+    """Encode the sort key of the last row of a page into an opaque token"""
+    values = [v.isoformat() if isinstance(v, (date, datetime, time)) else v for v in values]
+    raw = json.dumps(values, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, columns):
+    """Decode a cursor token back into typed values for the given columns (raises ValueError)"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise ValueError('Invalid cursor')
+
+    decoded = []
+    for column, value in zip(columns, values):
+        python_type = column.type.python_type
+        try:
+            if python_type is datetime:
+                decoded.append(datetime.fromisoformat(value))
+            elif python_type is date:
+                decoded.append(date.fromisoformat(value))
+            elif python_type is time:
+                decoded.append(time.fromisoformat(value))
+            else:
+                decoded.append(python_type(value))
+        except (TypeError, ValueError, OverflowError):
+            raise ValueError('Invalid cursor')
+    return decoded
+
+
+def page_limit(default_limit=DEFAULT_PAGE_SIZE):
+    """The request's `limit` arg, clamped to 1..MAX_PAGE_SIZE"""
+    limit = request.args.get('limit', default=default_limit, type=int)
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def paginate(query, sort_column, id_column, descending=True, default_limit=DEFAULT_PAGE_SIZE):
+    """
+    Keyset pagination on (sort_column, id_column).
+
+    Reads `cursor` and `limit` from the request args and returns
+    (items, next_cursor). next_cursor is None on the last page.
+    Raises ValueError on a malformed cursor.
+    """
+    columns = (sort_column, id_column)
+    limit = page_limit(default_limit)
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        key = tuple_(*columns)
+        values = tuple(decode_cursor(cursor, columns))
+        query = query.filter(key < values if descending else key > values)
+
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column, id_column)
+
+    items = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        next_cursor = encode_cursor([getattr(last, c.key) for c in columns])
+
+    return items, next_cursor
@@ -0,0 +1,89 @@
+from collections import namedtuple
+from sqlalchemy import select
+from app import db
+from app.models import Exercise, Food, Meal, WeightHistory, WorkoutExercise, WorkoutTemplate
+
+
+class ReadModel:
+    """
+    The columns a model's to_dict() reads, loaded as namedtuple rows instead
+    of ORM instances: no identity map, state tracking or attribute
+    instrumentation. row.to_dict() returns the same dict as the model's
+    to_dict(). `embedded` (flat) read models are selected through the
+    caller's joins and serialized under their name, like a relationship.
+    """
+
+    def __init__(self, name, *columns, **embedded):
+        self.columns = columns
+        self.keys = tuple(column.key for column in columns)
+        self.embedded = embedded
+        width = len(columns)
+        parts = [(name, model.keys, model.width) for name, model in embedded.items()]
+        keys = self.keys
+
+        def to_dict(row):
+            result = dict(zip(keys, row))
+            start = width
+            for embedded_name, embedded_keys, embedded_width in parts:
+                result[embedded_name] = dict(zip(embedded_keys, row[start:start + embedded_width]))
+                start += embedded_width
+            return result
+
+        fields = list(self.keys) + [f'{embedded_name}__{key}' for embedded_name, keys, _ in parts for key in keys]
+        self.row = type(name, (namedtuple(name, fields),), {'__slots__': (), 'to_dict': to_dict})
+
+    @property
+    def width(self):
+        return len(self.columns)
+
+    def select(self, *leading):
+        """SELECT of `leading` columns (e.g. a grouping key) followed by the row's columns"""
+        embedded = (column for model in self.embedded.values() for column in model.columns)
+        return select(*leading, *self.columns, *embedded)
+
+    def rows(self, statement, session=None):
+        """The rows of a statement built with select()"""
+        make = self.row._make
+        return [make(values) for values in (session or db.session).execute(statement).tuples()]
+
+    def keyed_rows(self, statement, session=None):
+        """(key, row) pairs of a statement built with select(key_column)"""
+        make = self.row._make
+        return [(values[0], make(values[1:])) for values in (session or db.session).execute(statement).tuples()]
+
+
+FOOD = ReadModel(
+    'FoodRow',
+    Food.id, Food.name, Food.category, Food.calories_per_100g, Food.protein_per_100g,
+    Food.carbs_per_100g, Food.fat_per_100g, Food.unit, Food.is_common
+)
+
+EXERCISE = ReadModel(
+    'ExerciseRow',
+    Exercise.id, Exercise.name, Exercise.muscle_group, Exercise.equipment, Exercise.difficulty, Exercise.instructions
+)
+
+WORKOUT_TEMPLATE = ReadModel(
+    'WorkoutTemplateRow',
+    WorkoutTemplate.id, WorkoutTemplate.name, WorkoutTemplate.description, WorkoutTemplate.goal,
+    WorkoutTemplate.level, WorkoutTemplate.duration_minutes
+)
+
+# Select from WorkoutExercise joined to Exercise
+WORKOUT_EXERCISE = ReadModel(
+    'WorkoutExerciseRow',
+    WorkoutExercise.id, WorkoutExercise.sets, WorkoutExercise.reps, WorkoutExercise.rest_seconds, WorkoutExercise.order,
+    exercise=EXERCISE
+)
+
+# Meal.to_dict() without items
+MEAL = ReadModel(
+    'MealRow',
+    Meal.id, Meal.name, Meal.meal_type, Meal.goal, Meal.description,
+    Meal.total_calories, Meal.total_protein, Meal.total_carbs, Meal.total_fat, Meal.created_at
+)
+
+WEIGHT_HISTORY = ReadModel(
+    'WeightHistoryRow',
+    WeightHistory.id, WeightHistory.weight, WeightHistory.recorded_at, WeightHistory.notes
+)
@@ -1,16 +1,15 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from app import db
-from app.models import User, UserSchedule, CalendarEvent, WorkoutTemplate
+from app.models import User, UserSchedule, WorkoutTemplate
+from app.pagination import paginate
+from app.jobs import coalesced_response, enqueue_generation, find_duplicate_generation
+from app.http_client import webhook_client
+from app.workout_planner import generate_weekly_workout_plan
+from app.calendar_events import materialize_plan
 from flask_jwt_extended import jwt_required, get_jwt_identity
-import requests
-from datetime import datetime, timedelta
-import os
 
 ai_planner_bp = Blueprint('ai_planner', __name__, url_prefix='/api/ai-planner')
 
-# n8n webhook URL (configure in .env)
-N8N_WORKOUT_WEBHOOK_URL = os.getenv('N8N_WORKOUT_WEBHOOK_URL', 'http://localhost:5678/webhook/generate-workout-plan')
-
 
 @ai_planner_bp.route('/generate', methods=['POST'])
 @jwt_required()
@@ -18,6 +17,8 @@ def generate_workout_plan():
     """
     Request AI to generate a personalized weekly workout plan
     User provides: available days, time slots, fitness goal, duration
+    With mode=local, or while n8n is unavailable, the plan is built right away
+    by the rule-based planner and its calendar events are created
     """
     user_id = get_jwt_identity()
     user = User.query.get_or_404(user_id)
@@ -29,22 +30,9 @@ def generate_workout_plan():
         return jsonify({'error': 'Missing required fields'}), 400
     
     try:
-        # Create schedule record
-        schedule = UserSchedule(
-            user_id=user_id,
-            available_days=data['available_days'],
-            available_time_slots=data.get('available_time_slots', {}),
-            sessions_per_week=data['sessions_per_week'],
-            session_duration=data.get('session_duration', 60),
-            generation_status='processing'
-        )
-        db.session.add(schedule)
-        db.session.commit()
-        
         # Prepare payload for n8n
         payload = {
             'user_id': user_id,
-            'schedule_id': schedule.id,
             'user_data': {
                 'age': user.age,
                 'weight': user.weight,
@@ -58,33 +46,69 @@ def generate_workout_plan():
                 'sessions_per_week': data['sessions_per_week'],
                 'session_duration': data.get('session_duration', 60),
                 'equipment_access': data.get('equipment_access', ['bodyweight', 'dumbbell', 'barbell']),
-                'experience_level': data.get('experience_level', 'beginner')
+                'experience_level': data.get('experience_level', (user.workout_difficulty or 'beginner').lower())
             },
             'callback_url': f"{request.host_url}api/ai-planner/webhook/plan-ready"
         }
         
-        # Trigger n8n workflow
-        response = requests.post(
-            N8N_WORKOUT_WEBHOOK_URL,
-            json=payload,
-        timeout=300
-        )
-        
-        if response.status_code == 200:
-            n8n_response = response.json()
-            schedule.n8n_workflow_id = n8n_response.get('workflow_id')
-            db.session.commit()
+        # Local planner on request, or when the n8n circuit is open
+        mode = data.get('mode', 'ai')
+        if mode not in ('ai', 'local'):
+            return jsonify({'error': "mode must be 'ai' or 'local'"}), 400
+        if mode == 'ai' and webhook_client.is_open(current_app.config['N8N_WORKOUT_WEBHOOK_URL']):
+            mode = 'local'
+        if mode == 'local':
+            weekly_plan = generate_weekly_workout_plan(payload['preferences'], user.fitness_goal)
+            schedule = UserSchedule(
+                user_id=user_id,
+                available_days=data['available_days'],
+                available_time_slots=data.get('available_time_slots', {}),
+                sessions_per_week=data['sessions_per_week'],
+                session_duration=data.get('session_duration', 60),
+                weekly_plan=weekly_plan,
+                generation_status='completed'
+            )
+            db.session.add(schedule)
+            db.session.flush()
+            create_calendar_events_from_plan(schedule, weekly_plan)
             
             return jsonify({
-                'message': 'AI workout plan generation started',
+                'message': 'Workout plan generated',
                 'schedule_id': schedule.id,
-                'status': 'processing',
-                'estimated_time': '30-60 seconds'
-            }), 202
-        else:
-            schedule.generation_status = 'failed'
-            db.session.commit()
-            return jsonify({'error': 'Failed to trigger n8n workflow'}), 500
+                'status': 'completed',
+                'mode': 'local',
+                'schedule': schedule.to_dict()
+            }), 201
+        
+        # Double taps and client retries attach to the first identical request
+        duplicate = find_duplicate_generation('workout_plan', user_id, payload)
+        if duplicate:
+            body, status_code = coalesced_response(duplicate, 'workout plan')
+            return jsonify(body), status_code
+        
+        # Create schedule record
+        schedule = UserSchedule(
+            user_id=user_id,
+            available_days=data['available_days'],
+            available_time_slots=data.get('available_time_slots', {}),
+            sessions_per_week=data['sessions_per_week'],
+            session_duration=data.get('session_duration', 60),
+            generation_status='pending'
+        )
+        db.session.add(schedule)
+        db.session.flush()
+        payload['schedule_id'] = schedule.id
+        
+        # The n8n webhook is called by the background job workers
+        enqueue_generation('workout_plan', schedule, payload)
+        db.session.commit()
+        
+        return jsonify({
+            'message': 'AI workout plan generation queued',
+            'schedule_id': schedule.id,
+            'status': 'pending',
+            'estimated_time': '30-60 seconds'
+        }), 202
             
     except Exception as e:
         db.session.rollback()
@@ -128,7 +152,7 @@ def receive_generated_plan():
         return jsonify({'error': 'Failed to save plan', 'details': str(e)}), 500
 
 
-def create_calendar_events_from_plan(schedule, weekly_plan):
+def create_calendar_events_from_plan(schedule, weekly_plan, weeks=None):
     """
     Convert AI-generated weekly plan into calendar events
     
@@ -142,54 +166,18 @@ def create_calendar_events_from_plan(schedule, weekly_plan):
         },
         ...
     }
-    """
-    user = schedule.user
-    today = datetime.utcnow().date()
-    
-    # Map day names to numbers (0=Monday)
-    day_mapping = {
-        'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3,
-        'friday': 4, 'saturday': 5, 'sunday': 6
-    }
-    
-    # Time slot mapping
-    time_slots = {
-        'morning': ('08:00', '09:00'),
-        'afternoon': ('14:00', '15:00'),
-        'evening': ('18:00', '19:00')
-    }
-    
-    for day_name, workout_info in weekly_plan.items():
-        if day_name.lower() not in day_mapping:
-            continue
-        
-        # Calculate next occurrence of this day
-        target_day = day_mapping[day_name.lower()]
-        days_ahead = target_day - today.weekday()
-        if days_ahead <= 0:
-            days_ahead += 7
-        
-        event_date = today + timedelta(days=days_ahead)
-        
-        # Get time slot
-        time_slot = workout_info.get('time', 'morning')
-        start_time_str, end_time_str = time_slots.get(time_slot, ('08:00', '09:00'))
-        
-        # Create calendar event
-        event = CalendarEvent(
-            user_id=user.id,
-            schedule_id=schedule.id,
-            title=workout_info.get('workout', 'Workout Session'),
-            description=workout_info.get('description', ''),
-            date=event_date,
-            start_time=datetime.strptime(start_time_str, '%H:%M').time(),
-            end_time=datetime.strptime(end_time_str, '%H:%M').time(),
-            duration_minutes=workout_info.get('duration', 60),
-            exercises=workout_info.get('exercises', [])
-        )
-        db.session.add(event)
     
+    Each day becomes a weekly recurring event, repeating for `weeks` weeks
+    (CALENDAR_PLAN_WEEKS, 0 = until a newer plan replaces it) and expanded
+    when the calendar is read. All rules are written in one bulk insert;
+    days that already have a rule for this schedule are left as they are,
+    so repeated callbacks create nothing.
+    """
+    if weeks is None:
+        weeks = current_app.config['CALENDAR_PLAN_WEEKS']
+    created = materialize_plan(schedule, weekly_plan, weeks or None)
     db.session.commit()
+    return created
 
 
 @ai_planner_bp.route('/status/<int:schedule_id>', methods=['GET'])
@@ -215,12 +203,16 @@ def get_my_plans():
     """Get all AI-generated plans for user"""
     user_id = get_jwt_identity()
     
-    schedules = UserSchedule.query.filter_by(user_id=user_id)\
-        .order_by(UserSchedule.generated_at.desc())\
-        .all()
+    query = UserSchedule.query.filter_by(user_id=user_id)
+    
+    try:
+        schedules, next_cursor = paginate(query, UserSchedule.generated_at, UserSchedule.id)
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
     
     return jsonify({
-        'plans': [s.to_dict() for s in schedules]
+        'plans': [s.to_dict() for s in schedules],
+        'next_cursor': next_cursor
     }), 200
 
 
@@ -1,33 +1,85 @@
-from flask import Blueprint, request, jsonify
+from calendar import monthrange
+from flask import Blueprint, current_app, request, jsonify
 from app import db
-from app.models import CalendarEvent, User
+from app.models import CalendarEvent, RecurringEvent, User
+from app.pagination import decode_cursor, encode_cursor, page_limit
+from app.calendar_events import (
+    calendar_summary, cancel_occurrence, event_sort_key, expand_occurrences, materialize_occurrence, merge_events
+)
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from datetime import datetime, timedelta
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import func, tuple_
 
 calendar_bp = Blueprint('calendar', __name__, url_prefix='/api/calendar')
 
+# Longest range served by the summary endpoint, in days
+MAX_SUMMARY_DAYS = 92
+
+# Column types of the events cursor: (date, start time, 0 for stored events / 1 for occurrences, event / rule id)
+CURSOR_COLUMNS = (CalendarEvent.date, CalendarEvent.start_time, CalendarEvent.id, CalendarEvent.id)
+
 
 @calendar_bp.route('/events', methods=['GET'])
 @jwt_required()
 def get_calendar_events():
-    """Get user's calendar events with optional date range"""
+    """
+    Get user's calendar events with optional date range, recurring workouts
+    expanded into occurrences (from today without start_date, up to
+    CALENDAR_EXPANSION_DAYS ahead without end_date). Stored events and
+    occurrences are paginated together, in calendar order.
+    """
     user_id = get_jwt_identity()
     
     # Query params
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
+    start = datetime.fromisoformat(start_date).date() if start_date else None
+    end = datetime.fromisoformat(end_date).date() if end_date else None
+    limit = page_limit()
+    today = datetime.utcnow().date()
     
     query = CalendarEvent.query.filter_by(user_id=user_id)
     
-    if start_date:
-        query = query.filter(CalendarEvent.date >= datetime.fromisoformat(start_date).date())
-    if end_date:
-        query = query.filter(CalendarEvent.date <= datetime.fromisoformat(end_date).date())
+    if start:
+        query = query.filter(CalendarEvent.date >= start)
+    if end:
+        query = query.filter(CalendarEvent.date <= end)
+    
+    # Cursor: event_sort_key() of the previous page's last item
+    start_time = func.coalesce(CalendarEvent.start_time, time.min)
+    after = None
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            after = tuple(decode_cursor(cursor, CURSOR_COLUMNS))
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        day, at, kind, key = after
+        if kind == 0:
+            query = query.filter(tuple_(CalendarEvent.date, start_time, CalendarEvent.id) > (day, at, key))
+        else:
+            query = query.filter(tuple_(CalendarEvent.date, start_time) > (day, at))
+    
+    events = query.order_by(CalendarEvent.date, start_time, CalendarEvent.id).limit(limit + 1).all()
     
-    events = query.order_by(CalendarEvent.date, CalendarEvent.start_time).all()
+    # Occurrences up to the first stored event that can't make this page
+    window_start = max(start or today, after[0] if after else date.min)
+    if len(events) > limit:
+        window_end = events[limit].date
+    else:
+        window_end = end or today + timedelta(days=current_app.config['CALENDAR_EXPANSION_DAYS'])
+    occurrences = [
+        o for o in expand_occurrences(user_id, window_start, window_end)
+        if after is None or event_sort_key(o) > after
+    ] if window_start <= window_end else []
+    
+    merged = merge_events(events, occurrences)
+    page = merged[:limit]
+    next_cursor = encode_cursor(event_sort_key(page[-1])) if len(merged) > limit else None
     
     return jsonify({
-        'events': [e.to_dict() for e in events]
+        'events': page,
+        'next_cursor': next_cursor
     }), 200
 
 
@@ -50,7 +102,49 @@ def get_week_events():
     return jsonify({
         'week_start': week_start.isoformat(),
         'week_end': week_end.isoformat(),
-        'events': [e.to_dict() for e in events]
+        'events': merge_events(events, expand_occurrences(user_id, week_start, week_end))
+    }), 200
+
+
+def _month_end(day):
+    """Last day of `day`'s month"""
+    return day.replace(day=monthrange(day.year, day.month)[1])
+
+
+@calendar_bp.route('/summary', methods=['GET'])
+@jwt_required()
+def get_calendar_summary():
+    """
+    Per-day event counts, completion and titles for month views
+    Query params: month=YYYY-MM, or start_date and end_date (default: current month)
+    """
+    user_id = get_jwt_identity()
+    
+    try:
+        month = request.args.get('month')
+        if month:
+            start = datetime.strptime(month, '%Y-%m').date()
+            end = _month_end(start)
+        else:
+            today = datetime.utcnow().date()
+            start_date = request.args.get('start_date')
+            end_date = request.args.get('end_date')
+            start = datetime.fromisoformat(start_date).date() if start_date else today.replace(day=1)
+            end = datetime.fromisoformat(end_date).date() if end_date else _month_end(start)
+    except ValueError:
+        return jsonify({'error': 'Invalid date'}), 400
+    
+    if end < start or (end - start).days >= MAX_SUMMARY_DAYS:
+        return jsonify({'error': f'Date range must be 1 to {MAX_SUMMARY_DAYS} days'}), 400
+    
+    days = calendar_summary(user_id, start, end)
+    
+    return jsonify({
+        'start_date': start.isoformat(),
+        'end_date': end.isoformat(),
+        'days': days,
+        'total_events': sum(d['events'] for d in days),
+        'total_completed': sum(d['completed'] for d in days)
     }), 200
 
 
@@ -141,11 +235,127 @@ def delete_event(event_id):
     ).first_or_404()
     
     try:
-        db.session.delete(event)
+        if event.recurring_event_id:
+            # Deleting an occurrence's exception row cancels the occurrence
+            cancel_occurrence(event.recurring_event, event.date)
+        else:
+            db.session.delete(event)
+        db.session.commit()
+        
+        return jsonify({'message': 'Event deleted'}), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to delete event', 'details': str(e)}), 500
+
+
+# ========== RECURRING EVENTS ==========
+
+@calendar_bp.route('/recurring', methods=['GET'])
+@jwt_required()
+def get_recurring_events():
+    """Get user's recurring events (weekly rules)"""
+    user_id = get_jwt_identity()
+    
+    rules = RecurringEvent.query.filter_by(user_id=user_id).order_by(RecurringEvent.starts_on, RecurringEvent.id).all()
+    
+    return jsonify({
+        'recurring_events': [r.to_dict() for r in rules]
+    }), 200
+
+
+def _occurrence_request(rule_id, occurrence_date):
+    """(rule, date) for the current user, or (None, error response)"""
+    user_id = get_jwt_identity()
+    rule = RecurringEvent.query.filter_by(id=rule_id, user_id=user_id).first_or_404()
+    try:
+        return rule, date.fromisoformat(occurrence_date)
+    except ValueError:
+        return None, (jsonify({'error': 'Invalid date'}), 400)
+
+
+@calendar_bp.route('/recurring/<int:rule_id>/occurrences/<occurrence_date>/complete', methods=['PATCH'])
+@jwt_required()
+def complete_occurrence(rule_id, occurrence_date):
+    """Mark one occurrence of a recurring event as completed"""
+    rule, day = _occurrence_request(rule_id, occurrence_date)
+    if rule is None:
+        return day
+    
+    try:
+        event = materialize_occurrence(rule, day)
+        event.completed = True
+        event.completed_at = datetime.utcnow()
+        db.session.commit()
+        
+        return jsonify({
+            'message': 'Event marked as completed',
+            'event': event.to_dict()
+        }), 200
+        
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to complete event', 'details': str(e)}), 500
+
+
+@calendar_bp.route('/recurring/<int:rule_id>/occurrences/<occurrence_date>', methods=['PATCH'])
+@jwt_required()
+def override_occurrence(rule_id, occurrence_date):
+    """Change one occurrence of a recurring event (title, description, times, exercises)"""
+    rule, day = _occurrence_request(rule_id, occurrence_date)
+    if rule is None:
+        return day
+    data = request.get_json() or {}
+    
+    if 'title' in data and not (isinstance(data['title'], str) and data['title'].strip()):
+        return jsonify({'error': 'title cannot be empty'}), 400
+    changes = {field: data[field] for field in ('title', 'description', 'duration_minutes', 'exercises') if field in data}
+    try:
+        for field in ('start_time', 'end_time'):
+            if field in data:
+                changes[field] = datetime.strptime(data[field], '%H:%M').time() if data[field] else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid time, expected HH:MM'}), 400
+    
+    try:
+        event = materialize_occurrence(rule, day)
+        for field, value in changes.items():
+            setattr(event, field, value)
+        db.session.commit()
+        
+        return jsonify({
+            'message': 'Event updated',
+            'event': event.to_dict()
+        }), 200
+        
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to update event', 'details': str(e)}), 500
+
+
+@calendar_bp.route('/recurring/<int:rule_id>/occurrences/<occurrence_date>', methods=['DELETE'])
+@jwt_required()
+def delete_occurrence(rule_id, occurrence_date):
+    """Cancel one occurrence of a recurring event"""
+    rule, day = _occurrence_request(rule_id, occurrence_date)
+    if rule is None:
+        return day
+    
+    try:
+        cancel_occurrence(rule, day)
         db.session.commit()
         
         return jsonify({'message': 'Event deleted'}), 200
         
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 404
     except Exception as e:
         db.session.rollback()
-        return jsonify({'error': 'Failed to delete event', 'details': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': 'Failed to delete event', 'details': str(e)}), 500
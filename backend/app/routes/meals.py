@@ -1,10 +1,15 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from app import db
 from app.models import Food, Meal, MealItem, DailyMealPlan, User, MealSchedule
+from app.pagination import paginate
+from app.fieldsets import Fieldset
+from app.catalog import catalog, conditional_catalog_get
+from app.read_models import MEAL
+from app.jobs import coalesced_response, enqueue_generation, find_duplicate_generation
+from app.meal_planner import apply_generated_plan, generate_weekly_meal_plan
+from app.http_client import webhook_client
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, date
-import requests
-import os
 import json
 
 meals_bp = Blueprint('meals', __name__, url_prefix='/api/meals')
@@ -12,22 +17,16 @@ meals_bp = Blueprint('meals', __name__, url_prefix='/api/meals')
 # ========== FOODS ==========
 
 @meals_bp.route('/foods', methods=['GET'])
+@conditional_catalog_get
 def get_foods():
     """Get all foods with optional filters"""
     category = request.args.get('category')
     common_only = request.args.get('common', 'false').lower() == 'true'
     
-    query = Food.query
-    
-    if category:
-        query = query.filter_by(category=category)
-    if common_only:
-        query = query.filter_by(is_common=True)
-    
-    foods = query.order_by(Food.name).all()
+    foods = catalog.get().food_list(category=category, common_only=common_only)
     
     return jsonify({
-        'foods': [f.to_dict() for f in foods],
+        'foods': foods,
         'count': len(foods)
     }), 200
 
@@ -56,14 +55,14 @@ def get_meals():
     meal_type = request.args.get('type')
     goal = request.args.get('goal')
     
-    query = Meal.query
+    query = MEAL.select()
     
     if meal_type:
-        query = query.filter_by(meal_type=meal_type)
+        query = query.where(Meal.meal_type == meal_type)
     if goal:
-        query = query.filter_by(goal=goal)
+        query = query.where(Meal.goal == goal)
     
-    meals = query.order_by(Meal.meal_type, Meal.name).all()
+    meals = MEAL.rows(query.order_by(Meal.meal_type, Meal.name))
     return jsonify({
         'meals': [m.to_dict() for m in meals],
         'count': len(meals)
@@ -77,58 +76,158 @@ def get_meal(meal_id):
     return jsonify({'meal': meal.to_dict(include_items=True)}), 200
 
 
+MAX_BULK_MEALS = 1000
+
+
+def _load_foods(items_data):
+    """Resolve every food_id referenced by the items with a single IN query"""
+    food_ids = {item.get('food_id') for item in items_data if item.get('food_id')}
+    if not food_ids:
+        return {}
+    return {f.id: f for f in Food.query.filter(Food.id.in_(food_ids)).all()}
+
+
+def _build_meal_items(items_data, foods):
+    """
+    Validate item payloads against already-loaded foods.
+    Returns (items, None) or (None, (error message, status code)).
+    """
+    items = []
+    for item_data in items_data:
+        food_id = item_data.get('food_id')
+        quantity = item_data.get('quantity')
+        
+        if not food_id or not quantity:
+            return None, ('Each item must have food_id and quantity', 400)
+        
+        food = foods.get(food_id)
+        if not food:
+            return None, (f'Food with id {food_id} not found', 404)
+        
+        if quantity < 1 or quantity > 1000:
+            return None, ('Quantity must be between 1-1000g', 400)
+        
+        items.append(MealItem(food=food, food_id=food.id, quantity=quantity))
+    
+    return items, None
+
+
+def _normalize_items(items_data):
+    """
+    Coerce each item's food_id to int in place, so it matches the keys of
+    _load_foods. Returns an error message for malformed items, else None.
+    """
+    if not isinstance(items_data, list):
+        return 'items must be a list'
+    for item_data in items_data:
+        if not isinstance(item_data, dict):
+            return 'Each item must have food_id and quantity'
+        if item_data.get('food_id'):
+            try:
+                item_data['food_id'] = int(item_data['food_id'])
+            except (TypeError, ValueError):
+                return f"Invalid food_id {item_data['food_id']!r}"
+    return None
+
+
+def _validate_meal_payload(data):
+    """Required-field checks shared by create_meal and bulk_create_meals"""
+    if not isinstance(data, dict) or not data.get('name') or not data.get('meal_type'):
+        return 'Name and meal_type are required'
+    if not data.get('items') or len(data['items']) == 0:
+        return 'Meal must have at least one item'
+    return _normalize_items(data['items'])
+
+
 @meals_bp.route('/', methods=['POST'])
 @jwt_required()
 def create_meal():
     """Create a new meal"""
     data = request.get_json()
     
-    if not data.get('name') or not data.get('meal_type'):
-        return jsonify({'error': 'Name and meal_type are required'}), 400
+    error = _validate_meal_payload(data)
+    if error:
+        return jsonify({'error': error}), 400
     
-    if not data.get('items') or len(data['items']) == 0:
-        return jsonify({'error': 'Meal must have at least one item'}), 400
+    foods = _load_foods(data['items'])
+    items, error = _build_meal_items(data['items'], foods)
+    if error:
+        return jsonify({'error': error[0]}), error[1]
     
     meal = Meal(
         name=data['name'],
         meal_type=data['meal_type'],
         goal=data.get('goal'),
-        description=data.get('description')
+        description=data.get('description'),
+        items=items
     )
+    meal.calculate_totals(foods)
     db.session.add(meal)
     db.session.flush()
     
-    for item_data in data['items']:
-        food_id = item_data.get('food_id')
-        quantity = item_data.get('quantity')
-        
-        if not food_id or not quantity:
-            db.session.rollback()
-            return jsonify({'error': 'Each item must have food_id and quantity'}), 400
-        
-        food = Food.query.get(food_id)
-        if not food:
-            db.session.rollback()
-            return jsonify({'error': f'Food with id {food_id} not found'}), 404
-        
-        if quantity < 1 or quantity > 1000:
-            db.session.rollback()
-            return jsonify({'error': f'Quantity must be between 1-1000g'}), 400
+    # Serialize before commit so the loaded items and foods aren't expired and re-fetched
+    result = meal.to_dict(include_items=True)
+    db.session.commit()
+    
+    return jsonify({
+        'message': 'Meal created successfully',
+        'meal': result
+    }), 201
+
+
+@meals_bp.route('/bulk', methods=['POST'])
+@jwt_required()
+def bulk_create_meals():
+    """
+    Create many meals in one transaction (e.g. importing a menu)
+    Body: {"meals": [{name, meal_type, goal, description, items: [{food_id, quantity}]}, ...]}
+    Nothing is written if any meal is invalid.
+    """
+    data = request.get_json()
+    
+    if not data or not isinstance(data.get('meals'), list) or not data['meals']:
+        return jsonify({'error': 'meals must be a non-empty list'}), 400
+    
+    if len(data['meals']) > MAX_BULK_MEALS:
+        return jsonify({'error': f'At most {MAX_BULK_MEALS} meals per request'}), 400
+    
+    for index, meal_data in enumerate(data['meals']):
+        error = _validate_meal_payload(meal_data)
+        if error:
+            return jsonify({'error': error, 'index': index}), 400
+    
+    # One IN query for every food referenced by every meal
+    foods = _load_foods([item for meal_data in data['meals'] for item in meal_data['items']])
+    
+    meals = []
+    for index, meal_data in enumerate(data['meals']):
+        items, error = _build_meal_items(meal_data['items'], foods)
+        if error:
+            return jsonify({'error': error[0], 'index': index}), error[1]
         
-        item = MealItem(
-            meal_id=meal.id,
-            food_id=food_id,
-            quantity=quantity
+        meal = Meal(
+            name=meal_data['name'],
+            meal_type=meal_data['meal_type'],
+            goal=meal_data.get('goal'),
+            description=meal_data.get('description'),
+            items=items
         )
-        db.session.add(item)
+        meal.calculate_totals(foods)
+        meals.append(meal)
     
-    db.session.flush()
-    meal.calculate_totals()
-    db.session.commit()
+    try:
+        db.session.add_all(meals)
+        db.session.flush()
+        result = [m.to_dict() for m in meals]
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to create meals', 'details': str(e)}), 500
     
     return jsonify({
-        'message': 'Meal created successfully',
-        'meal': meal.to_dict(include_items=True)
+        'message': f'{len(meals)} meals created successfully',
+        'count': len(meals),
+        'meals': result
     }), 201
 
 
@@ -139,6 +238,15 @@ def update_meal(meal_id):
     meal = Meal.query.get_or_404(meal_id)
     data = request.get_json()
     
+    if 'items' in data:
+        error = _normalize_items(data['items'])
+        if error:
+            return jsonify({'error': error}), 400
+        foods = _load_foods(data['items'])
+        items, error = _build_meal_items(data['items'], foods)
+        if error:
+            return jsonify({'error': error[0]}), error[1]
+    
     if 'name' in data:
         meal.name = data['name']
     if 'meal_type' in data:
@@ -149,40 +257,18 @@ def update_meal(meal_id):
         meal.description = data['description']
     
     if 'items' in data:
-        MealItem.query.filter_by(meal_id=meal.id).delete()
-        
-        for item_data in data['items']:
-            food_id = item_data.get('food_id')
-            quantity = item_data.get('quantity')
-            
-            if not food_id or not quantity:
-                db.session.rollback()
-                return jsonify({'error': 'Each item must have food_id and quantity'}), 400
-            
-            food = Food.query.get(food_id)
-            if not food:
-                db.session.rollback()
-                return jsonify({'error': f'Food with id {food_id} not found'}), 404
-            
-            if quantity < 1 or quantity > 1000:
-                db.session.rollback()
-                return jsonify({'error': f'Quantity must be between 1-1000g'}), 400
-            
-            item = MealItem(
-                meal_id=meal.id,
-                food_id=food_id,
-                quantity=quantity
-            )
-            db.session.add(item)
-        
-        db.session.flush()
-        meal.calculate_totals()
+        # Old items are deleted through the delete-orphan cascade
+        with db.session.no_autoflush:
+            meal.items = items
+        meal.calculate_totals(foods)
     
+    db.session.flush()
+    result = meal.to_dict(include_items=True)
     db.session.commit()
     
     return jsonify({
         'message': 'Meal updated successfully',
-        'meal': meal.to_dict(include_items=True)
+        'meal': result
     }), 200
 
 
@@ -229,12 +315,13 @@ def get_recommended_meals():
 @meals_bp.route('/plans', methods=['GET'])
 @jwt_required()
 def get_meal_plans():
-    """Get user's meal plans"""
+    """Get user's meal plans (supports fields= / include= / exclude=)"""
     user_id = get_jwt_identity()
+    fieldset = Fieldset.from_request()
     
     date_str = request.args.get('date')
     
-    query = DailyMealPlan.query.filter_by(user_id=user_id)
+    query = DailyMealPlan.query.filter_by(user_id=user_id).options(*DailyMealPlan.eager_options(fieldset))
     
     if date_str:
         try:
@@ -243,22 +330,28 @@ def get_meal_plans():
         except ValueError:
             return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
     
-    plans = query.order_by(DailyMealPlan.date.desc()).all()
+    try:
+        plans, next_cursor = paginate(query, DailyMealPlan.date, DailyMealPlan.id)
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
     
     return jsonify({
-        'plans': [p.to_dict() for p in plans],
-        'count': len(plans)
+        'plans': [p.to_dict(fieldset) for p in plans],
+        'count': len(plans),
+        'next_cursor': next_cursor
     }), 200
 
 
 @meals_bp.route('/plans/<int:plan_id>', methods=['GET'])
 @jwt_required()
 def get_meal_plan(plan_id):
-    """Get specific meal plan"""
+    """Get specific meal plan (supports fields= / include= / exclude=)"""
     user_id = get_jwt_identity()
-    plan = DailyMealPlan.query.filter_by(id=plan_id, user_id=user_id).first_or_404()
+    fieldset = Fieldset.from_request()
+    plan = DailyMealPlan.query.filter_by(id=plan_id, user_id=user_id)\
+        .options(*DailyMealPlan.eager_options(fieldset)).first_or_404()
     
-    return jsonify({'plan': plan.to_dict()}), 200
+    return jsonify({'plan': plan.to_dict(fieldset)}), 200
 
 
 @meals_bp.route('/plans', methods=['POST'])
@@ -418,68 +511,97 @@ def get_user_meal_stats():
 @meals_bp.route('/generate-plan', methods=['POST'])
 @jwt_required()
 def generate_meal_plan():
-    """Trigger AI meal plan generation"""
+    """
+    Trigger meal plan generation: queued for the n8n AI workflow, or built
+    right away by the local solver with mode=local or while n8n is unavailable
+    """
     user_id = get_jwt_identity()
     user = User.query.get_or_404(user_id)
-    data = request.get_json()
+    data = request.get_json() or {}
     
     # Validate required fields
     required = ['goal_weight', 'days_to_goal', 'goal']
     if not all(field in data for field in required):
         return jsonify({'error': 'Missing required fields: goal_weight, days_to_goal, goal'}), 400
     
-    # Create pending schedule
-    schedule = MealSchedule(
-        user_id=user_id,
-        current_weight=user.weight or data.get('current_weight'),
-        goal_weight=data['goal_weight'],
-        days_to_goal=data['days_to_goal'],
-        goal=data['goal'],
-        generation_status='pending'
-    )
-    db.session.add(schedule)
-    db.session.commit()
-    
-    # Prepare payload for n8n
-    payload = {
-        'user_id': user_id,
-        'schedule_id': schedule.id,
-        'current_weight': user.weight or data.get('current_weight'),
-        'goal_weight': data['goal_weight'],
-        'days_to_goal': data['days_to_goal'],
-        'goal': data['goal'],
-        'age': user.age,
-        'gender': user.gender,
-        'height': user.height,
-        'activity_level': data.get('activity_level', 'moderate'),
-        'dietary_restrictions': data.get('dietary_restrictions', []),
-        'meals_per_day': data.get('meals_per_day', 4)
-    }
-    
-    # Call n8n webhook
-    N8N_URL = os.getenv('N8N_MEAL_WEBHOOK_URL', 'http://localhost:5678/webhook/generate-meal-plan')
+    # The local solver and n8n both divide by days_to_goal
+    try:
+        current_weight = float(user.weight or data.get('current_weight'))
+        goal_weight = float(data['goal_weight'])
+        days_to_goal = int(data['days_to_goal'])
+    except (TypeError, ValueError, OverflowError):
+        return jsonify({'error': 'current_weight, goal_weight and days_to_goal must be numbers'}), 400
+    if not all(0 < value < float('inf') for value in (current_weight, goal_weight, days_to_goal)):
+        return jsonify({'error': 'current_weight, goal_weight and days_to_goal must be positive'}), 400
+    
+    # Local solver on request, or when the n8n circuit is open
+    mode = data.get('mode', 'ai')
+    if mode not in ('ai', 'local'):
+        return jsonify({'error': "mode must be 'ai' or 'local'"}), 400
+    if mode == 'ai' and webhook_client.is_open(current_app.config['N8N_MEAL_WEBHOOK_URL']):
+        mode = 'local'
     
     try:
-        response = requests.post(N8N_URL, json=payload, timeout=300)
+        # Prepare payload for n8n
+        payload = {
+            'user_id': user_id,
+            'current_weight': current_weight,
+            'goal_weight': goal_weight,
+            'days_to_goal': days_to_goal,
+            'goal': data['goal'],
+            'age': user.age,
+            'gender': user.gender,
+            'height': user.height,
+            'activity_level': data.get('activity_level', 'moderate'),
+            'dietary_restrictions': data.get('dietary_restrictions', []),
+            'meals_per_day': data.get('meals_per_day', 4)
+        }
         
-        if response.status_code == 200:
-            schedule.generation_status = 'processing'
+        if mode == 'local':
+            schedule = MealSchedule(user_id=user_id)
+            apply_generated_plan(schedule, generate_weekly_meal_plan(payload))
             db.session.commit()
-            
             return jsonify({
-                'message': 'Meal plan generation started',
+                'message': 'Meal plan generated',
                 'schedule_id': schedule.id,
-                'status': 'processing'
-            }), 202
-        else:
-            schedule.generation_status = 'failed'
-            db.session.commit()
-            return jsonify({'error': 'Failed to trigger n8n workflow'}), 500
-            
-    except Exception as e:
-        schedule.generation_status = 'failed'
+                'status': 'completed',
+                'mode': 'local',
+                'schedule': schedule.to_dict()
+            }), 201
+        
+        # Double taps and client retries attach to the first identical request
+        duplicate = find_duplicate_generation('meal_plan', user_id, payload)
+        if duplicate:
+            body, status_code = coalesced_response(duplicate, 'meal plan')
+            return jsonify(body), status_code
+        
+        # Create pending schedule
+        schedule = MealSchedule(
+            user_id=user_id,
+            current_weight=current_weight,
+            goal_weight=goal_weight,
+            days_to_goal=days_to_goal,
+            goal=data['goal'],
+            generation_status='pending'
+        )
+        db.session.add(schedule)
+        db.session.flush()
+        payload['schedule_id'] = schedule.id
+        
+        # The n8n webhook is called by the background job workers
+        enqueue_generation('meal_plan', schedule, payload)
         db.session.commit()
-        return jsonify({'error': str(e)}), 500
+        
+        return jsonify({
+            'message': 'Meal plan generation queued',
+            'schedule_id': schedule.id,
+            'status': 'pending'
+        }), 202
+        
+    except Exception as e:
+        db.session.rollback()
+        action = 'generate meal plan' if mode == 'local' else 'queue meal plan generation'
+        return jsonify({'error': f'Failed to {action}', 'details': str(e)}), 500
 
 @meals_bp.route('/webhook/plan-ready', methods=['POST'])
 def receive_meal_plan():
@@ -511,25 +633,7 @@ def receive_meal_plan():
             schedule = MealSchedule(user_id=user_id)
             db.session.add(schedule)
         
-        # Update schedule data
-        schedule.weekly_plan = data['weekly_meal_plan']
-        schedule.generation_status = 'completed'
-        schedule.generated_at = datetime.utcnow()
-        schedule.is_active = True  # Optional: auto-activate
-        
-        # Store nutrition targets
-        nutrition_targets = data.get('nutrition_targets', {})
-        schedule.daily_calories = nutrition_targets.get('daily_calories')
-        schedule.daily_protein = nutrition_targets.get('daily_protein')
-        schedule.daily_carbs = nutrition_targets.get('daily_carbs')
-        schedule.daily_fat = nutrition_targets.get('daily_fat')
-        
-        # Store user data snapshot
-        user_data = data.get('user_data', {})
-        schedule.current_weight = user_data.get('current_weight')
-        schedule.goal_weight = user_data.get('goal_weight')
-        schedule.days_to_goal = user_data.get('days_to_goal')
-        schedule.goal = user_data.get('goal')
+        apply_generated_plan(schedule, data)
         
         db.session.commit()
         
@@ -567,11 +671,15 @@ def get_meal_schedules():
     if active_only:
         query = query.filter_by(is_active=True)
     
-    schedules = query.order_by(MealSchedule.generated_at.desc()).all()
+    try:
+        schedules, next_cursor = paginate(query, MealSchedule.generated_at, MealSchedule.id)
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
     
     return jsonify({
         'schedules': [s.to_dict() for s in schedules],
-        'count': len(schedules)
+        'count': len(schedules),
+        'next_cursor': next_cursor
     }), 200
 
 
@@ -1,24 +1,41 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, abort, request, jsonify
 from app import db
 from app.models import (
     User, WorkoutSession, SessionExercise, 
-    WeightHistory, ExercisePersonalRecord
+    WeightHistory, ExercisePersonalRecord, UserWorkoutStats
 )
+from app.pagination import paginate
+from app.fieldsets import Fieldset
+from app.read_models import WEIGHT_HISTORY
+from app.cache import dashboard_cache, dashboard_version, invalidate_dashboard
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from datetime import datetime, timedelta
-from sqlalchemy import func
+from datetime import datetime
+from sqlalchemy import case, extract, func
 
 progress_bp = Blueprint('progress', __name__, url_prefix='/api/progress')
 
+# Longest from/to range served by the monthly stats endpoint, in months
+MAX_STATS_MONTHS = 24
+
 
 @progress_bp.route('/dashboard', methods=['GET'])
 @jwt_required()
 def get_dashboard():
-    """Get user's fitness dashboard with all stats"""
+    """Get user's fitness dashboard with all stats (cached per user until they log new data)"""
     user_id = get_jwt_identity()
+    
+    # Checked on every read: other workers' writes bump it without touching this cache
+    version = dashboard_version(user_id)
+    if version is None:
+        abort(404)
+    cached = dashboard_cache.get(str(user_id))
+    if cached is not None and cached[0] == version:
+        return jsonify(cached[1]), 200
+    
+    generation = dashboard_cache.generation(str(user_id))
     user = User.query.get_or_404(user_id)
     
-    # Workout stats
+    # Workout stats (includes this week's completed workouts)
     workout_stats = user.get_workout_stats()
     
     # Recent weight entries (last 10)
@@ -33,21 +50,16 @@ def get_dashboard():
         .limit(5)\
         .all()
     
-    # This week's workouts
-    week_start = datetime.utcnow() - timedelta(days=7)
-    this_week_workouts = WorkoutSession.query.filter(
-        WorkoutSession.user_id == user_id,
-        WorkoutSession.created_at >= week_start,
-        WorkoutSession.completed == True
-    ).count()
-    
-    return jsonify({
+    dashboard = {
         'user': user.to_dict(),
         'workout_stats': workout_stats,
-        'this_week_workouts': this_week_workouts,
+        'this_week_workouts': workout_stats['this_week_workouts'],
         'recent_weight': [w.to_dict() for w in recent_weights],
         'recent_prs': [pr.to_dict() for pr in recent_prs]
-    }), 200
+    }
+    dashboard_cache.set(str(user_id), (version, dashboard), generation)
+    
+    return jsonify(dashboard), 200
 
 
 @progress_bp.route('/weight', methods=['GET'])
@@ -58,10 +70,12 @@ def get_weight_history():
     
     limit = request.args.get('limit', default=30, type=int)
     
-    weights = WeightHistory.query.filter_by(user_id=user_id)\
-        .order_by(WeightHistory.recorded_at.desc())\
-        .limit(limit)\
-        .all()
+    weights = WEIGHT_HISTORY.rows(
+        WEIGHT_HISTORY.select()
+        .where(WeightHistory.user_id == user_id)
+        .order_by(WeightHistory.recorded_at.desc())
+        .limit(limit)
+    )
     
     return jsonify({
         'weight_history': [w.to_dict() for w in weights]
@@ -90,6 +104,7 @@ def log_weight():
         # Update user's current weight
         user.weight = data['weight']
         
+        invalidate_dashboard(db.session, user_id)
         db.session.commit()
         
         return jsonify({
@@ -155,6 +170,7 @@ def log_personal_record():
             reps=data['reps']
         )
         db.session.add(pr)
+        invalidate_dashboard(db.session, user_id)
         db.session.commit()
         
         return jsonify({
@@ -173,8 +189,7 @@ def get_workout_history():
     """Get user's workout history with filters"""
     user_id = get_jwt_identity()
     
-    # Query params for filtering
-    limit = request.args.get('limit', default=20, type=int)
+    # Query params for filtering (page size comes from `limit`, next page from `cursor`)
     completed_only = request.args.get('completed', default='true').lower() == 'true'
     
     query = WorkoutSession.query.filter_by(user_id=user_id)
@@ -182,89 +197,147 @@ def get_workout_history():
     if completed_only:
         query = query.filter_by(completed=True)
     
-    sessions = query.order_by(WorkoutSession.created_at.desc())\
-        .limit(limit)\
-        .all()
+    fieldset = Fieldset.from_request()
+    try:
+        sessions, next_cursor = paginate(
+            query.options(*WorkoutSession.eager_options(fieldset)),
+            WorkoutSession.created_at,
+            WorkoutSession.id,
+            default_limit=20
+        )
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
     
     return jsonify({
-        'workout_history': [s.to_dict() for s in sessions]
+        'workout_history': [s.to_dict(fieldset) for s in sessions],
+        'next_cursor': next_cursor
     }), 200
 
 
 @progress_bp.route('/streak', methods=['GET'])
 @jwt_required()
 def get_workout_streak():
-    """Calculate user's current workout streak"""
+    """Get user's current and longest workout streak (in days)"""
     user_id = get_jwt_identity()
     
-    # Get all completed workouts ordered by date
-    workouts = WorkoutSession.query.filter_by(
-        user_id=user_id,
-        completed=True
-    ).order_by(WorkoutSession.completed_at.desc()).all()
+    # Users without a stats row yet (created on their next session write) get them computed, not stored
+    stats = UserWorkoutStats.query.get(user_id) or UserWorkoutStats.from_history(user_id)
     
-    if not workouts:
+    if not stats.completed_sessions:
         return jsonify({
             'current_streak': 0,
             'longest_streak': 0,
             'message': 'Start your first workout!'
         }), 200
     
-    # Calculate current streak
-    current_streak = 0
-    today = datetime.utcnow().date()
-    check_date = today
-    
-    for workout in workouts:
-        workout_date = workout.completed_at.date()
-        
-        # If workout is on check_date or previous day
-        if workout_date == check_date or workout_date == check_date - timedelta(days=1):
-            current_streak += 1
-            check_date = workout_date - timedelta(days=1)
-        else:
-            break
-    
     return jsonify({
-        'current_streak': current_streak,
-        'last_workout': workouts[0].completed_at.isoformat(),
-        'total_workouts': len(workouts)
+        'current_streak': stats.streak_as_of(datetime.utcnow().date()),
+        'longest_streak': stats.longest_streak,
+        'last_workout': stats.last_workout_at.isoformat() if stats.last_workout_at else None,
+        'total_workouts': stats.completed_sessions
     }), 200
 
 
+def _parse_month(value):
+    """'YYYY-MM' -> first day of that month (raises ValueError)"""
+    return datetime.strptime(value, '%Y-%m')
+
+
+def _next_month(month_start):
+    if month_start.month == 12:
+        return month_start.replace(year=month_start.year + 1, month=1)
+    return month_start.replace(month=month_start.month + 1)
+
+
 @progress_bp.route('/stats/monthly', methods=['GET'])
 @jwt_required()
 def get_monthly_stats():
-    """Get workout stats for current month"""
+    """
+    Get workout stats per month, computed in SQL
+    Query params: month=YYYY-MM (default: current month) or from=YYYY-MM&to=YYYY-MM,
+    include_workouts=true to add a paginated list of the sessions themselves
+    """
     user_id = get_jwt_identity()
     
-    # First day of current month
-    today = datetime.utcnow()
-    month_start = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    try:
+        if request.args.get('from') or request.args.get('to'):
+            this_month = datetime.utcnow().strftime('%Y-%m')
+            first_month = _parse_month(request.args.get('from', this_month))
+            last_month = _parse_month(request.args.get('to', this_month))
+        else:
+            first_month = last_month = _parse_month(request.args.get('month', datetime.utcnow().strftime('%Y-%m')))
+    except ValueError:
+        return jsonify({'error': 'Invalid month format. Use YYYY-MM'}), 400
+    
+    if first_month > last_month:
+        return jsonify({'error': 'from must not be after to'}), 400
+    if (last_month.year - first_month.year) * 12 + last_month.month - first_month.month >= MAX_STATS_MONTHS:
+        return jsonify({'error': f'Range must be at most {MAX_STATS_MONTHS} months'}), 400
+    
+    range_start = first_month
+    try:
+        range_end = _next_month(last_month)
+    except ValueError:
+        return jsonify({'error': 'Invalid month format. Use YYYY-MM'}), 400
     
-    # Workouts this month
-    monthly_workouts = WorkoutSession.query.filter(
+    session_filter = (
         WorkoutSession.user_id == user_id,
-        WorkoutSession.created_at >= month_start,
+        WorkoutSession.created_at >= range_start,
+        WorkoutSession.created_at < range_end,
         WorkoutSession.completed == True
-    ).all()
-    
-    # Total exercises completed
-    total_exercises = sum(
-        len([ex for ex in w.exercises if ex.completed])
-        for w in monthly_workouts
     )
     
-    # Total sets completed
-    total_sets = sum(
-        sum(ex.sets for ex in w.exercises if ex.completed)
-        for w in monthly_workouts
-    )
+    # One grouped aggregate over sessions and their exercises
+    year = extract('year', WorkoutSession.created_at)
+    month = extract('month', WorkoutSession.created_at)
+    exercise_completed = SessionExercise.completed == True
     
-    return jsonify({
-        'month': today.strftime('%B %Y'),
-        'workouts_completed': len(monthly_workouts),
-        'total_exercises': total_exercises,
-        'total_sets': total_sets,
-        'workouts': [w.to_dict() for w in monthly_workouts]
-    }), 200
\ No newline at end of file
+    rows = db.session.query(
+        year.label('year'),
+        month.label('month'),
+        func.count(func.distinct(WorkoutSession.id)),
+        func.count(case((exercise_completed, SessionExercise.id))),
+        func.coalesce(func.sum(case((exercise_completed, SessionExercise.sets))), 0)
+    ).outerjoin(SessionExercise, SessionExercise.session_id == WorkoutSession.id)\
+        .filter(*session_filter)\
+        .group_by(year, month)\
+        .all()
+    
+    by_month = {(int(r[0]), int(r[1])): r[2:] for r in rows}
+    
+    months = []
+    current = first_month
+    while current < range_end:
+        workouts, exercises, sets = by_month.get((current.year, current.month), (0, 0, 0))
+        months.append({
+            'month': current.strftime('%Y-%m'),
+            'label': current.strftime('%B %Y'),
+            'workouts_completed': workouts,
+            'total_exercises': exercises,
+            'total_sets': int(sets or 0)
+        })
+        current = _next_month(current)
+    
+    result = {
+        'month': first_month.strftime('%B %Y') if first_month == last_month else None,
+        'from': first_month.strftime('%Y-%m'),
+        'to': last_month.strftime('%Y-%m'),
+        'workouts_completed': sum(m['workouts_completed'] for m in months),
+        'total_exercises': sum(m['total_exercises'] for m in months),
+        'total_sets': sum(m['total_sets'] for m in months),
+        'months': months
+    }
+    
+    # Full session payloads are opt-in and paginated
+    if request.args.get('include_workouts', 'false').lower() == 'true':
+        fieldset = Fieldset.from_request()
+        query = WorkoutSession.query.filter(*session_filter)\
+            .options(*WorkoutSession.eager_options(fieldset))
+        try:
+            workouts, next_cursor = paginate(query, WorkoutSession.created_at, WorkoutSession.id, default_limit=20)
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        result['workouts'] = [w.to_dict(fieldset) for w in workouts]
+        result['next_cursor'] = next_cursor
+    
+    return jsonify(result), 200
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from app import db
 from app.models import User
+from app.cache import invalidate_dashboard
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from sqlalchemy.exc import IntegrityError
 
@@ -112,6 +113,7 @@ def update_profile():
                 return jsonify({'success': False, 'error': 'Invalid location'}), 400
             user.location = data['location']
         
+        invalidate_dashboard(db.session, user_id)
         db.session.commit()
         
         return jsonify({
@@ -215,6 +217,7 @@ def delete_account():
     
     try:
         db.session.delete(user)
+        invalidate_dashboard(db.session, user_id)
         db.session.commit()
         
         return jsonify({
@@ -1,72 +1,72 @@
 from datetime import datetime
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, abort
 from app import db
-from app.models import Exercise, SessionExercise, WorkoutSession, WorkoutTemplate, WorkoutExercise, UserWorkout
+from app.models import SessionExercise, WorkoutSession, WorkoutTemplate, UserWorkout, UserWorkoutStats
+from app.pagination import paginate
+from app.fieldsets import Fieldset
+from app.cache import invalidate_dashboard
+from app.catalog import catalog, conditional_catalog_get
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from random import sample, shuffle
 workouts_bp = Blueprint("workouts", __name__, url_prefix="/api/workouts")
 
 
 @workouts_bp.route("/exercises", methods=["GET"])
+@conditional_catalog_get
 def get_exercises():
     """Get all available exercises"""
-    exercises = Exercise.query.all()
     return jsonify({
-        'exercises': [e.to_dict() for e in exercises]
+        'exercises': catalog.get().exercises
     }), 200
 
 
 @workouts_bp.route("/templates", methods=["GET"])
+@conditional_catalog_get
 def get_workout_templates():
     """Get all workout templates"""
     goal = request.args.get('goal')  # Optional filter by goal
     level = request.args.get('level')  # Optional filter by level
     
-    query = WorkoutTemplate.query
-    
-    if goal:
-        query = query.filter_by(goal=goal)
-    if level:
-        query = query.filter_by(level=level)
-    
-    templates = query.all()
-    
     return jsonify({
-        'templates': [t.to_dict() for t in templates]
+        'templates': catalog.get().template_list(goal=goal, level=level)
     }), 200
 @workouts_bp.route("/templates/<int:template_id>/generate", methods=["GET"])
 @jwt_required()
 def generate_dynamic_workout(template_id):
     """Generate a randomized workout from template's exercise pool"""
-    template = WorkoutTemplate.query.get_or_404(template_id)
+    snapshot = catalog.get()
+    template = snapshot.templates.get(template_id)
+    if not template:
+        abort(404)
+    template_exercises = snapshot.template_exercises[template_id]
     
     # Get number of exercises to include (from query param or default)
     num_exercises = request.args.get('count', default=5, type=int)
-    num_exercises = min(num_exercises, len(template.exercises))  # Don't exceed available
+    num_exercises = min(num_exercises, len(template_exercises))  # Don't exceed available
     
-    if not template.exercises:
+    if not template_exercises:
         return jsonify({'error': 'Template has no exercises'}), 400
     
     # Randomly select exercises
-    selected = sample(template.exercises, num_exercises)
+    selected = sample(template_exercises, num_exercises)
     
     # Shuffle the order for variety
     shuffle(selected)
     
-    # Build response with new random order
+    # Build response with new random order (copies: catalog dicts are shared)
     exercises_data = []
     for idx, we in enumerate(selected, start=1):
-        ex_data = we.to_dict()
+        ex_data = dict(we)
         ex_data['order'] = idx  # Override with new random order
         exercises_data.append(ex_data)
     
     return jsonify({
         'template': {
-            'id': template.id,
-            'name': template.name,
-            'description': template.description,
-            'goal': template.goal,
-            'level': template.level
+            'id': template['id'],
+            'name': template['name'],
+            'description': template['description'],
+            'goal': template['goal'],
+            'level': template['level']
         },
         'exercises': exercises_data,
         'generated_at': datetime.utcnow().isoformat()
@@ -77,14 +77,15 @@ def generate_dynamic_workout(template_id):
 def get_my_workouts():
     """Get user's assigned workouts"""
     user_id = get_jwt_identity()
+    fieldset = Fieldset.from_request()
     
     user_workouts = UserWorkout.query.filter_by(
         user_id=user_id,
         is_active=True
-    ).all()
+    ).options(*UserWorkout.eager_options(fieldset)).all()
     
     return jsonify({
-        'workouts': [uw.to_dict() for uw in user_workouts]
+        'workouts': [uw.to_dict(fieldset) for uw in user_workouts]
     }), 200
 
 
@@ -164,23 +165,33 @@ def create_workout_session():
     if not data or not data.get('template_id'):
         return jsonify({'error': 'template_id is required'}), 400
     
-    template = WorkoutTemplate.query.get(data['template_id'])
+    try:
+        template_id = int(data['template_id'])
+    except (TypeError, ValueError):
+        return jsonify({'error': 'template_id must be an integer'}), 400
+    
+    snapshot = catalog.get()
+    template = snapshot.templates.get(template_id)
     if not template:
         return jsonify({'error': 'Template not found'}), 404
+    template_exercises = snapshot.template_exercises[template['id']]
     
     # Get number of exercises (default 5)
     num_exercises = data.get('exercise_count', 5)
-    num_exercises = min(num_exercises, len(template.exercises))
+    num_exercises = min(num_exercises, len(template_exercises))
     
     # Random selection
-    selected = sample(template.exercises, num_exercises)
+    selected = sample(template_exercises, num_exercises)
     shuffle(selected)
     
     try:
+        # Load counters before the new session is flushed so it isn't counted twice
+        stats = UserWorkoutStats.get_or_create(user_id)
+        
         # Create session
         session = WorkoutSession(
             user_id=user_id,
-            template_id=template.id
+            template_id=template['id']
         )
         db.session.add(session)
         db.session.flush()  # Get session.id
@@ -189,14 +200,16 @@ def create_workout_session():
         for idx, we in enumerate(selected, start=1):
             session_exercise = SessionExercise(
                 session_id=session.id,
-                exercise_id=we.exercise_id,
-                sets=we.sets,
-                reps=we.reps,
-                rest_seconds=we.rest_seconds,
+                exercise_id=we['exercise']['id'],
+                sets=we['sets'],
+                reps=we['reps'],
+                rest_seconds=we['rest_seconds'],
                 order=idx
             )
             db.session.add(session_exercise)
         
+        stats.record_session_created()
+        invalidate_dashboard(db.session, user_id)
         db.session.commit()
         
         return jsonify({
@@ -214,13 +227,19 @@ def create_workout_session():
 def get_my_sessions():
     """Get user's workout sessions history"""
     user_id = get_jwt_identity()
+    fieldset = Fieldset.from_request()
+    
+    query = WorkoutSession.query.filter_by(user_id=user_id)\
+        .options(*WorkoutSession.eager_options(fieldset))
     
-    sessions = WorkoutSession.query.filter_by(user_id=user_id)\
-        .order_by(WorkoutSession.created_at.desc())\
-        .all()
+    try:
+        sessions, next_cursor = paginate(query, WorkoutSession.created_at, WorkoutSession.id)
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
     
     return jsonify({
-        'sessions': [s.to_dict() for s in sessions]
+        'sessions': [s.to_dict(fieldset) for s in sessions],
+        'next_cursor': next_cursor
     }), 200
 
 
@@ -229,14 +248,15 @@ def get_my_sessions():
 def get_session_detail(session_id):
     """Get specific workout session details"""
     user_id = get_jwt_identity()
+    fieldset = Fieldset.from_request()
     
     session = WorkoutSession.query.filter_by(
         id=session_id,
         user_id=user_id
-    ).first_or_404()
+    ).options(*WorkoutSession.eager_options(fieldset)).first_or_404()
     
     return jsonify({
-        'session': session.to_dict()
+        'session': session.to_dict(fieldset)
     }), 200
 
 
@@ -255,8 +275,12 @@ def complete_workout_session(session_id):
         return jsonify({'error': 'Session already completed'}), 400
     
     try:
+        stats = UserWorkoutStats.get_or_create(user_id)
+        
         session.completed = True
         session.completed_at = datetime.utcnow()
+        stats.record_session_completed(session.completed_at)
+        invalidate_dashboard(db.session, user_id)
         db.session.commit()
         
         return jsonify({
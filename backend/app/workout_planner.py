@@ -0,0 +1,124 @@
+from app.catalog import catalog
+
+DAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+# Session type -> muscle groups trained, in exercise order
+SESSION_TYPES = {
+    'Full Body': ('legs', 'chest', 'back', 'shoulders', 'core'),
+    'Upper Body': ('chest', 'back', 'shoulders', 'arms'),
+    'Lower Body': ('legs', 'core'),
+    'Push Day': ('chest', 'shoulders', 'arms'),
+    'Pull Day': ('back', 'arms', 'core'),
+    'Leg Day': ('legs', 'core')
+}
+
+# Sessions per week -> split
+SPLITS = {
+    1: ['Full Body'],
+    2: ['Full Body', 'Full Body'],
+    3: ['Push Day', 'Pull Day', 'Leg Day'],
+    4: ['Upper Body', 'Lower Body', 'Upper Body', 'Lower Body'],
+    5: ['Push Day', 'Pull Day', 'Leg Day', 'Upper Body', 'Lower Body'],
+    6: ['Push Day', 'Pull Day', 'Leg Day', 'Push Day', 'Pull Day', 'Leg Day'],
+    7: ['Push Day', 'Pull Day', 'Leg Day', 'Push Day', 'Pull Day', 'Leg Day', 'Full Body']
+}
+
+# User.fitness_goal -> (sets, reps, rest seconds)
+PRESCRIPTIONS = {
+    'Build Muscle': (4, 10, 90),
+    'Lose Weight': (3, 15, 45),
+    'Improve Endurance': (3, 15, 45),
+    'Get Fit': (3, 12, 60)
+}
+DEFAULT_PRESCRIPTION = (3, 12, 60)
+
+LEVELS = ['beginner', 'intermediate', 'advanced']
+
+# Minutes per exercise (sets and rest) and for warm-up / cool-down
+MINUTES_PER_EXERCISE = 10
+WARMUP_MINUTES = 10
+MIN_EXERCISES, MAX_EXERCISES = 3, 8
+
+
+def _training_days(available_days, sessions):
+    """`sessions` of the available days, spread as evenly as possible over the week"""
+    days = sorted({day.lower() for day in available_days if day.lower() in DAYS}, key=DAYS.index)
+    sessions = min(sessions, len(days))
+    if sessions <= 1:
+        return days[:sessions]
+    return [days[round(i * (len(days) - 1) / (sessions - 1))] for i in range(sessions)]
+
+
+def _exercise_pool(pools, muscle_group, equipment, level):
+    """
+    Exercises for a muscle group usable with `equipment` at or below `level`,
+    widening to any level, then to any equipment, when nothing matches.
+    """
+    by_equipment = pools.get(muscle_group, {})
+    allowed = LEVELS[:LEVELS.index(level) + 1]
+    for candidates in (
+        [e for eq in equipment for e in by_equipment.get(eq, []) if e['difficulty'] in allowed],
+        [e for eq in equipment for e in by_equipment.get(eq, [])],
+        [e for exercises in by_equipment.values() for e in exercises if e['difficulty'] in allowed]
+    ):
+        if candidates:
+            return sorted(candidates, key=lambda e: e['id'])
+    return []
+
+
+def generate_weekly_workout_plan(preferences, fitness_goal=None):
+    """
+    Build a weekly plan without the LLM, in the weekly_plan shape that
+    create_calendar_events_from_plan expects: training day -> {workout,
+    description, time, duration, exercises}. `preferences` holds the same
+    fields as the n8n generation payload's preferences.
+    """
+    days = _training_days(preferences['available_days'], int(preferences['sessions_per_week']))
+    if not days:
+        raise ValueError('No valid available days')
+
+    duration = int(preferences.get('session_duration') or 60)
+    time_slots = preferences.get('available_time_slots') or {}
+    equipment = [eq.lower() for eq in preferences.get('equipment_access') or ['bodyweight']]
+    level = (preferences.get('experience_level') or 'beginner').lower()
+    level = level if level in LEVELS else 'beginner'
+
+    sets, reps, rest_seconds = PRESCRIPTIONS.get(fitness_goal, DEFAULT_PRESCRIPTION)
+    if level == 'beginner':
+        sets = max(2, sets - 1)
+    exercise_count = min(max((duration - WARMUP_MINUTES) // MINUTES_PER_EXERCISE, MIN_EXERCISES), MAX_EXERCISES)
+
+    pools = catalog.get().exercise_pools
+    pool_cache = {}
+    # Times each muscle group was trained so far, to rotate through its pool
+    rotation = {}
+
+    weekly_plan = {}
+    for day, session_type in zip(days, SPLITS[min(len(days), max(SPLITS))]):
+        groups = SESSION_TYPES[session_type]
+        exercises = []
+        for slot in range(exercise_count):
+            group = groups[slot % len(groups)]
+            if group not in pool_cache:
+                pool_cache[group] = _exercise_pool(pools, group, equipment, level)
+            pool = [e for e in pool_cache[group] if e['id'] not in {x['exercise']['id'] for x in exercises}]
+            if not pool:
+                continue
+            exercise = pool[rotation.get(group, 0) % len(pool)]
+            rotation[group] = rotation.get(group, 0) + 1
+            exercises.append({
+                'exercise': exercise,
+                'sets': sets,
+                'reps': reps,
+                'rest_seconds': rest_seconds,
+                'order': len(exercises) + 1
+            })
+
+        weekly_plan[day] = {
+            'workout': session_type,
+            'description': ', '.join(group.capitalize() for group in groups),
+            'time': time_slots.get(day, 'morning'),
+            'duration': duration,
+            'exercises': exercises
+        }
+    return weekly_plan
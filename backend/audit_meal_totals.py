@@ -0,0 +1,68 @@
+"""
+Audit the cached nutrition totals of meals and daily meal plans.
+
+Streams every meal in id-ordered chunks, recomputes its totals from its items
+and current food values and reports the ones that drifted; then does the same
+for daily plans against their meals. With --fix the drifted rows (and the
+plans using drifted meals) are rewritten.
+
+Usage: python audit_meal_totals.py [--chunk-size 500] [--tolerance 0.1] [--fix]
+"""
+import argparse
+import sys
+from app import create_app, db
+from app.models import DailyMealPlan, Meal
+from app.meal_totals import (
+    audit_totals, compute_meal_totals, compute_plan_totals,
+    plans_using_meals, recompute_meals, recompute_plans
+)
+
+app = create_app()
+
+MAX_REPORTED = 20
+
+
+def audit(label, model, compute, args):
+    """Ids of `model` rows whose cached totals drifted"""
+    print(f"🔎 Auditing {label}...")
+    connection = db.session.connection()
+    drifted = []
+    for row_id, cached, recomputed in audit_totals(connection, model, compute, args.chunk_size, args.tolerance):
+        if len(drifted) < MAX_REPORTED:
+            print(f"  ⚠️ {label[:-1]} {row_id}: cached {cached} != recomputed {recomputed}")
+        drifted.append(row_id)
+
+    if len(drifted) > MAX_REPORTED:
+        print(f"  ... and {len(drifted) - MAX_REPORTED} more")
+    print(f"{'❌' if drifted else '✅'} {len(drifted)} {label} with stale totals")
+    return drifted
+
+
+def run(args):
+    connection = db.session.connection()
+
+    stale_meals = audit('meals', Meal, compute_meal_totals, args)
+    if args.fix and stale_meals:
+        recompute_meals(connection, stale_meals)
+        recompute_plans(connection, plans_using_meals(connection, stale_meals))
+        db.session.commit()
+        print(f"🔁 Rewrote {len(stale_meals)} meals and the plans using them")
+
+    stale_plans = audit('plans', DailyMealPlan, compute_plan_totals, args)
+    if args.fix and stale_plans:
+        recompute_plans(db.session.connection(), stale_plans)
+        db.session.commit()
+        print(f"🔁 Rewrote {len(stale_plans)} plans")
+
+    if (stale_meals or stale_plans) and not args.fix:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--chunk-size', type=int, default=500)
+    parser.add_argument('--tolerance', type=float, default=0.1)
+    parser.add_argument('--fix', action='store_true')
+
+    with app.app_context():
+        run(parser.parse_args())
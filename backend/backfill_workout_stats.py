@@ -0,0 +1,29 @@
+from app import create_app, db
+from app.models import User, UserWorkoutStats
+
+app = create_app()
+
+BATCH_SIZE = 500
+
+
+def backfill_workout_stats():
+    """Rebuild every user's workout counters and streaks from their session history"""
+    print("🔁 Backfilling workout stats...")
+    
+    user_ids = [row.id for row in db.session.query(User.id).order_by(User.id)]
+    
+    for count, user_id in enumerate(user_ids, start=1):
+        UserWorkoutStats.rebuild(user_id)
+        
+        if count % BATCH_SIZE == 0:
+            db.session.commit()
+            db.session.expunge_all()
+            print(f"  {count}/{len(user_ids)} users")
+    
+    db.session.commit()
+    print(f"✅ Workout stats rebuilt for {len(user_ids)} users!")
+
+
+if __name__ == "__main__":
+    with app.app_context():
+        backfill_workout_stats()
@@ -0,0 +1,154 @@
+"""
+Benchmark: encoding API payloads with the stdlib vs the orjson JSON provider.
+
+Seeds a throwaway database, builds the payloads of the largest GET endpoints
+(food catalog, a long workout history, a quarter of daily meal plans) and of
+the local plan generators, then encodes each one repeatedly through
+ISOJSONProvider and OrjsonProvider. Checks that both produce the same bytes.
+
+Usage: python bench_json.py [--sessions 300] [--days 90] [--repeat 50]
+(set BENCH_DATABASE_URL to run against something other than in-memory SQLite)
+"""
+import os
+
+os.environ['DATABASE_URL'] = os.getenv('BENCH_DATABASE_URL', 'sqlite://')
+
+import argparse
+import time
+from datetime import datetime, timedelta
+from app import create_app, db
+from app.json_provider import ISOJSONProvider, OrjsonProvider, orjson
+from app.meal_planner import generate_weekly_meal_plan
+from app.models import DailyMealPlan, Food, Meal, SessionExercise, User, WorkoutSession, WorkoutTemplate
+from app.workout_planner import generate_weekly_workout_plan
+from seed_foods import seed_foods
+from seed_meals import seed_meals
+from seed_workouts import seed_exercises, seed_workout_templates
+
+app = create_app()
+
+
+def create_user(num_sessions, num_days):
+    """A user with num_sessions completed sessions and num_days of meal plans"""
+    user = User(
+        email='bench-json@example.com',
+        first_name='Bench',
+        last_name='Json',
+        weight=80,
+        goal_weight=75,
+        height=180,
+        fitness_goal='Build Muscle',
+        location='Tunis'
+    )
+    user.set_password('benchmark-password')
+    db.session.add(user)
+    db.session.flush()
+
+    templates = WorkoutTemplate.query.all()
+    now = datetime.utcnow()
+    for i in range(num_sessions):
+        template = templates[i % len(templates)]
+        session = WorkoutSession(
+            user_id=user.id,
+            template_id=template.id,
+            created_at=now - timedelta(days=i),
+            completed=True,
+            completed_at=now - timedelta(days=i, hours=-1)
+        )
+        db.session.add(session)
+        db.session.flush()
+        for order, we in enumerate(template.exercises, start=1):
+            db.session.add(SessionExercise(
+                session_id=session.id,
+                exercise_id=we.exercise_id,
+                sets=we.sets,
+                reps=we.reps,
+                rest_seconds=we.rest_seconds,
+                order=order
+            ))
+
+    meals = {meal_type: Meal.query.filter_by(meal_type=meal_type).all() for meal_type in DailyMealPlan.MEAL_SLOTS}
+    today = now.date()
+    for i in range(num_days):
+        db.session.add(DailyMealPlan(
+            user_id=user.id,
+            date=today + timedelta(days=i),
+            **{
+                f'{meal_type}_id': options[i % len(options)].id
+                for meal_type, options in meals.items() if options
+            }
+        ))
+
+    db.session.commit()
+    return user
+
+
+def build_payloads(user):
+    """Endpoint name -> the Python object its route hands to jsonify"""
+    foods = Food.query.order_by(Food.name).all()
+    sessions = WorkoutSession.query.options(*WorkoutSession.eager_options()).filter_by(user_id=user.id) \
+        .order_by(WorkoutSession.created_at.desc()).all()
+    plans = DailyMealPlan.query.options(*DailyMealPlan.eager_options()).filter_by(user_id=user.id) \
+        .order_by(DailyMealPlan.date).all()
+
+    return {
+        'GET /api/meals/foods': {'foods': [f.to_dict() for f in foods], 'count': len(foods)},
+        'GET /api/progress/workout-history': {'workout_history': [s.to_dict() for s in sessions], 'next_cursor': None},
+        'GET /api/meals/plans': {'plans': [p.to_dict() for p in plans], 'count': len(plans), 'next_cursor': None},
+        'local meal plan': generate_weekly_meal_plan({
+            'current_weight': 80, 'goal_weight': 75, 'days_to_goal': 90, 'goal': 'weight_loss',
+            'age': 30, 'gender': 'male', 'height': 180, 'meals_per_day': 4
+        }),
+        'local workout plan': {'weekly_plan': generate_weekly_workout_plan({
+            'available_days': ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday'],
+            'sessions_per_week': 6, 'session_duration': 75, 'equipment_access': ['barbell', 'dumbbell', 'bodyweight'],
+            'experience_level': 'advanced'
+        }, user.fitness_goal)}
+    }
+
+
+def throughput(provider, payload, repeat):
+    """(encoded bytes, seconds per encode) of a response body"""
+    body = provider.response(payload).get_data()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        provider.response(payload)
+    return body, (time.perf_counter() - start) / repeat
+
+
+def run(args):
+    if orjson is None:
+        print("❌ orjson is not installed (pip install -r requirements.txt)")
+        return
+
+    db.create_all()
+    seed_foods()
+    seed_meals()
+    seed_exercises()
+    seed_workout_templates()
+    payloads = build_payloads(create_user(args.sessions, args.days))
+
+    stdlib, fast = ISOJSONProvider(app), OrjsonProvider(app)
+    print(f"\n📦 {'payload':34} {'size':>9} {'stdlib':>10} {'orjson':>10} {'MB/s':>8} {'speedup':>8}\n")
+    total_stdlib = total_fast = 0
+    for name, payload in payloads.items():
+        expected, stdlib_time = throughput(stdlib, payload, args.repeat)
+        body, fast_time = throughput(fast, payload, args.repeat)
+        assert body == expected, f"{name}: orjson output differs from the stdlib provider"
+
+        total_stdlib += stdlib_time
+        total_fast += fast_time
+        print(f"   {name:34} {len(body) / 1024:7.1f}kB {stdlib_time * 1000:8.2f}ms {fast_time * 1000:8.2f}ms "
+              f"{len(body) / fast_time / 1e6:8.1f} {stdlib_time / fast_time:7.1f}x")
+
+    print(f"\n✅ Identical output. Overall speedup: {total_stdlib / total_fast:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=300)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--repeat', type=int, default=50)
+
+    with app.app_context():
+        run(parser.parse_args())
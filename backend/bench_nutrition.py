@@ -0,0 +1,118 @@
+"""
+Benchmark: totaling meals with the nutrition matrix vs per-item Python arithmetic.
+
+Builds 100k random meals from the seeded foods and totals them with a
+per-item Python loop (the old Meal.calculate_totals arithmetic) and with
+NutritionMatrix.batch_totals_arrays(), and checks that both agree. Also
+checks that Meal.calculate_totals() sees a food edited earlier in the same
+transaction, like the set-based recomputation does.
+
+Usage: python bench_nutrition.py [--meals 100000] [--seed 42]
+(set BENCH_DATABASE_URL to run against something other than in-memory SQLite)
+"""
+import os
+
+os.environ['DATABASE_URL'] = os.getenv('BENCH_DATABASE_URL', 'sqlite://')
+
+import argparse
+import random
+import time
+import numpy as np
+from app import create_app, db
+from app.catalog import catalog
+from app.meal_totals import compute_meal_totals
+from app.models import Food, Meal, MealItem
+from seed_foods import seed_foods
+
+app = create_app()
+
+ITEMS_PER_MEAL = (2, 6)
+
+
+def random_meals(food_ids, num_meals):
+    """num_meals lists of (food_id, grams) pairs"""
+    return [
+        [(random.choice(food_ids), random.randint(10, 300)) for _ in range(random.randint(*ITEMS_PER_MEAL))]
+        for _ in range(num_meals)
+    ]
+
+
+def python_totals(foods, meals):
+    """Per-item arithmetic over Food.to_dict() values, one meal at a time"""
+    totals = []
+    for items in meals:
+        calories = protein = carbs = fat = 0
+        for food_id, quantity in items:
+            food = foods[food_id]
+            multiplier = quantity / 100
+            calories += food['calories_per_100g'] * multiplier
+            protein += food['protein_per_100g'] * multiplier
+            carbs += food['carbs_per_100g'] * multiplier
+            fat += food['fat_per_100g'] * multiplier
+        totals.append((calories, protein, carbs, fat))
+    return totals
+
+
+def check_uncommitted_food_edit():
+    """Meal.calculate_totals() after a food edit in the same transaction vs compute_meal_totals()"""
+    food = Food.query.order_by(Food.id).first()
+    meal = Meal(name='Bench meal', meal_type='lunch', items=[MealItem(food=food, quantity=200)])
+    db.session.add(meal)
+    db.session.commit()
+    catalog.get()
+
+    food.calories_per_100g += 50
+    db.session.flush()
+    meal.calculate_totals()
+    calculated = meal.total_calories
+    expected = compute_meal_totals(db.session.connection(), [meal.id])[meal.id][0]
+    db.session.rollback()
+
+    assert calculated == expected, f"calculate_totals used stale food values: {calculated} != {expected}"
+    print("✅ calculate_totals sees food edits from its own transaction")
+
+
+def timed(label, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    print(f"{label:40} {elapsed * 1000:9.1f} ms")
+    return result, elapsed
+
+
+def run(args):
+    db.create_all()
+    if not Food.query.first():
+        seed_foods()
+
+    check_uncommitted_food_edit()
+
+    snapshot = catalog.get()
+    matrix = snapshot.nutrition
+    random.seed(args.seed)
+    meals = random_meals(list(snapshot.foods), args.meals)
+    num_items = sum(len(items) for items in meals)
+    print(f"\n🍽️ {args.meals} meals, {num_items} items, {len(matrix)} foods\n")
+
+    meal_index = np.repeat(np.arange(len(meals)), [len(items) for items in meals])
+    rows = np.array([matrix.index[food_id] for items in meals for food_id, _ in items], dtype=np.intp)
+    quantities = np.array([quantity for items in meals for _, quantity in items], dtype=np.float64)
+
+    expected, python_time = timed("Python per-item loop", python_totals, snapshot.foods, meals)
+    arrays, arrays_time = timed(
+        "NutritionMatrix.batch_totals_arrays", matrix.batch_totals_arrays, meal_index, rows, quantities, len(meals)
+    )
+
+    expected = np.array(expected)
+    assert np.allclose(arrays, expected), "batch_totals_arrays disagrees with the Python loop"
+
+    print(f"\n✅ Totals match. Speedup: {python_time / arrays_time:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--meals', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=42)
+
+    with app.app_context():
+        run(parser.parse_args())
@@ -0,0 +1,137 @@
+"""
+Benchmark: list endpoints' ORM path vs column-projection read models.
+
+Seeds a throwaway database with --rows foods, meals, exercises and weight
+entries, then loads and serializes each table two ways: ORM instances +
+Model.to_dict() (the old path) and app.read_models rows + row.to_dict().
+Reports wall time, rows per second and peak traced memory, and checks that
+both produce the same dicts.
+
+Usage: python bench_read_models.py [--rows 100000]
+(set BENCH_DATABASE_URL to run against something other than in-memory SQLite)
+"""
+import os
+
+os.environ['DATABASE_URL'] = os.getenv('BENCH_DATABASE_URL', 'sqlite://')
+
+import argparse
+import gc
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+from app import create_app, db
+from app.models import Exercise, Food, Meal, User, WeightHistory
+from app.read_models import EXERCISE, FOOD, MEAL, WEIGHT_HISTORY
+
+app = create_app()
+
+CATEGORIES = ['protein', 'carb', 'fat', 'vegetable', 'fruit', 'snack']
+MEAL_TYPES = ['breakfast', 'lunch', 'dinner', 'snack']
+MUSCLE_GROUPS = ['chest', 'back', 'legs', 'shoulders', 'arms', 'core']
+
+
+def seed(num_rows):
+    """num_rows rows in each benchmarked table, inserted in bulk"""
+    user = User(
+        email='bench-read@example.com',
+        first_name='Bench',
+        last_name='Read',
+        weight=80,
+        goal_weight=75,
+        height=180,
+        fitness_goal='Get Fit',
+        location='Tunis'
+    )
+    user.set_password('benchmark-password')
+    db.session.add(user)
+    db.session.flush()
+
+    now = datetime.utcnow()
+    db.session.execute(insert(Food), [
+        {
+            'name': f'Food {i}', 'category': CATEGORIES[i % len(CATEGORIES)],
+            'calories_per_100g': 50 + i % 500, 'protein_per_100g': i % 30, 'carbs_per_100g': i % 70,
+            'fat_per_100g': i % 20, 'unit': 'g', 'is_common': i % 7 == 0, 'created_at': now
+        }
+        for i in range(num_rows)
+    ])
+    db.session.execute(insert(Meal), [
+        {
+            'name': f'Meal {i}', 'meal_type': MEAL_TYPES[i % len(MEAL_TYPES)], 'goal': 'maintenance',
+            'description': 'Benchmark meal', 'total_calories': 400 + i % 400, 'total_protein': 30.0,
+            'total_carbs': 40.0, 'total_fat': 15.0, 'created_at': now
+        }
+        for i in range(num_rows)
+    ])
+    db.session.execute(insert(Exercise), [
+        {
+            'name': f'Exercise {i}', 'muscle_group': MUSCLE_GROUPS[i % len(MUSCLE_GROUPS)], 'equipment': 'dumbbell',
+            'difficulty': 'beginner', 'instructions': 'Lift, then lower with control.', 'created_at': now
+        }
+        for i in range(num_rows)
+    ])
+    db.session.execute(insert(WeightHistory), [
+        {'user_id': user.id, 'weight': 80 - i / num_rows * 5, 'recorded_at': now - timedelta(hours=i), 'notes': None}
+        for i in range(num_rows)
+    ])
+    db.session.commit()
+    return user
+
+
+def orm_path(model, order_by, *criteria):
+    return [obj.to_dict() for obj in model.query.filter(*criteria).order_by(order_by).all()]
+
+
+def read_model_path(read_model, order_by, *criteria):
+    return [row.to_dict() for row in read_model.rows(read_model.select().where(*criteria).order_by(order_by))]
+
+
+def measure(func, *args):
+    """(result, seconds, peak MB) on a fresh session, timed without tracing"""
+    db.session.remove()
+    gc.collect()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+
+    db.session.remove()
+    gc.collect()
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    db.session.remove()
+    return result, elapsed, peak / 1024 / 1024
+
+
+def run(args):
+    db.create_all()
+    user = seed(args.rows)
+    cases = [
+        ('foods', Food, FOOD, Food.name, ()),
+        ('meals', Meal, MEAL, Meal.name, ()),
+        ('exercises', Exercise, EXERCISE, Exercise.id, ()),
+        ('weight history', WeightHistory, WEIGHT_HISTORY, WeightHistory.recorded_at.desc(), (WeightHistory.user_id == user.id,)),
+    ]
+
+    print(f"\n📊 {args.rows} rows per table\n")
+    print(f"   {'table':16} {'path':11} {'time':>9} {'rows/s':>10} {'peak MB':>9}")
+    for name, model, read_model, order_by, criteria in cases:
+        expected, orm_time, orm_peak = measure(orm_path, model, order_by, *criteria)
+        rows, rows_time, rows_peak = measure(read_model_path, read_model, order_by, *criteria)
+        assert rows == expected, f"{name}: read model rows differ from Model.to_dict()"
+
+        for path, elapsed, peak in (('ORM', orm_time, orm_peak), ('read model', rows_time, rows_peak)):
+            print(f"   {name:16} {path:11} {elapsed * 1000:7.0f}ms {len(rows) / elapsed:10.0f} {peak:9.1f}")
+        print(f"   {'':16} {'':11} {orm_time / rows_time:8.1f}x {'':10} {orm_peak / rows_peak:8.1f}x\n")
+
+    print("✅ Read models match Model.to_dict()")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+
+    with app.app_context():
+        run(parser.parse_args())
@@ -0,0 +1,134 @@
+"""
+Benchmark: SQL statements issued by the session history endpoints.
+
+Seeds a throwaway database with growing workout histories and checks that
+GET /api/workouts/sessions and GET /api/progress/workout-history issue the
+same number of statements no matter how many sessions the user has.
+
+Usage: python bench_session_queries.py
+(set BENCH_DATABASE_URL to run against something other than in-memory SQLite)
+"""
+import os
+
+os.environ['DATABASE_URL'] = os.getenv('BENCH_DATABASE_URL', 'sqlite://')
+# Catalog version checks are periodic, not per history size: keep them out of the counts
+os.environ.setdefault('CATALOG_VERSION_CHECK_INTERVAL', '3600')
+
+import time
+from datetime import datetime, timedelta
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from app import create_app, db
+from app.catalog import catalog
+from app.models import User, WorkoutSession, WorkoutTemplate, SessionExercise
+from seed_workouts import seed_exercises, seed_workout_templates
+
+app = create_app()
+
+HISTORY_SIZES = [10, 100, 300]
+ENDPOINTS = [
+    '/api/workouts/sessions',
+    '/api/progress/workout-history?limit=1000',
+]
+
+
+class StatementCounter:
+    """Counts statements sent through the engine while active"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+
+
+def create_user_with_history(index, num_sessions):
+    """Create a user with num_sessions completed sessions of 5 exercises each"""
+    user = User(
+        email=f'bench{index}@example.com',
+        first_name='Bench',
+        last_name=str(index),
+        weight=80,
+        goal_weight=75,
+        height=180,
+        fitness_goal='Get Fit',
+        location='Tunis'
+    )
+    user.set_password('benchmark-password')
+    db.session.add(user)
+    db.session.flush()
+
+    templates = WorkoutTemplate.query.all()
+    now = datetime.utcnow()
+
+    for i in range(num_sessions):
+        template = templates[i % len(templates)]
+        session = WorkoutSession(
+            user_id=user.id,
+            template_id=template.id,
+            created_at=now - timedelta(days=i),
+            completed=True,
+            completed_at=now - timedelta(days=i)
+        )
+        db.session.add(session)
+        db.session.flush()
+
+        for order, we in enumerate(template.exercises, start=1):
+            db.session.add(SessionExercise(
+                session_id=session.id,
+                exercise_id=we.exercise_id,
+                sets=we.sets,
+                reps=we.reps,
+                rest_seconds=we.rest_seconds,
+                order=order
+            ))
+
+    db.session.commit()
+    return user
+
+
+def run():
+    db.create_all()
+    seed_exercises()
+    seed_workout_templates()
+    # Exercises and templates are served from the catalog snapshot: load it up front
+    catalog.get()
+
+    client = app.test_client()
+    counter = StatementCounter(db.engine)
+    results = {endpoint: [] for endpoint in ENDPOINTS}
+
+    for index, size in enumerate(HISTORY_SIZES):
+        user = create_user_with_history(index, size)
+        token = create_access_token(identity=str(user.id))
+        headers = {'Authorization': f'Bearer {token}'}
+
+        for endpoint in ENDPOINTS:
+            db.session.expunge_all()
+            with counter:
+                start = time.perf_counter()
+                response = client.get(endpoint, headers=headers)
+                elapsed = time.perf_counter() - start
+
+            assert response.status_code == 200, response.get_data(as_text=True)
+            results[endpoint].append(counter.count)
+            print(f"{endpoint:45} sessions={size:<5} statements={counter.count:<4} {elapsed * 1000:.1f} ms")
+
+    for endpoint, counts in results.items():
+        assert len(set(counts)) == 1, f"{endpoint} statement count grows with history: {counts}"
+
+    print("✅ Statement count is flat across history sizes")
+
+
+if __name__ == "__main__":
+    with app.app_context():
+        run()
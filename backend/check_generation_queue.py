@@ -0,0 +1,293 @@
+"""
+End-to-end check of the AI plan generation job queue against a local stub n8n.
+
+Starts a stub HTTP server standing in for the n8n webhooks, a throwaway
+SQLite database and a worker pool, then checks: the generate endpoints answer
+202 without waiting for n8n, failed calls are retried with backoff, jobs give
+up after GENERATION_MAX_ATTEMPTS, expired leases are re-claimed and the
+sweeper fails abandoned jobs and schedules stuck in 'processing', and that
+a repeated identical request is coalesced into the first one, and that a
+job rejected by an open circuit is deferred without using an attempt. Finally
+checks the webhook client's retries, concurrency limit and circuit breaker.
+
+Usage: python check_generation_queue.py
+(set CHECK_DATABASE_URL to run against something other than a temp SQLite file)
+"""
+import os
+import tempfile
+
+os.environ['DATABASE_URL'] = os.getenv(
+    'CHECK_DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'generation_queue.db')}"
+)
+
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+from flask_jwt_extended import create_access_token
+from app import create_app, db
+from app.http_client import CircuitOpenError, HttpClient, TargetBusyError, webhook_client
+from app.jobs import JobWorkerPool, claim_job, enqueue_generation, sweep
+from app.models import GenerationJob, MealSchedule, User, UserSchedule
+
+app = create_app()
+
+
+class StubN8N(BaseHTTPRequestHandler):
+    """
+    /ok answers 200, /down answers 500, /slow sleeps past the request timeout,
+    /flaky/<n> answers 500 and /unavailable/<n> 503 to the first n calls.
+    Every call is recorded.
+    """
+    calls = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        StubN8N.calls.append((self.path, body))
+
+        if self.path == '/slow':
+            # The worker has given up by now; don't answer
+            time.sleep(3)
+            return
+        if self.path == '/down':
+            status = 500
+        elif self.path.startswith(('/flaky/', '/unavailable/')):
+            failures = int(self.path.rsplit('/', 1)[1])
+            failed = sum(1 for path, _ in StubN8N.calls if path == self.path) <= failures
+            status = (500 if self.path.startswith('/flaky/') else 503) if failed else 200
+        else:
+            status = 200
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps({'workflow_id': 'wf-stub'}).encode())
+
+    def log_message(self, *args):
+        pass
+
+
+def wait_for(predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with app.app_context():
+            if predicate():
+                return True
+        time.sleep(0.05)
+    return False
+
+
+def job_for(kind, schedule_id):
+    return GenerationJob.query.filter_by(kind=kind, schedule_id=schedule_id).first()
+
+
+def run():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubN8N)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    stub_url = f'http://127.0.0.1:{server.server_port}'
+
+    app.config.update(
+        GENERATION_REQUEST_TIMEOUT=1,
+        GENERATION_VISIBILITY_TIMEOUT=2,
+        GENERATION_RETRY_BACKOFF=0.1,
+        GENERATION_POLL_INTERVAL=0.05,
+        GENERATION_MAX_ATTEMPTS=3,
+        N8N_WORKOUT_WEBHOOK_URL=f'{stub_url}/ok',
+        # Leave retrying to the queue so attempts are counted per job
+        HTTP_CLIENT_RETRIES=0,
+        # Failed meal plans stay failed instead of falling back to the local planner
+        MEAL_PLAN_LOCAL_FALLBACK=False
+    )
+    webhook_client.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        user = User(
+            email='queue@example.com', first_name='Queue', last_name='Check',
+            weight=80, goal_weight=75, height=180, fitness_goal='Get Fit', location='Tunis'
+        )
+        user.set_password('queue-check')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+        headers = {'Authorization': f'Bearer {create_access_token(identity=str(user_id))}'}
+
+    client = app.test_client()
+    meal_request = {'goal_weight': 75, 'days_to_goal': 60, 'goal': 'lose_fat'}
+
+    def generate_meal_plan(path):
+        # The webhook URL is read when the job runs
+        app.config['N8N_MEAL_WEBHOOK_URL'] = f'{stub_url}{path}'
+        # A distinct request each time so it isn't coalesced with the previous one
+        meal_request['days_to_goal'] += 1
+        start = time.perf_counter()
+        response = client.post('/api/meals/generate-plan', json=meal_request, headers=headers)
+        elapsed = time.perf_counter() - start
+        assert response.status_code == 202, response.get_data(as_text=True)
+        return response.json['schedule_id'], elapsed
+
+    def meal_status(schedule_id):
+        return MealSchedule.query.get(schedule_id).generation_status
+
+    # Requests return before any webhook call is made
+    slow_id, elapsed = generate_meal_plan('/slow')
+    assert elapsed < 0.5, f"generate-plan blocked for {elapsed:.2f}s"
+    with app.app_context():
+        assert meal_status(slow_id) == 'pending' and not StubN8N.calls
+    print(f"✅ POST /api/meals/generate-plan answered 202 in {elapsed * 1000:.0f} ms before n8n was called")
+
+    response = client.post('/api/meals/generate-plan', json=meal_request, headers=headers)
+    assert response.status_code == 202 and response.json['coalesced'] and response.json['schedule_id'] == slow_id
+    with app.app_context():
+        assert GenerationJob.query.count() == 1 and MealSchedule.query.count() == 1
+    print("✅ Identical request was coalesced into the in-flight one")
+
+    pool = JobWorkerPool(app, num_workers=4).start()
+    try:
+        assert wait_for(lambda: meal_status(slow_id) == 'failed', timeout=20)
+        with app.app_context():
+            assert job_for('meal_plan', slow_id).attempts == 3
+        print("✅ Webhook timing out was retried and then failed")
+
+        ok_id, _ = generate_meal_plan('/ok')
+        assert wait_for(lambda: meal_status(ok_id) == 'processing'), "ok job was not dispatched"
+        print("✅ Dispatched job moved its schedule to 'processing'")
+
+        flaky_id, _ = generate_meal_plan('/flaky/2')
+        assert wait_for(lambda: job_for('meal_plan', flaky_id).status == 'succeeded')
+        with app.app_context():
+            assert job_for('meal_plan', flaky_id).attempts == 3
+        print("✅ Flaky webhook succeeded on the third attempt")
+
+        down_id, _ = generate_meal_plan('/down')
+        assert wait_for(lambda: meal_status(down_id) == 'failed')
+        with app.app_context():
+            job = job_for('meal_plan', down_id)
+            assert (job.status, job.attempts) == ('failed', 3), job.to_dict()
+        print("✅ Failing webhook gave up after 3 attempts and failed the schedule")
+
+        response = client.post('/api/ai-planner/generate', json={
+            'available_days': ['monday', 'thursday'], 'sessions_per_week': 2
+        }, headers=headers)
+        assert response.status_code == 202, response.get_data(as_text=True)
+        workout_id = response.json['schedule_id']
+        assert wait_for(lambda: UserSchedule.query.get(workout_id).n8n_workflow_id == 'wf-stub')
+        print("✅ Workout job stored the n8n workflow id")
+    finally:
+        pool.stop()
+
+    with app.app_context():
+        # A job whose call the open circuit rejects keeps its attempt and waits for the breaker
+        down = f'{stub_url}/down'
+        app.config['N8N_MEAL_WEBHOOK_URL'] = down
+        breaker = webhook_client._target(down).breaker
+        breaker.opened_at = time.monotonic()
+        schedule = MealSchedule(user_id=user_id, generation_status='pending')
+        db.session.add(schedule)
+        db.session.flush()
+        enqueue_generation('meal_plan', schedule, {})
+        db.session.commit()
+
+        calls = len(StubN8N.calls)
+        assert pool.run_once('breaker-check')
+        job = job_for('meal_plan', schedule.id)
+        assert (job.status, job.attempts) == ('queued', 0), job.to_dict()
+        assert job.available_at > datetime.utcnow() + timedelta(seconds=breaker.reset_timeout - 5)
+        assert len(StubN8N.calls) == calls and meal_status(schedule.id) == 'pending'
+        breaker.record_success()
+        db.session.delete(job)
+        db.session.delete(schedule)
+        db.session.commit()
+        print("✅ Job rejected by an open circuit was deferred without using an attempt")
+
+    with app.app_context():
+        # A worker that dies mid-job: its lease expires and another worker re-claims the job
+        schedule = MealSchedule(user_id=user_id, generation_status='pending')
+        db.session.add(schedule)
+        db.session.flush()
+        enqueue_generation('meal_plan', schedule, {})
+        db.session.commit()
+
+        dead = claim_job('dead-worker')
+        assert claim_job('other-worker') is None, "leased job was claimed twice"
+        dead.locked_until = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+        reclaimed = claim_job('other-worker')
+        assert reclaimed is not None and reclaimed.id == dead.id and reclaimed.attempts == 2
+        print("✅ Expired lease was re-claimed by another worker")
+
+        # ...and one that dies on the final attempt is failed by the sweeper
+        reclaimed.attempts = reclaimed.max_attempts
+        reclaimed.locked_until = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+        assert claim_job('other-worker') is None
+        abandoned, _ = sweep()
+        assert abandoned == 1 and MealSchedule.query.get(schedule.id).generation_status == 'failed'
+        print("✅ Sweeper failed a job abandoned on its final attempt")
+
+        # A schedule n8n accepted but never called back for
+        stuck = job_for('meal_plan', ok_id)
+        _, stuck_schedules = sweep(now=stuck.updated_at + timedelta(seconds=app.config['GENERATION_STUCK_AFTER'] + 1))
+        assert stuck_schedules >= 1 and MealSchedule.query.get(ok_id).generation_status == 'failed', stuck_schedules
+        print("✅ Sweeper failed a schedule stuck in 'processing'")
+
+    stats = webhook_client.stats()
+    assert stats[f'{stub_url}/down']['responses'] == {'5xx': 3}, stats
+    print(f"✅ Per-URL stats recorded for {len(stats)} webhook URLs")
+
+    check_http_client(stub_url)
+    server.shutdown()
+    print("\n✅ Generation queue behaves as expected")
+
+
+def check_http_client(stub_url):
+    client = HttpClient()
+    client.retry_backoff = 0.01
+    client.breaker_threshold = 2
+    client.breaker_reset = 0.5
+
+    response = client.post(f'{stub_url}/unavailable/2', json={})
+    assert response.status_code == 200 and client.stats()[f'{stub_url}/unavailable/2']['retries'] == 2
+    print("✅ Client retried 503s with backoff")
+
+    down = f'{stub_url}/down'
+    for _ in range(2):
+        assert client.post(down, json={}).status_code == 500
+    calls = len(StubN8N.calls)
+    try:
+        client.post(down, json={})
+        raise AssertionError("circuit did not open")
+    except CircuitOpenError:
+        pass
+    assert len(StubN8N.calls) == calls, "open circuit still called the webhook"
+    time.sleep(0.6)
+    assert client.post(down, json={}).status_code == 500
+    assert client.stats()[down]['circuit'] == 'open'
+    print("✅ Circuit opened after repeated failures, and re-opened after a failed trial call")
+
+    client.max_concurrency = 1
+    client.acquire_timeout = 0.1
+    slow = f'{stub_url}/slow'
+    def hold_slot():
+        try:
+            client.post(slow, json={}, timeout=0.5)
+        except requests.Timeout:
+            pass
+
+    blocker = threading.Thread(target=hold_slot)
+    blocker.start()
+    time.sleep(0.1)
+    try:
+        client.post(slow, json={}, timeout=0.5)
+        raise AssertionError("concurrency limit not enforced")
+    except TargetBusyError:
+        pass
+    blocker.join()
+    assert client.stats()[slow]['rejected_busy'] == 1
+    print("✅ Concurrent calls beyond the per-target limit were rejected")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,237 @@
+"""
+Check that the hot per-user endpoint queries are served by indexes.
+
+Seeds a large synthetic dataset (unless --skip-seed), runs EXPLAIN on the
+query behind each endpoint and exits non-zero if any of them falls back to
+a sequential scan on the per-user table it reads.
+
+Usage: python explain_queries.py [--users 200] [--rows-per-user 300] [--skip-seed]
+"""
+import argparse
+import random
+import sys
+from datetime import datetime, timedelta
+from sqlalchemy import func, insert, text, tuple_
+from app import create_app, db
+from app.models import (
+    User, Exercise, WorkoutTemplate, WorkoutSession, SessionExercise,
+    WeightHistory, ExercisePersonalRecord, CalendarEvent, DailyMealPlan,
+    UserSchedule, MealSchedule
+)
+
+app = create_app()
+
+BATCH_SIZE = 5000
+
+
+def bulk_insert(model, rows):
+    """Insert rows in batches with executemany"""
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.session.execute(insert(model), rows[start:start + BATCH_SIZE])
+
+
+def seed_large_dataset(num_users, rows_per_user):
+    """Seed users with rows_per_user rows in every per-user table"""
+    print(f"🌱 Seeding {num_users} users x {rows_per_user} rows...")
+
+    exercise_ids = [e.id for e in Exercise.query.all()]
+    template_ids = [t.id for t in WorkoutTemplate.query.all()]
+    if not exercise_ids or not template_ids:
+        sys.exit("❌ Run seed_workouts.py first")
+
+    now = datetime.utcnow()
+    first_user = (db.session.query(func.max(User.id)).scalar() or 0) + 1
+
+    bulk_insert(User, [{
+        'email': f'explain{first_user + i}@example.com',
+        'password_hash': 'x',
+        'first_name': 'Explain',
+        'last_name': str(first_user + i),
+        'weight': 80,
+        'goal_weight': 75,
+        'height': 180,
+        'fitness_goal': 'Get Fit',
+        'estimated_daily_steps': 5000,
+        'workout_difficulty': 'Beginner',
+        'location': 'Tunis'
+    } for i in range(num_users)])
+    user_ids = [u.id for u in User.query.filter(User.email.like('explain%')).all()]
+
+    sessions, weights, prs, events, plans, schedules, meal_schedules = [], [], [], [], [], [], []
+    for user_id in user_ids:
+        for day in range(rows_per_user):
+            when = now - timedelta(days=day)
+            sessions.append({
+                'user_id': user_id,
+                'template_id': random.choice(template_ids),
+                'created_at': when,
+                'completed': day % 3 != 0,
+                'completed_at': when if day % 3 != 0 else None
+            })
+            weights.append({'user_id': user_id, 'weight': 80 - day / 100, 'recorded_at': when})
+            prs.append({
+                'user_id': user_id,
+                'exercise_id': random.choice(exercise_ids),
+                'weight': 20 + day,
+                'reps': 5,
+                'achieved_at': when
+            })
+            events.append({
+                'user_id': user_id,
+                'title': 'Workout',
+                'date': when.date(),
+                'start_time': when.time(),
+                'completed': False
+            })
+            plans.append({'user_id': user_id, 'date': when.date(), 'created_at': when})
+        for week in range(rows_per_user // 7 or 1):
+            when = now - timedelta(weeks=week)
+            schedules.append({'user_id': user_id, 'generated_at': when, 'generation_status': 'completed'})
+            meal_schedules.append({'user_id': user_id, 'generated_at': when, 'generation_status': 'completed'})
+
+    bulk_insert(WorkoutSession, sessions)
+    bulk_insert(WeightHistory, weights)
+    bulk_insert(ExercisePersonalRecord, prs)
+    bulk_insert(CalendarEvent, events)
+    bulk_insert(DailyMealPlan, plans)
+    bulk_insert(UserSchedule, schedules)
+    bulk_insert(MealSchedule, meal_schedules)
+
+    session_ids = [row.id for row in db.session.query(WorkoutSession.id).filter(
+        WorkoutSession.user_id.in_(user_ids)
+    )]
+    bulk_insert(SessionExercise, [{
+        'session_id': session_id,
+        'exercise_id': random.choice(exercise_ids),
+        'sets': 3,
+        'reps': 10,
+        'order': order
+    } for session_id in session_ids for order in range(1, 6)])
+
+    db.session.commit()
+    return user_ids[len(user_ids) // 2]
+
+
+def endpoint_queries(user_id):
+    """(endpoint, table that must not be seq-scanned, select statement)"""
+    now = datetime.utcnow()
+    session_ids = [row.id for row in db.session.query(WorkoutSession.id).filter_by(user_id=user_id).limit(50)]
+
+    return [
+        ('GET /api/workouts/sessions', 'workout_sessions',
+         WorkoutSession.query.filter_by(user_id=user_id)
+         .filter(tuple_(WorkoutSession.created_at, WorkoutSession.id) < (now, 2 ** 31 - 1))
+         .order_by(WorkoutSession.created_at.desc(), WorkoutSession.id.desc()).limit(51)),
+        ('GET /api/workouts/sessions (exercises)', 'session_exercises',
+         SessionExercise.query.filter(SessionExercise.session_id.in_(session_ids))),
+        ('GET /api/progress/workout-history', 'workout_sessions',
+         WorkoutSession.query.filter_by(user_id=user_id, completed=True)
+         .order_by(WorkoutSession.created_at.desc(), WorkoutSession.id.desc()).limit(21)),
+        ('GET /api/progress/streak', 'workout_sessions',
+         WorkoutSession.query.filter_by(user_id=user_id, completed=True)
+         .order_by(WorkoutSession.completed_at.desc())),
+        ('GET /api/progress/dashboard (this week)', 'workout_sessions',
+         WorkoutSession.query.filter(
+             WorkoutSession.user_id == user_id,
+             WorkoutSession.created_at >= now - timedelta(days=7),
+             WorkoutSession.completed == True
+         )),
+        ('GET /api/progress/weight', 'weight_history',
+         WeightHistory.query.filter_by(user_id=user_id)
+         .order_by(WeightHistory.recorded_at.desc()).limit(30)),
+        ('GET /api/progress/dashboard (recent PRs)', 'exercise_personal_records',
+         ExercisePersonalRecord.query.filter_by(user_id=user_id)
+         .order_by(ExercisePersonalRecord.achieved_at.desc()).limit(5)),
+        ('POST /api/progress/personal-records', 'exercise_personal_records',
+         ExercisePersonalRecord.query.filter_by(user_id=user_id, exercise_id=1)
+         .order_by(ExercisePersonalRecord.weight.desc()).limit(1)),
+        ('GET /api/progress/personal-records', 'exercise_personal_records',
+         db.session.query(
+             ExercisePersonalRecord.exercise_id,
+             func.max(ExercisePersonalRecord.weight)
+         ).filter_by(user_id=user_id).group_by(ExercisePersonalRecord.exercise_id)),
+        ('GET /api/calendar/events', 'calendar_events',
+         CalendarEvent.query.filter(
+             CalendarEvent.user_id == user_id,
+             CalendarEvent.date >= (now - timedelta(days=30)).date(),
+             CalendarEvent.date <= now.date()
+         ).order_by(CalendarEvent.date, CalendarEvent.id).limit(51)),
+        ('GET /api/calendar/events/week', 'calendar_events',
+         CalendarEvent.query.filter(
+             CalendarEvent.user_id == user_id,
+             CalendarEvent.date >= (now - timedelta(days=6)).date(),
+             CalendarEvent.date <= now.date()
+         ).order_by(CalendarEvent.date, CalendarEvent.start_time)),
+        ('GET /api/meals/plans', 'daily_meal_plans',
+         DailyMealPlan.query.filter_by(user_id=user_id)
+         .order_by(DailyMealPlan.date.desc(), DailyMealPlan.id.desc()).limit(51)),
+        ('GET /api/ai-planner/my-plans', 'user_schedules',
+         UserSchedule.query.filter_by(user_id=user_id)
+         .order_by(UserSchedule.generated_at.desc(), UserSchedule.id.desc()).limit(51)),
+        ('GET /api/meals/schedules', 'meal_schedules',
+         MealSchedule.query.filter_by(user_id=user_id)
+         .order_by(MealSchedule.generated_at.desc(), MealSchedule.id.desc()).limit(51)),
+    ]
+
+
+def explain(query):
+    """Return the plan lines for a query on the current dialect"""
+    statement = getattr(query, 'statement', query)
+    compiled = statement.compile(dialect=db.engine.dialect, compile_kwargs={'render_postcompile': True})
+    connection = db.session.connection()
+
+    if db.engine.dialect.name == 'postgresql':
+        rows = connection.exec_driver_sql('EXPLAIN ' + str(compiled), compiled.params)
+        return [row[0] for row in rows]
+
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + str(compiled), params)
+    return [row[-1] for row in rows]
+
+
+def is_seq_scan(line, table):
+    """True if a plan line is a full scan of the table"""
+    if db.engine.dialect.name == 'postgresql':
+        return f'Seq Scan on {table}' in line
+    # SQLite: "SCAN <table>" without an index is a full table scan
+    words = line.split()
+    return len(words) >= 2 and words[0] == 'SCAN' and words[1] == table and 'INDEX' not in line
+
+
+def run(args):
+    db.create_all()
+    user_id = None if args.skip_seed else seed_large_dataset(args.users, args.rows_per_user)
+    if user_id is None:
+        user_id = db.session.query(func.max(WorkoutSession.user_id)).scalar()
+
+    # Refresh planner statistics so the plans reflect the seeded volume
+    db.session.execute(text('ANALYZE'))
+    db.session.commit()
+
+    failures = []
+    for endpoint, table, query in endpoint_queries(user_id):
+        plan = explain(query)
+        seq_scan = any(is_seq_scan(line, table) for line in plan)
+        print(f"{'❌' if seq_scan else '✅'} {endpoint}")
+        for line in plan:
+            print(f"      {line}")
+        if seq_scan:
+            failures.append(endpoint)
+
+    if failures:
+        print(f"\n❌ {len(failures)} queries fall back to a sequential scan:")
+        for endpoint in failures:
+            print(f"   - {endpoint}")
+        sys.exit(1)
+
+    print("\n✅ All endpoint queries use indexes")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--rows-per-user', type=int, default=300)
+    parser.add_argument('--skip-seed', action='store_true')
+
+    with app.app_context():
+        run(parser.parse_args())
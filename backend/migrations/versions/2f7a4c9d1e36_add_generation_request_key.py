@@ -0,0 +1,28 @@
+"""add generation request key
+
+Revision ID: 2f7a4c9d1e36
+Revises: 8e3f0c5b7a92
+Create Date: 2026-10-17 18:05:52.417306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2f7a4c9d1e36'
+down_revision = '8e3f0c5b7a92'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('generation_jobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('request_key', sa.String(length=64), nullable=True))
+        batch_op.create_index('ix_generation_jobs_request_key', ['user_id', 'kind', 'request_key', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('generation_jobs', schema=None) as batch_op:
+        batch_op.drop_index('ix_generation_jobs_request_key')
+        batch_op.drop_column('request_key')
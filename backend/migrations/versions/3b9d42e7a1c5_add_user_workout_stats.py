@@ -0,0 +1,32 @@
+"""add user workout stats
+
+Revision ID: 3b9d42e7a1c5
+Revises: fe73c0802657
+Create Date: 2026-10-17 11:03:27.914502
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b9d42e7a1c5'
+down_revision = 'fe73c0802657'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user_workout_stats',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('total_sessions', sa.Integer(), nullable=False),
+    sa.Column('completed_sessions', sa.Integer(), nullable=False),
+    sa.Column('last_workout_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade():
+    op.drop_table('user_workout_stats')
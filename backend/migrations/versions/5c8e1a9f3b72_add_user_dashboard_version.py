@@ -0,0 +1,26 @@
+"""add user dashboard version
+
+Revision ID: 5c8e1a9f3b72
+Revises: d3a6f1b8e245
+Create Date: 2026-10-18 09:12:03.418276
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c8e1a9f3b72'
+down_revision = 'd3a6f1b8e245'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('dashboard_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('dashboard_version')
@@ -0,0 +1,32 @@
+"""add meal dependency indexes
+
+Revision ID: 5d2b9e61f0a4
+Revises: c4e8f1a26d57
+Create Date: 2026-10-17 15:02:37.184520
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d2b9e61f0a4'
+down_revision = 'c4e8f1a26d57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_meal_items_food_id', 'meal_items', ['food_id'], unique=False)
+    op.create_index('ix_daily_meal_plans_breakfast_id', 'daily_meal_plans', ['breakfast_id'], unique=False)
+    op.create_index('ix_daily_meal_plans_lunch_id', 'daily_meal_plans', ['lunch_id'], unique=False)
+    op.create_index('ix_daily_meal_plans_dinner_id', 'daily_meal_plans', ['dinner_id'], unique=False)
+    op.create_index('ix_daily_meal_plans_snack_id', 'daily_meal_plans', ['snack_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_daily_meal_plans_snack_id', table_name='daily_meal_plans')
+    op.drop_index('ix_daily_meal_plans_dinner_id', table_name='daily_meal_plans')
+    op.drop_index('ix_daily_meal_plans_lunch_id', table_name='daily_meal_plans')
+    op.drop_index('ix_daily_meal_plans_breakfast_id', table_name='daily_meal_plans')
+    op.drop_index('ix_meal_items_food_id', table_name='meal_items')
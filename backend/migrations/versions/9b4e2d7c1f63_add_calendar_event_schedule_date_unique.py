@@ -0,0 +1,36 @@
+"""add calendar event schedule date unique index
+
+Revision ID: 9b4e2d7c1f63
+Revises: 2f7a4c9d1e36
+Create Date: 2026-10-17 19:42:08.113705
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b4e2d7c1f63'
+down_revision = '2f7a4c9d1e36'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Drop the duplicates left by retried plan callbacks, keeping a completed
+    # event if there is one (the first otherwise) so no progress is lost
+    op.execute(
+        "DELETE FROM calendar_events WHERE id IN ("
+        "SELECT id FROM (SELECT id, ROW_NUMBER() OVER ("
+        "PARTITION BY schedule_id, date "
+        "ORDER BY CASE WHEN completed THEN 0 ELSE 1 END, id"
+        ") AS position FROM calendar_events WHERE schedule_id IS NOT NULL) AS ranked_events "
+        "WHERE position > 1)"
+    )
+    with op.batch_alter_table('calendar_events', schema=None) as batch_op:
+        batch_op.create_index('uq_calendar_events_schedule_date', ['schedule_id', 'date'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('calendar_events', schema=None) as batch_op:
+        batch_op.drop_index('uq_calendar_events_schedule_date')
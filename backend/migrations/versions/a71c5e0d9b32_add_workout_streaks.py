@@ -0,0 +1,30 @@
+"""add workout streaks to user workout stats
+
+Revision ID: a71c5e0d9b32
+Revises: 3b9d42e7a1c5
+Create Date: 2026-10-17 11:48:09.220761
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a71c5e0d9b32'
+down_revision = '3b9d42e7a1c5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user_workout_stats', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('current_streak', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('longest_streak', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('last_active_day', sa.Date(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('user_workout_stats', schema=None) as batch_op:
+        batch_op.drop_column('last_active_day')
+        batch_op.drop_column('longest_streak')
+        batch_op.drop_column('current_streak')
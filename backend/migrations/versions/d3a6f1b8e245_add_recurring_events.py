@@ -0,0 +1,58 @@
+"""add recurring events
+
+Revision ID: d3a6f1b8e245
+Revises: 9b4e2d7c1f63
+Create Date: 2026-10-17 20:31:47.580219
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3a6f1b8e245'
+down_revision = '9b4e2d7c1f63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('recurring_events',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('schedule_id', sa.Integer(), nullable=True),
+    sa.Column('title', sa.String(length=200), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('weekday', sa.Integer(), nullable=False),
+    sa.Column('starts_on', sa.Date(), nullable=False),
+    sa.Column('ends_on', sa.Date(), nullable=True),
+    sa.Column('excluded_dates', sa.JSON(), nullable=True),
+    sa.Column('start_time', sa.Time(), nullable=True),
+    sa.Column('end_time', sa.Time(), nullable=True),
+    sa.Column('duration_minutes', sa.Integer(), nullable=True),
+    sa.Column('workout_template_id', sa.Integer(), nullable=True),
+    sa.Column('exercises', sa.JSON(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['schedule_id'], ['user_schedules.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['workout_template_id'], ['workout_templates.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_recurring_events_user_dates', 'recurring_events', ['user_id', 'starts_on', 'ends_on'], unique=False)
+    op.create_index('uq_recurring_events_schedule_weekday', 'recurring_events', ['schedule_id', 'weekday'], unique=True)
+
+    with op.batch_alter_table('calendar_events', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('recurring_event_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_calendar_events_recurring_event_id', 'recurring_events', ['recurring_event_id'], ['id'])
+        batch_op.create_index('uq_calendar_events_recurring_date', ['recurring_event_id', 'date'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('calendar_events', schema=None) as batch_op:
+        batch_op.drop_index('uq_calendar_events_recurring_date')
+        batch_op.drop_constraint('fk_calendar_events_recurring_event_id', type_='foreignkey')
+        batch_op.drop_column('recurring_event_id')
+
+    op.drop_index('uq_recurring_events_schedule_weekday', table_name='recurring_events')
+    op.drop_index('ix_recurring_events_user_dates', table_name='recurring_events')
+    op.drop_table('recurring_events')
@@ -0,0 +1,46 @@
+"""add per-user query indexes
+
+Revision ID: fe73c0802657
+Revises: 6360ff7ec216
+Create Date: 2026-10-17 10:12:41.508213
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'fe73c0802657'
+down_revision = '6360ff7ec216'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_workout_exercises_workout_id', 'workout_exercises', ['workout_id'], unique=False)
+    op.create_index('ix_workout_sessions_user_completed', 'workout_sessions', ['user_id', 'completed', 'completed_at'], unique=False)
+    op.create_index('ix_workout_sessions_user_created', 'workout_sessions', ['user_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_session_exercises_session_id', 'session_exercises', ['session_id'], unique=False)
+    op.create_index('ix_weight_history_user_recorded', 'weight_history', ['user_id', 'recorded_at'], unique=False)
+    op.create_index('ix_personal_records_user_exercise_weight', 'exercise_personal_records', ['user_id', 'exercise_id', 'weight'], unique=False)
+    op.create_index('ix_personal_records_user_achieved', 'exercise_personal_records', ['user_id', 'achieved_at'], unique=False)
+    op.create_index('ix_user_schedules_user_generated', 'user_schedules', ['user_id', 'generated_at', 'id'], unique=False)
+    op.create_index('ix_calendar_events_user_date', 'calendar_events', ['user_id', 'date', 'start_time'], unique=False)
+    op.create_index('ix_meal_items_meal_id', 'meal_items', ['meal_id'], unique=False)
+    op.create_index('ix_daily_meal_plans_user_date', 'daily_meal_plans', ['user_id', 'date'], unique=False)
+    op.create_index('ix_meal_schedules_user_generated', 'meal_schedules', ['user_id', 'generated_at', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_meal_schedules_user_generated', table_name='meal_schedules')
+    op.drop_index('ix_daily_meal_plans_user_date', table_name='daily_meal_plans')
+    op.drop_index('ix_meal_items_meal_id', table_name='meal_items')
+    op.drop_index('ix_calendar_events_user_date', table_name='calendar_events')
+    op.drop_index('ix_user_schedules_user_generated', table_name='user_schedules')
+    op.drop_index('ix_personal_records_user_achieved', table_name='exercise_personal_records')
+    op.drop_index('ix_personal_records_user_exercise_weight', table_name='exercise_personal_records')
+    op.drop_index('ix_weight_history_user_recorded', table_name='weight_history')
+    op.drop_index('ix_session_exercises_session_id', table_name='session_exercises')
+    op.drop_index('ix_workout_sessions_user_created', table_name='workout_sessions')
+    op.drop_index('ix_workout_sessions_user_completed', table_name='workout_sessions')
+    op.drop_index('ix_workout_exercises_workout_id', table_name='workout_exercises')
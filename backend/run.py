@@ -1,6 +1,11 @@
+import os
 from app import create_app
+from app.jobs import JobWorkerPool
 
 app = create_app()
 
 if __name__ == "__main__":
+    # Run the generation job workers in the reloader's serving process
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        JobWorkerPool(app).start()
     app.run(debug=True)
@@ -0,0 +1,33 @@
+"""
+Run the AI plan generation job workers in their own process.
+
+Claims queued generation jobs, calls the n8n webhooks and sweeps schedules
+stuck in 'processing'. Any number of these can run next to the web workers.
+
+Usage: python run_job_worker.py [--workers 2]
+"""
+import argparse
+import logging
+import signal
+import threading
+from app import create_app
+from app.jobs import JobWorkerPool
+
+app = create_app()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(threadName)s %(levelname)s %(message)s')
+    pool = JobWorkerPool(app, args.workers).start()
+    print(f"🤖 {pool.num_workers} generation workers running, Ctrl+C to stop")
+
+    stop = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    stop.wait()
+    print("🛑 Stopping workers...")
+    pool.stop()